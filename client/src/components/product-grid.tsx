@@ -28,7 +28,7 @@ export default function ProductGrid({ products, searching }: ProductGridProps) {
 
   return (
     <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-4">
-      {searching
+      {searching && products.length === 0
         ? Array.from({ length: 8 }).map((_, idx) => (
             <div
               key={idx}
@@ -59,6 +59,8 @@ export default function ProductGrid({ products, searching }: ProductGridProps) {
                     alt={product.product_name}
                     width={300}
                     height={300}
+                    loading="lazy"
+                    decoding="async"
                     className="object-contain w-full h-full"
                   />
                 </div>
@@ -2,7 +2,6 @@ import { Search } from 'lucide-react';
 import ProductGrid from '@/components/product-grid';
 import logo from '@/assets/fynd-logo.png';
 import { useState, useRef } from 'react';
-import axios from 'axios';
 
 export interface Product {
   product_name: string;
@@ -23,16 +22,51 @@ interface SearchRequestDto {
   query: string;
 }
 
-interface SearchResponseDto {
+interface NextPageRequestDto {
+  cursor: string;
+}
+
+interface PageResponseDto {
   products: Product[];
-  message?: string;
+  cursor: string | null;
 }
 
+type SiteStatus = 'ok' | 'timeout' | 'error' | 'cached';
+
+type SearchEventDto =
+  | {
+      event: 'plan';
+      search_string: string;
+      websites: string[];
+      message?: string;
+    }
+  | { event: 'progress'; website: string; stage: string; step?: number }
+  | {
+      event: 'products';
+      website: string;
+      status: SiteStatus;
+      elapsed_ms: number;
+      products: Product[];
+    }
+  | {
+      event: 'summary';
+      total_products: number;
+      message?: string;
+      sites?: Record<
+        string,
+        { status: SiteStatus; count: number; elapsed_ms: number }
+      >;
+      cursor?: string | null;
+    }
+  | { event: 'error'; error: string };
+
 export default function Home() {
   const [searchQuery, setSearchQuery] = useState('');
   const [products, setProducts] = useState<Product[]>([]);
   const [searching, setSearching] = useState<boolean>(false);
   const [message, setMessage] = useState<string | undefined>();
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
 
   const inputRef = useRef<HTMLInputElement>(null);
 
@@ -42,13 +76,45 @@ export default function Home() {
     };
     inputRef.current?.blur();
     setSearching(true);
+    setProducts([]);
+    setCursor(null);
     try {
-      const response = await axios.post<SearchResponseDto>(
-        'http://localhost:8000/api/search/',
-        searchRequest
+      const response = await fetch(
+        'http://localhost:8000/api/search/stream/',
+        {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify(searchRequest),
+        }
       );
-      setProducts(response.data.products);
-      setMessage(response.data.message);
+      if (!response.ok || !response.body) {
+        throw new Error(`Search failed with status ${response.status}`);
+      }
+
+      // Each line is one search event; show products as each site finishes
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() ?? '';
+        for (const line of lines.filter(Boolean)) {
+          const searchEvent = JSON.parse(line) as SearchEventDto;
+          if (searchEvent.event === 'products') {
+            setProducts(current => [...current, ...searchEvent.products]);
+          } else if (searchEvent.event === 'plan') {
+            setMessage(searchEvent.message);
+          } else if (searchEvent.event === 'summary') {
+            setMessage(searchEvent.message);
+            setCursor(searchEvent.cursor ?? null);
+          } else if (searchEvent.event === 'error') {
+            console.log(searchEvent.error);
+          }
+        }
+      }
     } catch (e) {
       console.log((e as Error).message);
     } finally {
@@ -56,6 +122,31 @@ export default function Home() {
     }
   };
 
+  // The next page was already being browsed while this one was shown
+  const fetchMoreProducts = async () => {
+    if (!cursor) return;
+    const nextPageRequest: NextPageRequestDto = { cursor };
+    setLoadingMore(true);
+    try {
+      const response = await fetch('http://localhost:8000/api/search/', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(nextPageRequest),
+      });
+      if (!response.ok) {
+        setCursor(null);
+        throw new Error(`Loading more failed with status ${response.status}`);
+      }
+      const page = (await response.json()) as PageResponseDto;
+      setProducts(current => [...current, ...page.products]);
+      setCursor(page.cursor);
+    } catch (e) {
+      console.log((e as Error).message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   return (
     <main className="min-h-screen bg-[#121212] text-white p-4">
       <div className="max-w-6xl mx-auto">
@@ -104,6 +195,18 @@ export default function Home() {
 
         {/* Product Grid */}
         <ProductGrid products={products} searching={searching} />
+
+        {cursor && !searching && (
+          <div className="w-full flex justify-center my-10">
+            <button
+              className="bg-[#1e1e1e] border border-[#333] rounded-xl py-3 px-6 text-white disabled:opacity-50"
+              onClick={fetchMoreProducts}
+              disabled={loadingMore}
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
     </main>
   );
@@ -0,0 +1,330 @@
+import asyncio
+import atexit
+import contextlib
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, Set, TypeVar
+
+from browser_use.browser.browser import Browser, BrowserConfig
+from browser_use.browser.context import BrowserContext
+from django.conf import settings
+
+from .metrics import BROWSER_LAUNCHES
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Defaults, overridable through Django settings
+DEFAULT_POOL_SIZE: int = 2
+DEFAULT_MAX_USES: int = 50
+DEFAULT_MAX_MEMORY_MB: Optional[int] = 4096
+DEFAULT_HEADLESS: bool = True
+DEFAULT_WARMUP: bool = True
+
+
+@dataclass
+class PooledBrowser:
+    """
+    A warm browser instance together with its usage bookkeeping.
+    """
+    browser: Browser
+    uses: int = 0
+    active_contexts: int = 0
+    # Set when the browser must go: it is drained of its contexts and closed when the last one is returned
+    retiring: bool = False
+    # Roots of the browser's own process tree (its Playwright driver, which launched Chromium)
+    root_pids: List[int] = field(default_factory=list)
+
+    def is_healthy(self) -> bool:
+        playwright_browser = self.browser.playwright_browser
+        return playwright_browser is not None and playwright_browser.is_connected()
+
+
+def _child_pids() -> Set[int]:
+    """
+    Direct child processes of this process; empty where /proc is unavailable.
+    """
+    if not os.path.isdir("/proc"):
+        return set()
+    pids: Set[int] = set()
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                if int(stat_file.read().rsplit(")", 1)[1].split()[1]) == os.getpid():
+                    pids.add(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return pids
+
+
+def _driver_pid(browser: Browser) -> Optional[int]:
+    """
+    PID of the Playwright driver process a browser-use Browser started, which Chromium runs under.
+    Playwright doesn't expose it publicly, so this reads its transport and returns None when that changes.
+    """
+    try:
+        return browser.playwright._impl_obj._connection._transport._proc.pid
+    except AttributeError:
+        return None
+
+
+def process_tree_rss_mb(root_pids: List[int]) -> Optional[float]:
+    """
+    Resident memory of the given processes and all their descendants, in MB.
+    Returns None where /proc is unavailable.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+
+    children: Dict[int, List[int]] = {}
+    rss_pages: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{entry}/statm") as statm_file:
+                rss_pages[int(entry)] = int(statm_file.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+
+    total_pages = 0
+    pending = list(root_pids)
+    while pending:
+        pid = pending.pop()
+        total_pages += rss_pages.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class BrowserPool:
+    """
+    Process-wide pool of warm Playwright browsers.
+
+    Each borrower gets its own isolated browser context on the least loaded healthy browser.
+    Browsers are recycled after a number of uses or when their own process tree exceeds a memory limit, and
+    browsers that die or disconnect are replaced; a browser that still lends contexts is drained first.
+    All browser work happens on the pool's own event loop, which runs in a background thread.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        max_uses: int = DEFAULT_MAX_USES,
+        max_memory_mb: Optional[int] = DEFAULT_MAX_MEMORY_MB,
+        browser_config: Optional[BrowserConfig] = None,
+    ):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.browser_config = browser_config or BrowserConfig()
+        self.launch_count = 0
+        self._browsers: List[PooledBrowser] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """
+        The event loop owning every browser of the pool, started on first use.
+        """
+        with self._thread_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def run(self, coroutine: Awaitable[T]) -> T:
+        """
+        Run a coroutine on the pool's event loop and block until it finishes.
+
+        Args:
+            coroutine: Coroutine that uses contexts borrowed from the pool
+
+        Returns:
+            The coroutine's result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def arun(self, coroutine: Awaitable[T]) -> T:
+        """
+        Await a coroutine on the pool's event loop without blocking the caller's loop.
+        Cancelling the caller cancels the coroutine.
+
+        Args:
+            coroutine: Coroutine that uses contexts borrowed from the pool
+
+        Returns:
+            The coroutine's result
+        """
+        if asyncio.get_running_loop() is self.loop:
+            return await coroutine
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+
+    async def _launch(self) -> PooledBrowser:
+        children_before: Set[int] = _child_pids()
+        browser = Browser(config=self.browser_config)
+        await browser.get_playwright_browser()
+        self.launch_count += 1
+        BROWSER_LAUNCHES.inc()
+        logger.info(f"Launched pooled browser ({len(self._browsers) + 1}/{self.size})")
+        # The processes this launch started, when the driver's own PID can't be read
+        driver_pid: Optional[int] = _driver_pid(browser)
+        root_pids: List[int] = [driver_pid] if driver_pid is not None else sorted(_child_pids() - children_before)
+        return PooledBrowser(browser=browser, root_pids=root_pids)
+
+    async def _checkout(self) -> PooledBrowser:
+        """
+        Pick the least loaded healthy browser, launching or replacing browsers as needed.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            # Health check - drop browsers whose process died or disconnected, draining those still lending contexts
+            for pooled in list(self._browsers):
+                if not pooled.is_healthy():
+                    if pooled.active_contexts == 0:
+                        logger.warning("Replacing unhealthy pooled browser")
+                        await self._retire(pooled)
+                    elif not pooled.retiring:
+                        logger.warning("Draining unhealthy pooled browser")
+                        pooled.retiring = True
+
+            available = [pooled for pooled in self._browsers if not pooled.retiring and pooled.is_healthy()]
+            if len(available) < self.size:
+                pooled = await self._launch()
+                self._browsers.append(pooled)
+            else:
+                pooled = min(available, key=lambda candidate: candidate.active_contexts)
+
+            pooled.active_contexts += 1
+            pooled.uses += 1
+            return pooled
+
+    async def _checkin(self, pooled: PooledBrowser) -> None:
+        pooled.active_contexts -= 1
+
+        if not pooled.retiring and not pooled.is_healthy():
+            logger.warning("Pooled browser became unhealthy, draining it")
+            pooled.retiring = True
+        elif not pooled.retiring and pooled.uses >= self.max_uses:
+            pooled.retiring = True
+        elif not pooled.retiring and self.max_memory_mb is not None and pooled.root_pids:
+            rss_mb = process_tree_rss_mb(pooled.root_pids)
+            if rss_mb is not None and rss_mb > self.max_memory_mb:
+                logger.info(f"Browser memory at {rss_mb:.0f} MB exceeds {self.max_memory_mb} MB, recycling")
+                pooled.retiring = True
+
+        if pooled.retiring and pooled.active_contexts == 0:
+            await self._retire(pooled)
+
+    async def _retire(self, pooled: PooledBrowser) -> None:
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        await pooled.browser.close()
+
+    @contextlib.asynccontextmanager
+    async def context(self) -> AsyncIterator[BrowserContext]:
+        """
+        Borrow an isolated browser context. The context is closed and the browser returned to the pool on exit.
+        Must be used on the pool's event loop (see run()).
+        """
+        pooled = await self._checkout()
+        try:
+            browser_context = await pooled.browser.new_context(self.browser_config.new_context_config)
+        except BaseException:
+            # The checkout must be returned, or the browser could never drain or be retired
+            await self._checkin(pooled)
+            raise
+        try:
+            yield browser_context
+        finally:
+            try:
+                await browser_context.close()
+            finally:
+                await self._checkin(pooled)
+
+    async def warm(self) -> None:
+        """
+        Launch browsers up to the pool size so the first searches skip the cold start.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while len(self._browsers) < self.size:
+                self._browsers.append(await self._launch())
+
+    def start_warmup(self) -> None:
+        """
+        Schedule warm() on the pool's event loop without waiting for it.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.warm(), self.loop)
+        future.add_done_callback(
+            lambda done: done.exception() and logger.error(f"Browser pool warmup failed: {done.exception()}")
+        )
+
+    async def close(self) -> None:
+        """
+        Close every browser in the pool.
+        """
+        for pooled in list(self._browsers):
+            await self._retire(pooled)
+
+    def shutdown(self) -> None:
+        """
+        Close all browsers and stop the pool's event loop.
+        """
+        if self._loop is None or not self._loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.close(), self._loop).result(timeout=30)
+        except Exception as e:
+            logger.error(f"Error closing browser pool: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Get the process-wide browser pool, configured from Django settings.
+
+    Returns:
+        BrowserPool: The shared pool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                size=getattr(settings, "BROWSER_POOL_SIZE", DEFAULT_POOL_SIZE),
+                max_uses=getattr(settings, "BROWSER_POOL_MAX_USES", DEFAULT_MAX_USES),
+                max_memory_mb=getattr(settings, "BROWSER_POOL_MAX_MEMORY_MB", DEFAULT_MAX_MEMORY_MB),
+                browser_config=BrowserConfig(headless=getattr(settings, "BROWSER_POOL_HEADLESS", DEFAULT_HEADLESS)),
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def start_browser_warmup() -> None:
+    """
+    Start launching the pool's browsers in the background, if BROWSER_POOL_WARMUP is on.
+    Called when a server starts (the ASGI lifespan startup, or loading the WSGI application), so management
+    commands and tests that only import the app don't launch browsers.
+    """
+    if getattr(settings, "BROWSER_POOL_WARMUP", DEFAULT_WARMUP):
+        get_browser_pool().start_warmup()
@@ -0,0 +1,399 @@
+import atexit
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import (
+    CatalogProduct,
+    CatalogQuery,
+    CatalogQueryResult,
+    PriceHistory,
+    Product,
+    SourcedFromEnum,
+    StructuredSearchQuery,
+)
+from .result_cache import result_cache_key
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_MAX_AGE: float = 6 * 60 * 60
+DEFAULT_FLUSH_INTERVAL: float = 1.0
+DEFAULT_BATCH_SIZE: int = 500
+DEFAULT_POPULAR_WINDOW: float = 7 * 24 * 60 * 60
+
+
+@dataclass
+class PendingRequest:
+    """
+    A search for a query on a website, waiting to be counted.
+    """
+    key: str
+    website: SourcedFromEnum
+    structured_query: StructuredSearchQuery
+    search_string: str
+    requested_at: datetime
+
+
+@dataclass
+class PendingScrape:
+    """
+    Products scraped for a query on a website, waiting to be written.
+    """
+    key: str
+    website: SourcedFromEnum
+    structured_query: StructuredSearchQuery
+    search_string: str
+    products: List[Product]
+    scraped_at: datetime
+
+
+class CatalogStore:
+    """
+    Persistent catalog of scraped products with their price history, in the Django database.
+
+    Each (structured query, website) pair remembers its ranked products, how often it is requested and when it
+    was last scraped, so searches can be served from the catalog while it is fresh enough and a worker can keep
+    popular queries refreshed. Writes are queued and flushed in batches, one transaction per batch, by a
+    background thread.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_age: float = DEFAULT_MAX_AGE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.enabled = enabled
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.counters: Dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "products_written": 0,
+            "price_changes": 0,
+            "last_flush_ms": 0.0,
+        }
+        self._requests: List[PendingRequest] = []
+        self._scrapes: List[PendingScrape] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+
+    def lookup(self, structured_query: StructuredSearchQuery, website: SourcedFromEnum) -> Optional[List[Product]]:
+        """
+        Get a website's products for a query from the catalog, if they were scraped within the maximum age.
+
+        Args:
+            structured_query: The parsed query
+            website: The website the products come from
+
+        Returns:
+            list[Product] | None: The products in the website's ranking order, or None if the catalog has no fresh
+            entry with products
+        """
+        if not self.enabled:
+            return None
+
+        query: Optional[CatalogQuery] = CatalogQuery.objects.filter(
+            key=result_cache_key(structured_query, website),
+            refreshed_at__gte=timezone.now() - timedelta(seconds=self.max_age),
+        ).first()
+        if query is None:
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+
+        results = CatalogQueryResult.objects.filter(query=query, product__sourced_from=website.value)
+        if structured_query.max_price is not None and structured_query.max_price > 0:
+            # Price-bounded lookups use the (sourced_from, selling_price) index
+            results = results.filter(product__selling_price__lte=structured_query.max_price)
+        products: List[Product] = [result.product.to_product() for result in results.select_related("product").order_by("rank")]
+        # An entry with no products left is no answer, so the site is searched instead
+        with self._lock:
+            self.counters["hits" if products else "misses"] += 1
+        return products or None
+
+    async def alookup(self, structured_query: StructuredSearchQuery, website: SourcedFromEnum) -> Optional[List[Product]]:
+        """
+        Async version of lookup(), running the query in a worker thread.
+        """
+        if not self.enabled:
+            return None
+        return await sync_to_async(self.lookup)(structured_query, website)
+
+    def record_request(self, structured_query: StructuredSearchQuery, search_string: str, website: SourcedFromEnum) -> None:
+        """
+        Queue a search of a query on a website, so popular queries can be refreshed in the background.
+        """
+        if not self.enabled:
+            return
+        self._enqueue(requests=[PendingRequest(
+            key=result_cache_key(structured_query, website),
+            website=website,
+            structured_query=structured_query,
+            search_string=search_string,
+            requested_at=timezone.now(),
+        )])
+
+    def record_scrape(
+        self,
+        structured_query: StructuredSearchQuery,
+        search_string: str,
+        website: SourcedFromEnum,
+        products: List[Product],
+    ) -> None:
+        """
+        Queue freshly scraped products of a query on a website for writing.
+        """
+        if not self.enabled:
+            return
+        self._enqueue(scrapes=[PendingScrape(
+            key=result_cache_key(structured_query, website),
+            website=website,
+            structured_query=structured_query,
+            search_string=search_string,
+            products=products,
+            scraped_at=timezone.now(),
+        )])
+
+    def _enqueue(self, requests: Sequence[PendingRequest] = (), scrapes: Sequence[PendingScrape] = ()) -> None:
+        with self._lock:
+            self._requests.extend(requests)
+            self._scrapes.extend(scrapes)
+            pending = len(self._requests) + sum(len(scrape.products) for scrape in self._scrapes)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="catalog-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _write_loop(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Catalog flush failed: {str(e)}")
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        """
+        Write every queued request and scrape in a single transaction.
+
+        Returns:
+            int: Number of products written
+        """
+        with self._flush_lock:
+            with self._lock:
+                requests, self._requests = self._requests, []
+                scrapes, self._scrapes = self._scrapes, []
+            if not requests and not scrapes:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    queries = self._write_queries(requests, scrapes)
+                    written = self._write_scrapes(scrapes, queries)
+            except Exception:
+                # The batch is dropped; the next scrape of these queries writes them again
+                with self._lock:
+                    self.counters["flush_failures"] += 1
+                raise
+
+            with self._lock:
+                self.counters["flushes"] += 1
+                self.counters["products_written"] += written
+                self.counters["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return written
+
+    @staticmethod
+    def _write_queries(requests: List[PendingRequest], scrapes: List[PendingScrape]) -> Dict[str, CatalogQuery]:
+        """
+        Create or update the queries touched by a batch, returning them by key.
+        """
+        pending_by_key: Dict[str, PendingRequest] = {}
+        counts: Dict[str, int] = {}
+        for request in requests:
+            pending_by_key[request.key] = request
+            counts[request.key] = counts.get(request.key, 0) + 1
+        for scrape in scrapes:
+            pending_by_key.setdefault(scrape.key, PendingRequest(
+                key=scrape.key,
+                website=scrape.website,
+                structured_query=scrape.structured_query,
+                search_string=scrape.search_string,
+                requested_at=scrape.scraped_at,
+            ))
+
+        queries: Dict[str, CatalogQuery] = CatalogQuery.objects.in_bulk(list(pending_by_key), field_name="key")
+        existing_queries: List[CatalogQuery] = list(queries.values())
+        new_queries: List[CatalogQuery] = []
+        for key, pending in pending_by_key.items():
+            query = queries.get(key)
+            if query is None:
+                query = CatalogQuery(
+                    key=key,
+                    sourced_from=pending.website.value,
+                    structured_query=pending.structured_query.model_dump(mode="json"),
+                    search_string=pending.search_string,
+                )
+                new_queries.append(query)
+                queries[key] = query
+            if key in counts:
+                query.request_count += counts[key]
+                query.last_requested_at = pending.requested_at
+        for scrape in scrapes:
+            queries[scrape.key].refreshed_at = scrape.scraped_at
+
+        CatalogQuery.objects.bulk_create(new_queries)
+        CatalogQuery.objects.bulk_update(existing_queries, ["request_count", "last_requested_at", "refreshed_at"])
+        if new_queries and new_queries[0].pk is None:
+            # Backends that don't return primary keys from bulk inserts
+            queries.update(CatalogQuery.objects.in_bulk([query.key for query in new_queries], field_name="key"))
+        return queries
+
+    def _write_scrapes(self, scrapes: List[PendingScrape], queries: Dict[str, CatalogQuery]) -> int:
+        """
+        Upsert scraped products, append price changes to their history and replace each query's ranking.
+        """
+        latest: Dict[str, PendingScrape] = {}
+        listings: Dict[str, Product] = {}
+        for scrape in scrapes:
+            latest[scrape.key] = scrape
+            for product in scrape.products:
+                listings[product.product_url] = product
+        if not listings:
+            return 0
+
+        now = timezone.now()
+        existing: Dict[str, CatalogProduct] = CatalogProduct.objects.in_bulk(list(listings), field_name="product_url")
+        new_products: List[CatalogProduct] = []
+        changed_products: List[CatalogProduct] = []
+        price_changed: List[CatalogProduct] = []
+        for url, product in listings.items():
+            stored = existing.get(url)
+            if stored is None:
+                stored = CatalogProduct(product_url=url, first_seen_at=now)
+                new_products.append(stored)
+                existing[url] = stored
+                price_changed.append(stored)
+            else:
+                changed_products.append(stored)
+                if stored.selling_price != product.selling_price or stored.maximum_retail_price != product.maximum_retail_price:
+                    price_changed.append(stored)
+            stored.product_name = product.product_name
+            stored.product_image_url = product.product_image_url
+            stored.maximum_retail_price = product.maximum_retail_price
+            stored.discount_percentage = product.discount_percentage
+            stored.selling_price = product.selling_price
+            stored.sourced_from = product.sourced_from.value
+            stored.updated_at = now
+
+        CatalogProduct.objects.bulk_create(new_products, batch_size=self.batch_size)
+        CatalogProduct.objects.bulk_update(
+            changed_products,
+            ["product_name", "product_image_url", "maximum_retail_price", "discount_percentage", "selling_price", "updated_at"],
+            batch_size=self.batch_size,
+        )
+        if new_products and new_products[0].pk is None:
+            existing.update(CatalogProduct.objects.in_bulk([product.product_url for product in new_products], field_name="product_url"))
+
+        PriceHistory.objects.bulk_create(
+            [
+                PriceHistory(
+                    product=existing[stored.product_url],
+                    selling_price=stored.selling_price,
+                    maximum_retail_price=stored.maximum_retail_price,
+                    recorded_at=now,
+                )
+                for stored in price_changed
+            ],
+            batch_size=self.batch_size,
+        )
+
+        # Replace the ranked results of every query scraped in this batch
+        CatalogQueryResult.objects.filter(query__in=[queries[key] for key in latest]).delete()
+        results: List[CatalogQueryResult] = []
+        for key, scrape in latest.items():
+            seen = set()
+            for rank, product in enumerate(scrape.products):
+                if product.product_url in seen:
+                    continue
+                seen.add(product.product_url)
+                results.append(CatalogQueryResult(query=queries[key], product=existing[product.product_url], rank=rank))
+        CatalogQueryResult.objects.bulk_create(results, batch_size=self.batch_size)
+
+        with self._lock:
+            self.counters["price_changes"] += len(price_changed) - len(new_products)
+        return len(listings)
+
+    def popular_queries(self, limit: int, refresh_after: float, window: float = DEFAULT_POPULAR_WINDOW) -> List[CatalogQuery]:
+        """
+        The most requested queries of the recent window whose products are older than refresh_after seconds.
+
+        Args:
+            limit: Maximum number of queries
+            refresh_after: Age in seconds after which a query's products are due for a refresh
+            window: Only queries requested within this many seconds count
+
+        Returns:
+            list[CatalogQuery]: Queries due for a refresh, most requested first
+        """
+        now = timezone.now()
+        due = CatalogQuery.objects.filter(last_requested_at__gte=now - timedelta(seconds=window)).exclude(
+            refreshed_at__gte=now - timedelta(seconds=refresh_after)
+        )
+        return list(due.order_by("-request_count")[:limit])
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit/miss and write counters plus the number of writes waiting for the next flush.
+        """
+        with self._lock:
+            return {
+                **self.counters,
+                "pending_requests": len(self._requests),
+                "pending_scrapes": len(self._scrapes),
+            }
+
+
+_catalog: Optional[CatalogStore] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> CatalogStore:
+    """
+    Get the process-wide catalog store, configured from Django settings.
+
+    Returns:
+        CatalogStore: The shared store
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = CatalogStore(
+                enabled=getattr(settings, "CATALOG_ENABLED", True),
+                max_age=getattr(settings, "CATALOG_MAX_AGE", DEFAULT_MAX_AGE),
+                flush_interval=getattr(settings, "CATALOG_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL),
+                batch_size=getattr(settings, "CATALOG_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+            )
+        return _catalog
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+from django.conf import settings
+
+from .models import SourcedFromEnum, StructuredSearchQuery
+from .result_cache import result_cache_key
+from .search import ProgressCallback
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_ENABLED: bool = True
+
+T = TypeVar("T")
+
+
+def flight_key(structured_query: StructuredSearchQuery, website: SourcedFromEnum, page: int = 1) -> str:
+    """
+    Key of a site search: the normalized query the site's results depend on, the site and the results page.
+    """
+    return f"{result_cache_key(structured_query, website)}:{page}"
+
+
+class Flight(Generic[T]):
+    """
+    One running site search and the requests waiting on it.
+    Progress events are kept so a request joining late replays what it missed before receiving live ones.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.task: Optional["asyncio.Task[T]"] = None
+        self.waiters: int = 0
+        self.events: List[Dict[str, Any]] = []
+        self.subscribers: List[ProgressCallback] = []
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        """
+        Progress callback of the search: records the event and forwards it to every subscribed stream.
+        """
+        self.events.append(event)
+        for subscriber in list(self.subscribers):
+            try:
+                await subscriber(event)
+            except Exception as e:
+                logger.warning(f"Progress subscriber of a shared search failed: {str(e)}")
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight site searches, so a trending query starts one agent per site however many
+    requests ask for it at once.
+
+    The first request for a key starts the search as its own task; concurrent duplicates wait on the same task
+    and subscribe to its progress events. The search is reference-counted by its waiters: a waiter that is
+    cancelled or runs out of time only stops waiting, and the search itself is cancelled when the last waiter
+    has gone. Flights live on the browser pool's event loop; counters are safe to read from any thread.
+    """
+
+    def __init__(self, enabled: bool = DEFAULT_ENABLED):
+        self.enabled = enabled
+        self.counters: Dict[str, int] = {"started": 0, "joined": 0, "abandoned": 0}
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+
+    def _finished(self, flight: Flight, task: "asyncio.Task[Any]") -> None:
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        # Failures are raised to the waiters; this only marks them retrieved when no waiter is left
+        if not task.cancelled():
+            task.exception()
+
+    async def run(
+        self,
+        key: str,
+        search: Callable[[Optional[ProgressCallback]], Awaitable[T]],
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> T:
+        """
+        Run a site search, or wait on the identical one already running.
+
+        Args:
+            key: Key of the search, from flight_key()
+            search: Coroutine function running the search, given the progress callback to report to
+            on_progress: Optional callback receiving this request's progress events
+
+        Returns:
+            The search's result, shared with every request that waited on it
+        """
+        if not self.enabled:
+            return await search(on_progress)
+
+        with self._lock:
+            flight: Optional[Flight[T]] = self._flights.get(key)
+            joined: bool = flight is not None
+            if flight is None:
+                flight = self._flights[key] = Flight(key)
+            self.counters["joined" if joined else "started"] += 1
+        if not joined:
+            flight.task = asyncio.ensure_future(search(flight.publish))
+            flight.task.add_done_callback(lambda task: self._finished(flight, task))
+        flight.waiters += 1
+
+        try:
+            if on_progress is not None:
+                missed: List[Dict[str, Any]] = list(flight.events)
+                flight.subscribers.append(on_progress)
+                for event in missed:
+                    await on_progress(event)
+            # Shielded, so a waiter going away doesn't cancel the search for the others
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if on_progress is not None and on_progress in flight.subscribers:
+                flight.subscribers.remove(on_progress)
+            if flight.waiters == 0 and not flight.task.done():
+                logger.info("Every request waiting on a search left, cancelling it")
+                with self._lock:
+                    self.counters["abandoned"] += 1
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                flight.task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Searches started, requests that joined one already running, searches abandoned by every waiter,
+        and searches currently in flight.
+        """
+        with self._lock:
+            return {**self.counters, "in_flight": len(self._flights)}
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Get the process-wide search coalescer, configured from Django settings.
+
+    Returns:
+        SingleFlight: The shared coalescer
+    """
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight(enabled=getattr(settings, "SEARCH_COALESCING_ENABLED", DEFAULT_ENABLED))
+        return _single_flight
@@ -0,0 +1,316 @@
+import json
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Type
+from urllib.parse import quote, quote_plus
+
+from bs4 import BeautifulSoup
+from browser_use.browser.context import BrowserContext
+from pydantic import ValidationError
+
+from .filters import SiteFilters
+from .models import Product, SourcedFromEnum
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Same cap the agent prompt uses for the first results page
+MAX_PRODUCTS_PER_SITE: int = 10
+
+PRICE_PATTERN = re.compile(r"₹\s*([\d,]+(?:\.\d+)?)")
+
+
+class ExtractorParseError(Exception):
+    """
+    Raised when a page doesn't carry the results data an extractor reads, such as after a site redesign.
+    """
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """
+    Parse a price given as a number or as text such as "₹1,299".
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    digits = re.sub(r"[^\d.]", "", str(value))
+    return float(digits) if digits else None
+
+
+def absolute_url(url: str, base_url: str) -> str:
+    """
+    Turn relative, protocol-relative and plain http links into complete https links.
+    """
+    if url.startswith("//"):
+        return f"https:{url}"
+    if url.startswith("http://"):
+        return f"https://{url[len('http://'):]}"
+    if url.startswith("/"):
+        return f"{base_url}{url}"
+    if not url.startswith("https://"):
+        return f"{base_url}/{url}"
+    return url
+
+
+def embedded_json(html: str, variable: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract a JSON object assigned to a window variable in an inline script, e.g. ``window.__myx = {...}``.
+    """
+    match = re.search(rf"{re.escape(variable)}\s*=\s*", html)
+    if not match:
+        return None
+    try:
+        state, _ = json.JSONDecoder().raw_decode(html, match.end())
+    except ValueError:
+        return None
+    return state if isinstance(state, dict) else None
+
+
+class SiteExtractor(ABC):
+    """
+    Deterministic fast path for a site: open its search URL directly and parse the results page.
+    Subclasses implement search_url() and parse().
+    """
+    website: SourcedFromEnum
+    base_url: str
+    # Query parameter selecting a results page after the first
+    page_param: str = "page"
+
+    @abstractmethod
+    def search_url(self, search_query: str) -> str:
+        """
+        URL of the site's results page for a search string.
+        """
+
+    @abstractmethod
+    def parse(self, html: str) -> List[Product]:
+        """
+        Products listed on a results page, in the site's ranking order.
+        Raises ExtractorParseError when the page isn't one the extractor can read; a results page listing
+        nothing gives an empty list.
+        """
+
+    def build_product(self, **fields: Any) -> Optional[Product]:
+        """
+        Build a Product from scraped fields, skipping entries that are missing required data.
+        """
+        if not fields.get("product_name"):
+            return None
+        try:
+            return Product(sourced_from=self.website, **fields)
+        except ValidationError as e:
+            logger.debug(f"Skipping incomplete {self.website.value} product: {str(e)}")
+            return None
+
+    def filtered_search_url(self, search_query: str, filters: Optional[SiteFilters] = None, page: int = 1) -> str:
+        """
+        The search URL of a results page, with the site's own filters for the query's other constraints applied.
+        """
+        search_url = self.search_url(search_query)
+        if filters is not None:
+            search_url = filters.apply(search_url)
+        if page > 1:
+            search_url = f"{search_url}{'&' if '?' in search_url else '?'}{self.page_param}={page}"
+        return search_url
+
+    async def extract(
+        self,
+        browser_context: BrowserContext,
+        search_query: str,
+        filters: Optional[SiteFilters] = None,
+        page_number: int = 1,
+    ) -> List[Product]:
+        """
+        Load a search results page in the given browser context and parse it.
+
+        Args:
+            browser_context: Isolated context borrowed from the browser pool
+            search_query: The standardized search string
+            filters: Optional URL filters translated from the structured query
+            page_number: Results page to load, from 1
+
+        Returns:
+            list[Product]: Products found on the results page
+
+        Raises:
+            ExtractorParseError: The page doesn't carry the site's results data
+        """
+        page = await browser_context.get_current_page()
+        await page.goto(self.filtered_search_url(search_query, filters, page_number), wait_until="domcontentloaded")
+        return self.parse(await page.content())[:MAX_PRODUCTS_PER_SITE]
+
+
+EXTRACTORS: Dict[SourcedFromEnum, SiteExtractor] = {}
+
+
+def register_extractor(extractor_class: Type[SiteExtractor]) -> Type[SiteExtractor]:
+    """
+    Class decorator adding an extractor to the registry under its website.
+    """
+    EXTRACTORS[extractor_class.website] = extractor_class()
+    return extractor_class
+
+
+def get_extractor(website: SourcedFromEnum) -> Optional[SiteExtractor]:
+    """
+    Get the registered extractor for a website, if there is one.
+    """
+    return EXTRACTORS.get(website)
+
+
+@register_extractor
+class MyntraExtractor(SiteExtractor):
+    """
+    Myntra renders search results from the ``window.__myx`` state object.
+    """
+    website = SourcedFromEnum.myntra
+    base_url = "https://www.myntra.com"
+    page_param = "p"
+
+    def search_url(self, search_query: str) -> str:
+        slug = re.sub(r"[^a-z0-9]+", "-", search_query.lower()).strip("-")
+        return f"{self.base_url}/{quote(slug)}?rawQuery={quote(search_query)}"
+
+    def parse(self, html: str) -> List[Product]:
+        state = embedded_json(html, "window.__myx")
+        if state is None:
+            raise ExtractorParseError("No window.__myx state on the page")
+        items = state.get("searchData", {}).get("results", {}).get("products", [])
+
+        products: List[Product] = []
+        for item in items:
+            product = self.build_product(
+                product_name=item.get("productName") or " ".join(filter(None, [item.get("brand"), item.get("additionalInfo")])),
+                product_url=absolute_url(item.get("landingPageUrl", ""), self.base_url),
+                product_image_url=absolute_url(item.get("searchImage", ""), self.base_url),
+                maximum_retail_price=parse_price(item.get("mrp")),
+                selling_price=parse_price(item.get("price")),
+            )
+            if product:
+                products.append(product)
+        return products
+
+
+@register_extractor
+class AjioExtractor(SiteExtractor):
+    """
+    Ajio renders search results from the ``window.__PRELOADED_STATE__`` redux store.
+    """
+    website = SourcedFromEnum.ajio
+    base_url = "https://www.ajio.com"
+
+    def search_url(self, search_query: str) -> str:
+        return f"{self.base_url}/search/?text={quote_plus(search_query)}"
+
+    def parse(self, html: str) -> List[Product]:
+        state = embedded_json(html, "window.__PRELOADED_STATE__")
+        if state is None:
+            raise ExtractorParseError("No window.__PRELOADED_STATE__ store on the page")
+        grid = state.get("grid", {})
+        entities: Dict[str, Any] = grid.get("entities", {})
+        order: List[str] = grid.get("results") or list(entities)
+
+        products: List[Product] = []
+        for key in order:
+            item = entities.get(key, {})
+            images = item.get("images") or [{}]
+            brand = item.get("fnlColorVariantData", {}).get("brandName")
+            product = self.build_product(
+                product_name=" ".join(filter(None, [brand, item.get("name")])),
+                product_url=absolute_url(item.get("url", ""), self.base_url),
+                product_image_url=absolute_url(images[0].get("url", ""), self.base_url),
+                maximum_retail_price=parse_price((item.get("wasPriceData") or {}).get("value")),
+                selling_price=parse_price((item.get("price") or {}).get("value")),
+            )
+            if product:
+                products.append(product)
+        return products
+
+
+@register_extractor
+class MeeshoExtractor(SiteExtractor):
+    """
+    Meesho is a Next.js app; search results are in the ``__NEXT_DATA__`` script.
+    """
+    website = SourcedFromEnum.meesho
+    base_url = "https://www.meesho.com"
+
+    def search_url(self, search_query: str) -> str:
+        return f"{self.base_url}/search?q={quote_plus(search_query)}"
+
+    @staticmethod
+    def _listing_items(node: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Walk the page props and yield product-like entries, so small layout changes don't break parsing.
+        """
+        if isinstance(node, dict):
+            if "name" in node and "product_id" in node and "min_product_price" in node:
+                yield node
+                return
+            for value in node.values():
+                yield from MeeshoExtractor._listing_items(value)
+        elif isinstance(node, list):
+            for value in node:
+                yield from MeeshoExtractor._listing_items(value)
+
+    def parse(self, html: str) -> List[Product]:
+        script = BeautifulSoup(html, "html.parser").find("script", id="__NEXT_DATA__")
+        if script is None or not script.string:
+            raise ExtractorParseError("No __NEXT_DATA__ script on the page")
+        try:
+            data = json.loads(script.string)
+        except ValueError as e:
+            raise ExtractorParseError(f"Unreadable __NEXT_DATA__ script: {str(e)}")
+
+        products: List[Product] = []
+        for item in self._listing_items(data.get("props", {})):
+            images = item.get("images") or [item.get("image", "")]
+            product = self.build_product(
+                product_name=item.get("name"),
+                product_url=f"{self.base_url}/{item.get('slug', 'product')}/p/{item.get('product_id')}",
+                product_image_url=absolute_url(images[0], self.base_url),
+                maximum_retail_price=parse_price(item.get("original_price")),
+                selling_price=parse_price(item.get("min_product_price")),
+            )
+            if product:
+                products.append(product)
+        return products
+
+
+@register_extractor
+class FlipkartExtractor(SiteExtractor):
+    """
+    Flipkart's class names are obfuscated, so cards are found by their ``data-id`` attribute and product links.
+    With no results data to look for, a page without cards is read as an empty results page.
+    """
+    website = SourcedFromEnum.flipkart
+    base_url = "https://www.flipkart.com"
+
+    def search_url(self, search_query: str) -> str:
+        return f"{self.base_url}/search?q={quote_plus(search_query)}"
+
+    def parse(self, html: str) -> List[Product]:
+        soup = BeautifulSoup(html, "html.parser")
+
+        products: List[Product] = []
+        for card in soup.select("div[data-id]"):
+            link = card.select_one("a[href*='/p/']")
+            image = card.find("img")
+            if link is None or image is None:
+                continue
+
+            # Cards list the selling price first, followed by the struck-through MRP
+            prices = [parse_price(price) for price in PRICE_PATTERN.findall(card.get_text(" "))]
+            title = card.select_one("a[title]")
+            product = self.build_product(
+                product_name=(title["title"] if title else image.get("alt", "")).strip(),
+                product_url=absolute_url(link["href"].split("?")[0], self.base_url),
+                product_image_url=absolute_url(image.get("src", ""), self.base_url),
+                maximum_retail_price=prices[1] if len(prices) > 1 else None,
+                selling_price=prices[0] if prices else None,
+            )
+            if product:
+                products.append(product)
+        return products
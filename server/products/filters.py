@@ -0,0 +1,275 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Type
+from urllib.parse import quote, unquote, urlencode, urlsplit, urlunsplit
+
+from .models import GenderEnum, Product, SizeEnum, SourcedFromEnum, StructuredSearchQuery
+from .product_index import GENDER_CODES, GENDER_TOKENS, tokenize
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Names of the StructuredSearchQuery constraints a translator can push into a site's URL
+PRICE: str = "price"
+GENDER: str = "gender"
+SIZES: str = "sizes"
+COLORS: str = "colors"
+
+# Words a product name uses to state its color or material; a name stating only others contradicts the query
+COLOR_WORDS: Set[str] = {
+    "black", "white", "blue", "navy", "grey", "red", "green", "olive", "beige", "brown", "pink", "maroon",
+    "yellow", "orange", "purple", "khaki", "cream", "teal", "mustard", "lavender", "peach", "charcoal", "tan",
+    "multi",
+}
+# Spellings of the same color, mapped onto the one in COLOR_WORDS
+COLOR_SYNONYMS: Dict[str, str] = {"gray": "grey", "multicolor": "multi", "offwhite": "white"}
+MATERIAL_WORDS: Set[str] = {
+    "cotton", "denim", "linen", "polyester", "silk", "wool", "woollen", "leather", "rayon", "nylon", "viscose",
+    "satin", "velvet", "suede", "canvas", "chiffon", "georgette", "fleece", "lycra", "spandex", "khadi", "jute",
+}
+
+
+@dataclass
+class SiteFilters:
+    """
+    A structured query translated for one website: the text to search for, the URL parameters applying
+    the query's other constraints as the site's own filters, and which constraints those parameters cover.
+    """
+    search_text: str
+    params: List[Tuple[str, str]] = field(default_factory=list)
+    pushed: Set[str] = field(default_factory=set)
+
+    def apply(self, search_url: str) -> str:
+        """
+        Append the filter parameters to a search results URL.
+        """
+        if not self.params:
+            return search_url
+        separator = "&" if "?" in search_url else "?"
+        return f"{search_url}{separator}{urlencode(self.params, quote_via=quote)}"
+
+
+class FilterTranslator:
+    """
+    Maps a structured query onto a site's URL filter parameters.
+    Subclasses override the methods for the constraints the site can filter on and return None for the rest,
+    and list the URL parameters their filters are written to in param_names.
+    """
+    website: SourcedFromEnum
+    param_names: Tuple[str, ...] = ()
+
+    def price(self, min_price: Optional[float], max_price: Optional[float]) -> Optional[List[Tuple[str, str]]]:
+        return None
+
+    def gender(self, gender: GenderEnum) -> Optional[List[Tuple[str, str]]]:
+        return None
+
+    def sizes(self, sizes: List[SizeEnum]) -> Optional[List[Tuple[str, str]]]:
+        return None
+
+    def colors(self, colors: List[str]) -> Optional[List[Tuple[str, str]]]:
+        return None
+
+    def translate(self, structured_query: StructuredSearchQuery) -> SiteFilters:
+        """
+        Translate a structured query into the site's search text and filter parameters.
+        Constraints the site can't filter on stay in the search text, except prices, which search boxes don't
+        understand; the post-filter enforces those.
+
+        Args:
+            structured_query: The parsed query
+
+        Returns:
+            SiteFilters: The search text, URL parameters and pushed constraints
+        """
+        filters = SiteFilters(search_text="")
+        constraints = []
+        if (structured_query.min_price or 0) > 0 or (structured_query.max_price or 0) > 0:
+            constraints.append((PRICE, lambda: self.price(structured_query.min_price or None, structured_query.max_price or None)))
+        if structured_query.gender:
+            constraints.append((GENDER, lambda: self.gender(structured_query.gender)))
+        if structured_query.item_sizes:
+            constraints.append((SIZES, lambda: self.sizes(structured_query.item_sizes)))
+        if structured_query.item_colors:
+            constraints.append((COLORS, lambda: self.colors(structured_query.item_colors)))
+
+        for name, translate in constraints:
+            params = translate()
+            if params is not None:
+                filters.params.extend(params)
+                filters.pushed.add(name)
+
+        parts: List[str] = []
+        if structured_query.gender and GENDER not in filters.pushed:
+            parts.append(structured_query.gender.value)
+        if structured_query.material:
+            parts.append(structured_query.material)
+        if structured_query.item_colors and COLORS not in filters.pushed:
+            parts.extend(structured_query.item_colors)
+        parts.append(structured_query.item_name)
+        if structured_query.item_sizes and SIZES not in filters.pushed:
+            parts.append(f"size {' '.join(size.value for size in structured_query.item_sizes)}")
+        filters.search_text = " ".join(parts)
+        return filters
+
+
+    def strip(self, url: str) -> str:
+        """
+        Remove the site's filter parameters from a URL, leaving every other parameter as it was written.
+        """
+        parts = urlsplit(url)
+        if not self.param_names or not parts.query:
+            return url
+        kept = [
+            param for param in parts.query.split("&")
+            if unquote(param.split("=", 1)[0]) not in self.param_names
+        ]
+        return urlunsplit(parts._replace(query="&".join(kept)))
+
+
+FILTER_TRANSLATORS: Dict[SourcedFromEnum, FilterTranslator] = {}
+
+
+def register_filter_translator(translator_class: Type[FilterTranslator]) -> Type[FilterTranslator]:
+    """
+    Class decorator adding a filter translator to the registry under its website.
+    """
+    FILTER_TRANSLATORS[translator_class.website] = translator_class()
+    return translator_class
+
+
+def translate_filters(website: SourcedFromEnum, structured_query: StructuredSearchQuery) -> SiteFilters:
+    """
+    Translate a structured query for a website, pushing nothing down for sites without a translator.
+    """
+    return FILTER_TRANSLATORS.get(website, FilterTranslator()).translate(structured_query)
+
+
+def strip_filters(website: SourcedFromEnum, url: str) -> str:
+    """
+    Remove a website's filter parameters from one of its URLs, such as constraints of an earlier query.
+    """
+    return FILTER_TRANSLATORS.get(website, FilterTranslator()).strip(url)
+
+
+@register_filter_translator
+class MyntraFilters(FilterTranslator):
+    """
+    Myntra takes list facets in ``f`` ("Gender:men,men women::Size_Facet:M") and ranges in ``rf``.
+    Color facets need Myntra's internal color codes, so colors stay in the search text.
+    """
+    website = SourcedFromEnum.myntra
+    param_names = ("f", "rf")
+
+    def translate(self, structured_query):
+        filters = super().translate(structured_query)
+        # List facets share one "f" parameter, separated by "::"
+        facets = [value for name, value in filters.params if name == "f"]
+        ranges = [(name, value) for name, value in filters.params if name != "f"]
+        filters.params = ([("f", "::".join(facets))] if facets else []) + ranges
+        return filters
+
+    def price(self, min_price, max_price):
+        low, high = min_price or 0, max_price or 1_000_000
+        return [("rf", f"Price:{low:.1f}_{high:.1f}_{low:.1f} TO {high:.1f}")]
+
+    def gender(self, gender):
+        return [("f", f"Gender:{gender.value.lower()},men women")]
+
+    def sizes(self, sizes):
+        return [("f", f"Size_Facet:{','.join(size.value for size in sizes)}")]
+
+
+@register_filter_translator
+class AjioFilters(FilterTranslator):
+    """
+    Ajio chains facets in a single ``query`` parameter (":relevance:genderfilter:Men:verticalcolorfamily:Black").
+    Its price facet only takes fixed buckets, so prices are left to the post-filter.
+    """
+    website = SourcedFromEnum.ajio
+    param_names = ("query",)
+
+    def translate(self, structured_query):
+        filters = super().translate(structured_query)
+        # Ajio facets go in one parameter, in "relevance" order
+        facets = "".join(f":{name}:{value}" for name, value in filters.params)
+        filters.params = [("query", f":relevance{facets}")] if facets else []
+        return filters
+
+    def gender(self, gender):
+        return [("genderfilter", gender.value)]
+
+    def sizes(self, sizes):
+        return [("verticalsizegroupformat", size.value) for size in sizes]
+
+    def colors(self, colors):
+        return [("verticalcolorfamily", color.title()) for color in colors]
+
+
+@register_filter_translator
+class FlipkartFilters(FilterTranslator):
+    """
+    Flipkart takes repeated ``p[]`` facet parameters ("facets.price_range.from=500", "facets.ideal_for[]=Men").
+    """
+    website = SourcedFromEnum.flipkart
+    param_names = ("p[]",)
+
+    def price(self, min_price, max_price):
+        return [("p[]", f"facets.price_range.from={int(min_price) if min_price else 'Min'}"),
+                ("p[]", f"facets.price_range.to={int(max_price) if max_price else 'Max'}")]
+
+    def gender(self, gender):
+        return [("p[]", f"facets.ideal_for[]={gender.value}")]
+
+    def sizes(self, sizes):
+        return [("p[]", f"facets.size[]={size.value}") for size in sizes]
+
+    def colors(self, colors):
+        return [("p[]", f"facets.color[]={color.title()}") for color in colors]
+
+
+# Meesho applies filters through its search API rather than the URL, so everything is post-filtered
+
+
+def post_filter(structured_query: StructuredSearchQuery, products: List[Product]) -> List[Product]:
+    """
+    Drop products contradicting the query, whatever the site did with the pushed-down filters.
+
+    Prices must be within the bounds. Gender, colors and material are judged from the name: a product is only
+    dropped when its name states the other gender only, or only colors or materials that weren't asked for;
+    names that say nothing either way are kept. Sizes can't be checked on listings and are left to the site.
+
+    Args:
+        structured_query: The parsed query
+        products: Products from any source
+
+    Returns:
+        list[Product]: The products consistent with the query, in their original order
+    """
+    min_price = structured_query.min_price if structured_query.min_price and structured_query.min_price > 0 else None
+    max_price = structured_query.max_price if structured_query.max_price and structured_query.max_price > 0 else None
+    other_gender = 3 - GENDER_CODES[structured_query.gender] if structured_query.gender in GENDER_CODES else 0
+    colors = {COLOR_SYNONYMS.get(token, token) for color in structured_query.item_colors or [] for token in tokenize(color)}
+    materials = set(tokenize(structured_query.material)) if structured_query.material else set()
+
+    def contradicts(tokens: Set[str], wanted: Set[str], vocabulary: Set[str]) -> bool:
+        stated = tokens & vocabulary
+        return bool(wanted and stated) and stated.isdisjoint(wanted)
+
+    kept: List[Product] = []
+    for product in products:
+        if min_price is not None and product.selling_price < min_price:
+            continue
+        if max_price is not None and product.selling_price > max_price:
+            continue
+        tokens = {COLOR_SYNONYMS.get(token, token) for token in tokenize(product.product_name)}
+        if other_gender:
+            gender = 0
+            for token in tokens:
+                gender |= GENDER_TOKENS.get(token, 0)
+            if gender == other_gender:
+                continue
+        if contradicts(tokens, colors, COLOR_WORDS) or contradicts(tokens, materials, MATERIAL_WORDS):
+            continue
+        kept.append(product)
+    return kept
@@ -0,0 +1,232 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern, Set, Tuple
+
+from django.conf import settings
+
+from .filters import COLOR_SYNONYMS, COLOR_WORDS, MATERIAL_WORDS
+from .models import QueryValidationResult, SourcedFromEnum
+from .product_index import GENDER_TOKENS, tokenize
+
+# Defaults, overridable through Django settings
+DEFAULT_ENABLED: bool = True
+DEFAULT_APPROVE_SCORE: int = 3
+DEFAULT_MAX_TOKENS: int = 16
+DEFAULT_MAX_UNKNOWN: int = 1
+
+
+def _words(*groups: str) -> Set[str]:
+    # Vocabulary is written naturally and stored the way queries are tokenized ("T-Shirts" -> "t", "shirt")
+    return {token for group in groups for token in tokenize(group)}
+
+
+# Things people shop for on the supported platforms
+PRODUCT_WORDS: Set[str] = _words(
+    "jeans trousers pants chinos joggers trackpants track shorts cargo cargos leggings jeggings palazzo skirt",
+    "shirt tshirt t-shirt tee polo top tops blouse tunic crop tank vest camisole bodysuit",
+    "kurta kurti kurtas saree sari lehenga salwar churidar dupatta sherwani ethnic anarkali dhoti nehru",
+    "dress gown jumpsuit dungarees romper co-ord",
+    "jacket blazer coat hoodie sweatshirt sweater cardigan pullover shrug windcheater raincoat suit waistcoat",
+    "shoes shoe sneakers sneaker sandals sandal slippers flip-flops flops heels loafers boots boot slides",
+    "moccasins oxfords brogues derby wedges flats bellies juttis mojaris crocs clogs",
+    "socks innerwear bra briefs boxers trunks lingerie nightwear pyjamas pajamas nightsuit loungewear",
+    "thermal swimwear bikini",
+    "watch watches smartwatch sunglasses spectacles cap hat beanie scarf stole muffler gloves tie belt wallet",
+    "bag bags backpack handbag purse clutch sling tote duffel trolley luggage suitcase",
+    "earrings necklace ring bracelet bangles anklet pendant chain jewellery jewelry",
+    "perfume deodorant lipstick kajal foundation serum moisturiser moisturizer sunscreen shampoo facewash",
+    "trimmer shaver dryer straightener",
+    "phone smartphone mobile charger earphones earbuds headphones headphone earpods speaker laptop tablet",
+    "mouse keyboard powerbank tv television",
+    "bedsheet pillow cushion curtain towel blanket quilt comforter mattress mug bottle",
+    "kids baby infant toddler school uniform",
+)
+
+# Words describing a product: colors, materials, fits, styles, sizes and audiences
+ATTRIBUTE_WORDS: Set[str] = _words(
+    " ".join(COLOR_WORDS), " ".join(COLOR_SYNONYMS), " ".join(MATERIAL_WORDS), " ".join(GENDER_TOKENS),
+    "men's mens womens women's boys girls ladies unisex gents kid",
+    "slim skinny regular relaxed loose straight tapered bootcut wide leg oversized baggy fitted fit cropped",
+    "mid high low rise waist sleeve sleeves sleeveless full half long short round neck v-neck collar collared",
+    "hooded zip button printed solid striped checked checkered plain graphic floral embroidered distressed",
+    "ripped washed faded casual formal party wedding festive sports running gym training office daily",
+    "summer winter rain waterproof lightweight stretch stretchable comfort soft warm pure organic",
+    "xs s m l xl xxl xxxl 2xl 3xl small medium large extra plus size sizes uk us eu inch inches",
+    "pack set pair pairs combo piece",
+    "wireless bluetooth noise cancelling cancellation usb type c fast charging smart digital analog",
+    "gold silver rose dark light pastel neon bright matte glossy",
+    "branded designer premium luxury trendy stylish latest new classic vintage ethnic traditional western",
+)
+
+# Shopping phrasing that says nothing either way
+FILLER_WORDS: Set[str] = _words(
+    "find show me some any a an the for with without and or in on from of to at by my i we",
+    "want need looking look search searching buy get shop shopping order please can you help",
+    "under below less than within upto up above over more between around about range price prices priced",
+    "budget cheap cheapest affordable best good nice top rated popular discount discounted offer offers sale deal",
+    "rs inr rupees rupee k only online available color colour colors colours",
+    "that also like similar something",
+)
+
+# Retailers a query may name, supported or not
+PLATFORM_WORDS: Set[str] = _words(
+    " ".join(website.value for website in SourcedFromEnum),
+    "amazon nykaa tatacliq tata cliq snapdeal shoppers stop lifestyle max westside h&m zara uniqlo decathlon",
+)
+
+# Words of conversations, tasks and other non-shopping requests: never approved locally
+OFF_TOPIC_WORDS: Set[str] = _words(
+    "what who why how when where which explain tell write story poem essay joke translate summarize summarise",
+    "capital weather news president history recipe homework calculate solve answer question",
+    "code script function program python javascript sql html password hack crack exploit bypass",
+    "kill bomb weapon drug drugs gun explosive poison",
+    "system assistant ignore instruction instructions override prompt",
+)
+
+# Instructions to the browsing agent rather than descriptions of a product: "... then checkout", "click buy on every item"
+ACTION_WORDS: Set[str] = _words(
+    "click tap press type enter submit fill select scroll open visit navigate go goto redirect login logout signin",
+    "checkout cart pay payment purchase add remove delete upload download send share post email call",
+    "then next afterwards after now every each all",
+)
+
+# Clear prompt injections, code and markup, rejected without asking the LLM
+INJECTION_PATTERNS: List[Tuple[Pattern[str], str]] = [
+    (re.compile(p, re.IGNORECASE), reason) for p, reason in (
+        (r"\b(ignore|disregard|forget|override|bypass)\b.{0,40}\b(instructions?|rules|guidelines|prompts?|polic(y|ies)|above|previous|prior)\b",
+         "Attempt to override system instructions"),
+        (r"\b(system|developer|hidden|initial)\s+(prompt|message|instructions?)\b", "Attempt to access system instructions"),
+        (r"\byou\s+are\s+(now|no\s+longer)\b|\b(act|behave)\s+as\b|\bpretend\b|\bjailbreak|\b(?-i:DAN)\b",
+         "Attempt to modify system behavior"),
+        (r"<\s*/?\s*(system|assistant|user|script|instructions?|iframe|img|svg)\b|```|\{\{|\}\}|\$\{", "Markup or code in query"),
+        (r"\b(rm\s+-rf|sudo|os\.system|subprocess|__import__|eval\s*\(|exec\s*\(|import\s+os|drop\s+table|select\s+\*|curl\s+http)",
+         "Commands or code in query"),
+        (r"\b(print|reveal|repeat|show|output)\b.{0,20}\b(your|the)\s+(prompt|instructions|rules|system)", "Attempt to extract system instructions"),
+    )
+]
+
+# Price and size expressions: "500", "1k", "2000rs", "32x34"
+_NUMBER_PATTERN = re.compile(r"^\d+(k|r|rs|x\d+)?$")
+
+
+@dataclass
+class GuardDecision:
+    """
+    The local guard's verdict on a query: approved or rejected with a result, or escalated to the LLM without one.
+    """
+    result: Optional[QueryValidationResult]
+    score: int
+    reason: str
+
+
+class LocalGuard:
+    """
+    First tier of the query guard: precompiled injection rules and a scored shopping lexicon.
+
+    Clear injections are rejected and clear product searches approved in microseconds; everything in between
+    (unknown words, questions, anything that trips the old sanitizing keywords) is left to the LLM validator.
+    A query is approved when it names a product, uses no off-topic or instruction word, is short, has at most
+    max_unknown unknown words, and product words (3 points), attributes and platforms (1) and numbers (1) outweigh
+    unknown words (-1 each) by approve_score. Product words never buy an unknown tail its way past the LLM.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = DEFAULT_ENABLED,
+        approve_score: int = DEFAULT_APPROVE_SCORE,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        max_unknown: int = DEFAULT_MAX_UNKNOWN,
+    ):
+        self.enabled = enabled
+        self.approve_score = approve_score
+        self.max_tokens = max_tokens
+        self.max_unknown = max_unknown
+        self.counters: Dict[str, int] = {"approved": 0, "rejected": 0, "escalated": 0}
+        self._lock = threading.Lock()
+
+    def decide(self, query: str) -> GuardDecision:
+        """
+        Classify a raw query.
+
+        Args:
+            query: The raw natural language query
+
+        Returns:
+            GuardDecision: The verdict; result is None when the LLM has to decide
+        """
+        for pattern, reason in INJECTION_PATTERNS:
+            if pattern.search(query):
+                return GuardDecision(QueryValidationResult(is_safe=False, reason=reason), -100, reason)
+
+        tokens = tokenize(query.replace("₹", " rs "))
+        if not tokens:
+            return GuardDecision(None, 0, "empty query")
+        if len(tokens) > self.max_tokens:
+            return GuardDecision(None, 0, "long query")
+
+        score, products, unknown = 0, 0, 0
+        for token in tokens:
+            if token in OFF_TOPIC_WORDS:
+                return GuardDecision(None, score, f"off-topic word '{token}'")
+            if token in ACTION_WORDS:
+                return GuardDecision(None, score, f"instruction word '{token}'")
+            if token in PRODUCT_WORDS:
+                score += 3
+                products += 1
+            elif token in ATTRIBUTE_WORDS or token in PLATFORM_WORDS or _NUMBER_PATTERN.match(token):
+                score += 1
+            elif token not in FILLER_WORDS:
+                score -= 1
+                unknown += 1
+        if unknown > self.max_unknown:
+            return GuardDecision(None, score, f"{unknown} unknown words")
+        if products and score >= self.approve_score:
+            return GuardDecision(QueryValidationResult(is_safe=True, reason=None), score, "product search")
+        return GuardDecision(None, score, "uncertain")
+
+    def classify(self, query: str) -> Optional[QueryValidationResult]:
+        """
+        The local verdict on a query, or None when it has to go to the LLM validator.
+        """
+        if not self.enabled:
+            return None
+        decision = self.decide(query)
+        with self._lock:
+            if decision.result is None:
+                self.counters["escalated"] += 1
+            else:
+                self.counters["approved" if decision.result.is_safe else "rejected"] += 1
+        return decision.result
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Approve/reject/escalate counters and the share of queries resolved locally.
+        """
+        with self._lock:
+            total = sum(self.counters.values())
+            resolved = self.counters["approved"] + self.counters["rejected"]
+            return {**self.counters, "resolved_locally": round(resolved / total, 3) if total else 0.0}
+
+
+_local_guard: Optional[LocalGuard] = None
+_local_guard_lock = threading.Lock()
+
+
+def get_local_guard() -> LocalGuard:
+    """
+    Get the process-wide local guard, configured from Django settings.
+
+    Returns:
+        LocalGuard: The shared guard
+    """
+    global _local_guard
+    with _local_guard_lock:
+        if _local_guard is None:
+            _local_guard = LocalGuard(
+                enabled=getattr(settings, "LOCAL_GUARD_ENABLED", DEFAULT_ENABLED),
+                approve_score=getattr(settings, "LOCAL_GUARD_APPROVE_SCORE", DEFAULT_APPROVE_SCORE),
+                max_tokens=getattr(settings, "LOCAL_GUARD_MAX_TOKENS", DEFAULT_MAX_TOKENS),
+                max_unknown=getattr(settings, "LOCAL_GUARD_MAX_UNKNOWN", DEFAULT_MAX_UNKNOWN),
+            )
+        return _local_guard
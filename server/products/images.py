@@ -0,0 +1,378 @@
+import asyncio
+import contextlib
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+import tempfile
+import threading
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import httpx
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .llm_clients import close_with_loop
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_ENABLED: bool = True
+DEFAULT_WIDTH: int = 400
+DEFAULT_MAX_WIDTH: int = 1200
+DEFAULT_QUALITY: int = 75
+DEFAULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+DEFAULT_MAX_SOURCE_BYTES: int = 10 * 1024 * 1024
+DEFAULT_FETCH_TIMEOUT: float = 10.0
+# The marketplaces' image CDNs; their subdomains are allowed too
+DEFAULT_ALLOWED_HOSTS: Tuple[str, ...] = ("myntassets.com", "flixcart.com", "meesho.com", "ajio.com")
+
+# Resizing needs the optional Pillow package; without it images are cached and served as fetched
+PILLOW_AVAILABLE: bool = importlib.util.find_spec("PIL") is not None
+
+PROXY_PATH: str = "/api/img/"
+_SIGNATURE_SALT: str = "products.images.thumbnail"
+# Decoded images beyond this many pixels are refused rather than resized
+_MAX_PIXELS: int = 40_000_000
+# Redirects followed per fetch, each checked against the allowed hosts
+_MAX_REDIRECTS: int = 5
+
+
+class ImageProxyError(Exception):
+    """
+    Raised when a thumbnail cannot be served, with the HTTP status to answer with.
+    """
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Thumbnail:
+    """
+    A thumbnail's bytes, content type and content hash, which doubles as its ETag.
+    """
+    content: bytes
+    content_type: str
+    digest: str
+
+
+class ThumbnailCache:
+    """
+    Content-addressed disk cache of thumbnails with size-based eviction.
+
+    Thumbnails are stored once under the SHA-256 of their bytes (blobs/ab/abcd....webp) and found through small
+    key files naming the blob for each source URL and width. Reads touch the blob, and when the blobs outgrow
+    max_bytes the least recently read are deleted; a key file left pointing at a deleted blob reads as a miss.
+    Writes go through a temporary file and a rename, so concurrent readers never see half a file.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        (self.directory / "blobs").mkdir(parents=True, exist_ok=True)
+        (self.directory / "keys").mkdir(parents=True, exist_ok=True)
+        self._size: int = sum(path.stat().st_size for path in (self.directory / "blobs").glob("*/*") if path.is_file())
+
+    def _blob_path(self, digest: str, content_type: str) -> Path:
+        extension = content_type.split(";")[0].split("/")[-1].strip() or "bin"
+        return self.directory / "blobs" / digest[:2] / f"{digest}.{extension}"
+
+    @staticmethod
+    def _write_atomic(path: Path, content: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(content)
+            os.replace(temporary, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temporary)
+            raise
+
+    def get(self, key: str) -> Optional[Thumbnail]:
+        """
+        Read the thumbnail stored for a request key.
+        """
+        try:
+            content_type, digest = (self.directory / "keys" / key).read_text().split(" ", 1)
+            blob = self._blob_path(digest, content_type)
+            content = blob.read_bytes()
+            os.utime(blob)
+        except (OSError, ValueError):
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+        with self._lock:
+            self.counters["hits"] += 1
+        return Thumbnail(content, content_type, digest)
+
+    def set(self, key: str, content: bytes, content_type: str) -> Thumbnail:
+        """
+        Store a thumbnail for a request key, evicting the least recently read blobs beyond max_bytes.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        blob = self._blob_path(digest, content_type)
+        if blob.exists():
+            os.utime(blob)
+        else:
+            self._write_atomic(blob, content)
+            with self._lock:
+                self._size += len(content)
+                self.counters["stores"] += 1
+        self._write_atomic(self.directory / "keys" / key, f"{content_type} {digest}".encode())
+        if self._size > self.max_bytes:
+            self.evict(keep=blob)
+        return Thumbnail(content, content_type, digest)
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        """
+        Delete the least recently read blobs until the cache fits max_bytes.
+
+        Args:
+            keep: A blob that must stay, such as the one just stored
+        """
+        blobs = []
+        for path in (self.directory / "blobs").glob("*/*"):
+            with contextlib.suppress(OSError):
+                stat = path.stat()
+                blobs.append((stat.st_mtime, stat.st_size, path))
+        blobs.sort()
+        with self._lock:
+            self._size = sum(size for _, size, _ in blobs)
+            for _, size, path in blobs:
+                if self._size <= self.max_bytes:
+                    break
+                if path == keep or path.name.startswith(".tmp-"):
+                    continue
+                with contextlib.suppress(OSError):
+                    path.unlink()
+                    self._size -= size
+                    self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Hit/miss/store/eviction counters and the size of the stored blobs.
+        """
+        with self._lock:
+            return {**self.counters, "bytes": self._size}
+
+
+class ImageProxy:
+    """
+    Serves small thumbnails of the marketplaces' product images from our own origin.
+
+    Search responses point at signed proxy URLs (/api/img/?u=...&w=...&s=...), so the proxy only fetches
+    images our own responses linked to, and only from the allowed CDN hosts. Each image is fetched once,
+    resized to the requested width (never enlarged), transcoded to WebP and stored in the ThumbnailCache;
+    its content hash is a strong ETag, and responses may be cached for a year since a URL's thumbnail never
+    changes. Without Pillow the fetched image is cached and served as is.
+    """
+
+    def __init__(
+        self,
+        cache: ThumbnailCache,
+        enabled: bool = DEFAULT_ENABLED,
+        width: int = DEFAULT_WIDTH,
+        max_width: int = DEFAULT_MAX_WIDTH,
+        quality: int = DEFAULT_QUALITY,
+        max_source_bytes: int = DEFAULT_MAX_SOURCE_BYTES,
+        fetch_timeout: float = DEFAULT_FETCH_TIMEOUT,
+        allowed_hosts: Tuple[str, ...] = DEFAULT_ALLOWED_HOSTS,
+        base_url: Optional[str] = None,
+    ):
+        self.cache = cache
+        self.enabled = enabled
+        self.width = width
+        self.max_width = max_width
+        self.quality = quality
+        self.max_source_bytes = max_source_bytes
+        self.fetch_timeout = fetch_timeout
+        self.allowed_hosts = tuple(host.lower() for host in allowed_hosts)
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.counters: Dict[str, int] = {"fetched": 0, "fetch_failures": 0, "source_bytes": 0, "thumbnail_bytes": 0}
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sign(url: str, width: int) -> str:
+        return salted_hmac(_SIGNATURE_SALT, f"{width}:{url}", algorithm="sha256").hexdigest()[:32]
+
+    def host_allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        return parts.scheme in ("http", "https") and any(
+            host == allowed or host.endswith(f".{allowed}") for allowed in self.allowed_hosts
+        )
+
+    def thumbnail_url(self, url: str, width: Optional[int] = None, origin: Optional[str] = None) -> str:
+        """
+        The proxy URL serving a thumbnail of an image, or the image's own URL when it can't be proxied.
+
+        Args:
+            url: The marketplace's image URL
+            width: Thumbnail width in pixels; defaults to the configured width
+            origin: Scheme and host to make the URL absolute with, e.g. from the request, when no base URL is set
+        """
+        if not self.enabled or not url or not self.host_allowed(url):
+            return url
+        width = width or self.width
+        query = urlencode({"u": url, "w": width, "s": self.sign(url, width)})
+        return f"{self.base_url or (origin or '').rstrip('/')}{PROXY_PATH}?{query}"
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = self._clients[loop] = httpx.AsyncClient(
+                    timeout=self.fetch_timeout, follow_redirects=False, headers={"Accept": "image/*"}
+                )
+                close_with_loop(client.aclose)
+            return client
+
+    async def _fetch(self, url: str) -> Tuple[bytes, str]:
+        try:
+            # Redirects are followed by hand, so an allowed CDN can't send the proxy to any other host
+            for _ in range(_MAX_REDIRECTS + 1):
+                async with self._client().stream("GET", url) as response:
+                    if response.is_redirect:
+                        url = str(response.url.join(response.headers["location"]))
+                        if not self.host_allowed(url):
+                            raise ImageProxyError(f"Image redirected to a host that isn't allowed: {urlsplit(url).hostname}", 502)
+                        continue
+                    return await self._read(response)
+            raise ImageProxyError("Too many redirects", 502)
+        except httpx.HTTPError as e:
+            raise ImageProxyError(f"Image fetch failed: {str(e)}", 502) from e
+
+    async def _read(self, response: httpx.Response) -> Tuple[bytes, str]:
+        if response.status_code != 200:
+            raise ImageProxyError(f"Image host answered {response.status_code}", 502)
+        content_type: str = response.headers.get("content-type", "application/octet-stream")
+        if not content_type.startswith("image/"):
+            raise ImageProxyError(f"Not an image: {content_type}", 502)
+        chunks, size = [], 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > self.max_source_bytes:
+                raise ImageProxyError("Image too large", 502)
+            chunks.append(chunk)
+        return b"".join(chunks), content_type
+
+    def resize(self, content: bytes, content_type: str, width: int) -> Tuple[bytes, str]:
+        """
+        Shrink an image to width pixels (keeping its aspect ratio, never enlarging) and encode it as WebP.
+
+        Returns:
+            tuple[bytes, str]: The thumbnail and its content type; the input unchanged without Pillow
+        """
+        if not PILLOW_AVAILABLE:
+            return content, content_type
+        from PIL import Image, ImageOps
+
+        try:
+            with Image.open(io.BytesIO(content)) as image:
+                if image.width * image.height > _MAX_PIXELS:
+                    raise ImageProxyError("Image too large", 502)
+                # JPEGs are decoded at a reduced scale straight away, still at least width pixels either way
+                image.draft("RGB", (width, width))
+                image = ImageOps.exif_transpose(image)
+                if image.width > width:
+                    image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+                output = io.BytesIO()
+                image.save(output, "WEBP", quality=self.quality, method=4)
+                return output.getvalue(), "image/webp"
+        except ImageProxyError:
+            raise
+        except Exception as e:
+            raise ImageProxyError(f"Unreadable image: {str(e)}", 502) from e
+
+    async def thumbnail(self, url: str, width: int, signature: str) -> Thumbnail:
+        """
+        Get the thumbnail behind a proxy URL, fetching and resizing the image on a cache miss.
+
+        Args:
+            url: The marketplace's image URL
+            width: Thumbnail width in pixels
+            signature: The signature from the proxy URL
+
+        Returns:
+            Thumbnail: The cached or new thumbnail
+
+        Raises:
+            ImageProxyError: For invalid or unsigned requests (4xx) and images that can't be fetched or read (502)
+        """
+        if not self.enabled:
+            raise ImageProxyError("Image proxy disabled", 404)
+        if not 0 < width <= self.max_width:
+            raise ImageProxyError("Invalid width", 400)
+        if not constant_time_compare(signature, self.sign(url, width)) or not self.host_allowed(url):
+            raise ImageProxyError("Image not allowed", 403)
+
+        key = hashlib.sha256(f"{width}:{self.quality}:{url}".encode()).hexdigest()
+        cached: Optional[Thumbnail] = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+
+        try:
+            content, content_type = await self._fetch(url)
+        except ImageProxyError:
+            with self._lock:
+                self.counters["fetch_failures"] += 1
+            raise
+        thumbnail, thumbnail_type = await asyncio.to_thread(self.resize, content, content_type, width)
+        with self._lock:
+            self.counters["fetched"] += 1
+            self.counters["source_bytes"] += len(content)
+            self.counters["thumbnail_bytes"] += len(thumbnail)
+        return await asyncio.to_thread(self.cache.set, key, thumbnail, thumbnail_type)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Fetch counters, bytes fetched and served as thumbnails, and the disk cache's counters.
+        """
+        with self._lock:
+            counters = dict(self.counters)
+        return {**counters, **{f"cache_{name}": value for name, value in self.cache.stats().items()}}
+
+
+_image_proxy: Optional[ImageProxy] = None
+_image_proxy_lock = threading.Lock()
+
+
+def get_image_proxy() -> ImageProxy:
+    """
+    Get the process-wide image proxy, configured from Django settings.
+
+    Returns:
+        ImageProxy: The shared proxy
+    """
+    global _image_proxy
+    with _image_proxy_lock:
+        if _image_proxy is None:
+            cache_dir = getattr(settings, "IMAGE_PROXY_CACHE_DIR", None) or Path(tempfile.gettempdir()) / "product-thumbnails"
+            _image_proxy = ImageProxy(
+                ThumbnailCache(cache_dir, getattr(settings, "IMAGE_PROXY_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES)),
+                enabled=getattr(settings, "IMAGE_PROXY_ENABLED", DEFAULT_ENABLED),
+                width=getattr(settings, "IMAGE_PROXY_WIDTH", DEFAULT_WIDTH),
+                max_width=getattr(settings, "IMAGE_PROXY_MAX_WIDTH", DEFAULT_MAX_WIDTH),
+                quality=getattr(settings, "IMAGE_PROXY_QUALITY", DEFAULT_QUALITY),
+                max_source_bytes=getattr(settings, "IMAGE_PROXY_MAX_SOURCE_BYTES", DEFAULT_MAX_SOURCE_BYTES),
+                fetch_timeout=getattr(settings, "IMAGE_PROXY_FETCH_TIMEOUT", DEFAULT_FETCH_TIMEOUT),
+                allowed_hosts=tuple(getattr(settings, "IMAGE_PROXY_ALLOWED_HOSTS", DEFAULT_ALLOWED_HOSTS)),
+                base_url=getattr(settings, "IMAGE_PROXY_BASE_URL", None),
+            )
+        return _image_proxy
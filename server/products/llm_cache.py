@@ -0,0 +1,199 @@
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Generic, Optional, Tuple, TypeVar
+
+from django.conf import settings
+from pydantic import BaseModel
+
+from .guard import ATTRIBUTE_WORDS, PLATFORM_WORDS
+from .models import QueryValidationResult, StructuredSearchQuery
+from .product_index import tokenize
+from .query_parser import NEGATION_WORDS
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Defaults, overridable through Django settings
+DEFAULT_MAX_ENTRIES: int = 1024
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+def canonicalize_query(query: str) -> str:
+    """
+    Canonical form of a query that ignores case, punctuation, whitespace and word order.
+    Numbers stay attached to the word before them, so "under 500 above 1000" and "above 500 under 1000" differ.
+
+    Args:
+        query: The raw natural language query
+
+    Returns:
+        str: The canonical query string
+    """
+    tokens = TOKEN_PATTERN.findall(query.lower())
+    phrases = []
+    for index, token in enumerate(tokens):
+        if NUMBER_PATTERN.fullmatch(token) and index > 0:
+            phrases[-1] = f"{phrases[-1]}_{token}"
+        else:
+            phrases.append(token)
+    return " ".join(sorted(phrases))
+
+
+def pinned_words(query: str) -> FrozenSet[str]:
+    """
+    Words a near-duplicate must share exactly: attributes (colors, sizes, fits), platforms and negations.
+    "size xl" and "size xxl" or "on flipkart" and "not on flipkart" are a character apart but structure differently.
+    """
+    return frozenset(
+        token for token in tokenize(query)
+        if token in ATTRIBUTE_WORDS or token in PLATFORM_WORDS or token in NEGATION_WORDS
+    )
+
+
+def trigrams(canonical_query: str) -> FrozenSet[str]:
+    padded = f"  {canonical_query} "
+    return frozenset(padded[index:index + 3] for index in range(len(padded) - 2))
+
+
+@dataclass
+class CacheEntry(Generic[ModelT]):
+    value: ModelT
+    trigrams: FrozenSet[str]
+    numbers: Tuple[str, ...]
+    pinned: FrozenSet[str]
+
+
+class LLMResponseCache(Generic[ModelT]):
+    """
+    Two-level LRU cache of parsed LLM responses keyed by the query that produced them.
+
+    The first level is an exact match on the canonical query. The optional second level matches near-duplicate
+    queries by character trigram (Jaccard) similarity above a threshold; candidates must mention exactly the
+    same numbers and pinned words (attributes, platforms, negations), so prices, sizes and exclusions never leak
+    between queries.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, near_duplicate_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.counters: Dict[str, float] = {
+            "exact_hits": 0,
+            "near_hits": 0,
+            "misses": 0,
+            "llm_calls_saved": 0,
+            "ms_saved": 0.0,
+        }
+        self._entries: "OrderedDict[str, CacheEntry[ModelT]]" = OrderedDict()
+        self._average_llm_ms: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _near_duplicate(self, query_trigrams: FrozenSet[str], numbers: Tuple[str, ...], pinned: FrozenSet[str]) -> Optional[str]:
+        best_key, best_score = None, self.near_duplicate_threshold
+        for key, entry in self._entries.items():
+            if entry.numbers != numbers or entry.pinned != pinned:
+                continue
+            score = len(query_trigrams & entry.trigrams) / len(query_trigrams | entry.trigrams)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, query: str) -> Optional[ModelT]:
+        """
+        Look up the response for a query, exact match first, then near-duplicate if enabled.
+
+        Returns:
+            A copy of the cached response, or None on a miss
+        """
+        canonical = canonicalize_query(query)
+        with self._lock:
+            key = canonical if canonical in self._entries else None
+            if key is not None:
+                self.counters["exact_hits"] += 1
+            elif self.near_duplicate_threshold is not None and self._entries:
+                key = self._near_duplicate(
+                    trigrams(canonical), tuple(NUMBER_PATTERN.findall(canonical)), pinned_words(query)
+                )
+                if key is not None:
+                    self.counters["near_hits"] += 1
+
+            if key is None:
+                self.counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.counters["llm_calls_saved"] += 1
+            self.counters["ms_saved"] += self._average_llm_ms or 0.0
+            return self._entries[key].value.model_copy(deep=True)
+
+    def set(self, query: str, value: ModelT, llm_ms: Optional[float] = None) -> None:
+        """
+        Store the response for a query.
+
+        Args:
+            query: The raw query the response was produced for
+            value: The parsed LLM response
+            llm_ms: How long the LLM call took, used to estimate the time later hits save
+        """
+        canonical = canonicalize_query(query)
+        with self._lock:
+            if llm_ms is not None:
+                # Exponential moving average of the LLM latency
+                self._average_llm_ms = llm_ms if self._average_llm_ms is None else 0.8 * self._average_llm_ms + 0.2 * llm_ms
+
+            self._entries[canonical] = CacheEntry(
+                value=value.model_copy(deep=True),
+                trigrams=trigrams(canonical),
+                numbers=tuple(NUMBER_PATTERN.findall(canonical)),
+                pinned=pinned_words(query),
+            )
+            self._entries.move_to_end(canonical)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drop all entries, keeping the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit/miss counters and the LLM calls and milliseconds saved so far.
+        """
+        with self._lock:
+            return {**self.counters, "ms_saved": round(self.counters["ms_saved"], 1), "entries": len(self._entries)}
+
+
+_caches: Dict[str, LLMResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(name: str, default_threshold: Optional[float]) -> LLMResponseCache:
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = LLMResponseCache(
+                max_entries=getattr(settings, "LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+                near_duplicate_threshold=getattr(
+                    settings, f"LLM_CACHE_{name.upper()}_NEAR_DUPLICATE_THRESHOLD", default_threshold
+                ),
+            )
+        return _caches[name]
+
+
+def get_guard_cache() -> LLMResponseCache[QueryValidationResult]:
+    """
+    Cache of safety verdicts. Exact matches only by default: a near-duplicate of a safe query may be an injection.
+    """
+    return _get_cache("guard", None)
+
+
+def get_structuring_cache() -> LLMResponseCache[StructuredSearchQuery]:
+    """
+    Cache of structured queries. Exact matches only by default: a near-duplicate that differs in one size or
+    negation structures differently.
+    """
+    return _get_cache("structuring", None)
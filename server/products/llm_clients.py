@@ -0,0 +1,194 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import httpx
+from browser_use import Controller
+from django.conf import settings
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from .prompts import AGENT_OUTPUT_MODEL
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_MAX_CONNECTIONS: int = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS: int = 20
+DEFAULT_KEEPALIVE_EXPIRY: float = 120.0
+DEFAULT_CONNECT_TIMEOUT: float = 5.0
+DEFAULT_TIMEOUT: float = 60.0
+DEFAULT_MAX_RETRIES: int = 2
+DEFAULT_HTTP2: bool = True
+
+# HTTP/2 needs the h2 package (in requirements.txt); without it clients fall back to HTTP/1.1
+HTTP2_AVAILABLE: bool = importlib.util.find_spec("h2") is not None
+
+# Tasks closing per-loop clients, referenced here so none is garbage-collected before its loop stops
+_closers: Set["asyncio.Task[None]"] = set()
+
+
+def close_with_loop(close: Callable[[], Awaitable[None]]) -> None:
+    """
+    Close a client of the running event loop when that loop stops.
+
+    asyncio.run() and asgiref's per-request loops cancel the tasks still pending when they finish, so a task
+    waiting for the cancellation closes the client's connections on the loop that opened them.
+
+    Args:
+        close: Coroutine function closing the client, such as httpx.AsyncClient.aclose
+    """
+    loop = asyncio.get_running_loop()
+
+    async def close_on_cancel() -> None:
+        try:
+            await loop.create_future()
+        finally:
+            await close()
+
+    task = loop.create_task(close_on_cancel())
+    _closers.add(task)
+    task.add_done_callback(_closers.discard)
+
+
+class LLMClients:
+    """
+    Long-lived OpenAI clients sharing keep-alive connection pools, so calls skip the TCP and TLS handshakes.
+
+    The sync client is thread-safe and shared by every thread. Async connections belong to the event loop that
+    opened them, so each loop (the server's and the browser pool's) gets its own async client and ChatOpenAI,
+    created on first use from that loop and closed when it stops. Retries with exponential backoff and jitter are left to the OpenAI
+    client, which retries connection errors, 408, 409, 429 and 5xx responses and honours Retry-After.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        http2: bool = DEFAULT_HTTP2,
+    ):
+        if http2 and not HTTP2_AVAILABLE:
+            logger.info("h2 is not installed, LLM clients use HTTP/1.1 keep-alive connections")
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.openai: OpenAI = OpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            max_retries=max_retries,
+            timeout=self.timeout,
+            http_client=httpx.Client(limits=self.limits, timeout=self.timeout, http2=self.http2),
+        )
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+        self._chat_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, ChatOpenAI]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def async_openai(self) -> AsyncOpenAI:
+        """
+        The async OpenAI client of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = AsyncOpenAI(
+                    base_url=self.base_url,
+                    api_key=self.api_key,
+                    max_retries=self.max_retries,
+                    timeout=self.timeout,
+                    http_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2),
+                )
+                # Under WSGI each request runs on a loop of its own, which would otherwise leak its pool
+                close_with_loop(client.close)
+            return client
+
+    def chat_model(self, model: str) -> ChatOpenAI:
+        """
+        The LangChain chat model of the running event loop, on the shared connection pools.
+
+        Args:
+            model: OpenAI model name
+        """
+        async_client = self.async_openai()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            models = self._chat_models.setdefault(loop, {})
+            if model not in models:
+                models[model] = ChatOpenAI(
+                    model=model,
+                    max_retries=self.max_retries,
+                    root_client=self.openai,
+                    client=self.openai.chat.completions,
+                    root_async_client=async_client,
+                    async_client=async_client.chat.completions,
+                )
+            return models[model]
+
+
+_llm_clients: Optional[LLMClients] = None
+_llm_clients_key: Optional[Tuple[Optional[str], Optional[str]]] = None
+_llm_clients_lock = threading.Lock()
+
+
+def get_llm_clients() -> LLMClients:
+    """
+    Get the process-wide LLM clients, configured from Django settings.
+    They are rebuilt if OPENAI_BASE_URL or OPENAI_API_KEY change, as when benchmarks point them at a stub.
+
+    Returns:
+        LLMClients: The shared clients
+    """
+    global _llm_clients, _llm_clients_key
+    key = (os.environ.get("OPENAI_BASE_URL"), os.environ.get("OPENAI_API_KEY"))
+    with _llm_clients_lock:
+        if _llm_clients is None or _llm_clients_key != key:
+            _llm_clients = LLMClients(
+                base_url=key[0],
+                api_key=key[1],
+                max_connections=getattr(settings, "LLM_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS),
+                max_keepalive_connections=getattr(settings, "LLM_MAX_KEEPALIVE_CONNECTIONS", DEFAULT_MAX_KEEPALIVE_CONNECTIONS),
+                keepalive_expiry=getattr(settings, "LLM_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY),
+                connect_timeout=getattr(settings, "LLM_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+                timeout=getattr(settings, "LLM_TIMEOUT", DEFAULT_TIMEOUT),
+                max_retries=getattr(settings, "LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES),
+                http2=getattr(settings, "LLM_HTTP2", DEFAULT_HTTP2),
+            )
+            _llm_clients_key = key
+        return _llm_clients
+
+
+_controller: Optional[Controller] = None
+_controller_lock = threading.Lock()
+
+
+def get_controller() -> Controller:
+    """
+    Get the agent controller shared by every search. Its action registry holds no per-run state:
+    each agent passes its own browser context to every action.
+
+    Returns:
+        Controller: Controller with the compact Products output model (prompts.AGENT_OUTPUT_MODEL)
+    """
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = Controller(output_model=AGENT_OUTPUT_MODEL)
+        return _controller
@@ -0,0 +1,114 @@
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.test.utils import setup_test_environment
+
+from products import views
+from products.benchmarking import StubOpenAIServer, stub_search_website
+from products.catalog import CatalogStore
+from products.coalescing import SingleFlight
+from products.result_cache import ResultCache
+from products.scheduler import SearchScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure agent runs and latency of a burst of identical searches with and without coalescing, and check "
+        "that a shared search is only cancelled once every request waiting on it has gone"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--burst", type=int, default=20, help="Identical searches submitted at once")
+        parser.add_argument("--browse", type=float, default=1.0, help="Stubbed browsing time per site in seconds")
+        parser.add_argument("--rtt", type=float, default=0.1, help="Stubbed OpenAI round trip time in seconds")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        self.check_cancellation()
+
+        burst: int = options["burst"]
+        agent_runs: Dict[str, int] = {"count": 0}
+        browse = stub_search_website(options["browse"])
+
+        async def counted_search_website(*args, page: int = 1, **kwargs):
+            # Later pages are prefetched in the background after the responses, so only first pages are counted
+            agent_runs["count"] += page == 1
+            return await browse(*args, page=page, **kwargs)
+
+        async def run() -> List[float]:
+            client = AsyncClient()
+
+            async def timed() -> float:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/search/", {"query": "men black jeans under 2000"}, content_type="application/json"
+                )
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - started
+
+            return await asyncio.gather(*(timed() for _ in range(burst)))
+
+        with StubOpenAIServer(latency=options["rtt"]), \
+                mock.patch.object(views, "search_website", counted_search_website), \
+                mock.patch.object(views, "get_result_cache", lambda: ResultCache(default_ttl=0, stale_ttl=0)), \
+                mock.patch.object(views, "get_catalog", lambda: CatalogStore(enabled=False)):
+            for name, single_flight in (("uncoalesced", SingleFlight(enabled=False)), ("coalesced", SingleFlight())):
+                agent_runs["count"] = 0
+                # Agent slots are plentiful, so without coalescing every duplicate browses at once; each mode gets
+                # its own scheduler so the other's background prefetches don't hold its slots
+                scheduler = SearchScheduler(max_agents=burst * 40, max_queued=burst * 40)
+                with mock.patch.object(views, "get_single_flight", lambda: single_flight), \
+                        mock.patch.object(views, "get_search_scheduler", lambda: scheduler):
+                    latencies = sorted(asyncio.run(run()))
+                self.stdout.write(
+                    f"{name:>11}: {burst} searches browsed {agent_runs['count']} first pages, "
+                    f"p50 {statistics.median(latencies):.2f} s, max {latencies[-1]:.2f} s"
+                )
+
+    def check_cancellation(self) -> None:
+        """
+        A waiter leaving keeps the search running for the others; the last one leaving cancels it.
+        """
+        async def scenario() -> Dict[str, bool]:
+            single_flight = SingleFlight()
+            outcome = {"finished": False, "cancelled": False}
+
+            async def search(progress) -> str:
+                try:
+                    await asyncio.sleep(0.2)
+                    outcome["finished"] = True
+                    return "products"
+                except asyncio.CancelledError:
+                    outcome["cancelled"] = True
+                    raise
+
+            first = asyncio.ensure_future(single_flight.run("shared", search))
+            second = asyncio.ensure_future(single_flight.run("shared", search))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            kept = await second == "products" and outcome["finished"] and not outcome["cancelled"]
+
+            outcome.update(finished=False, cancelled=False)
+            waiters = [asyncio.ensure_future(single_flight.run("abandoned", search)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            await asyncio.sleep(0)
+            abandoned = outcome["cancelled"] and not outcome["finished"]
+            stats = single_flight.stats()
+            return {
+                "one waiter leaving keeps the search": kept,
+                "every waiter leaving cancels the search": abandoned,
+                "joins and abandons are counted": stats == {"started": 2, "joined": 3, "abandoned": 1, "in_flight": 0},
+            }
+
+        failed = [check for check, passed in asyncio.run(scenario()).items() if not passed]
+        if failed:
+            raise CommandError("Coalescing checks failed: " + "; ".join(failed))
+        self.stdout.write("cancellation: a leaving waiter keeps the search running, the last one cancels it")
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+
+from products import views
+from products.benchmarking import StubOpenAIServer, stub_search_website
+from products.catalog import CatalogStore
+from products.result_cache import ResultCache
+from products.scheduler import SearchScheduler
+
+
+class Command(BaseCommand):
+    help = "Load-test concurrent searches per process with stubbed LLM and browser backends: thread-per-search vs the async view"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--searches", type=int, default=64, help="Number of searches to run")
+        parser.add_argument("--threads", type=int, default=8, help="Worker threads for the thread-per-search baseline")
+        parser.add_argument("--rtt", type=float, default=0.3, help="Stubbed OpenAI round trip time in seconds")
+        parser.add_argument("--browse", type=float, default=2.0, help="Stubbed per-site browsing time in seconds")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        searches: int = options["searches"]
+        payloads = [{"query": f"men black jeans under {1000 + index}"} for index in range(searches)]
+
+        def thread_per_search() -> None:
+            # Baseline: each search holds a worker thread for its whole duration, like a sync WSGI deployment
+            def search(payload) -> int:
+                return Client().post("/api/search/", payload, content_type="application/json").status_code
+
+            with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+                statuses = list(executor.map(search, payloads))
+            assert all(code == 200 for code in statuses), statuses
+
+        def async_view() -> None:
+            async def run() -> None:
+                client = AsyncClient()
+                responses = await asyncio.gather(*(
+                    client.post("/api/search/", payload, content_type="application/json") for payload in payloads
+                ))
+                assert all(response.status_code == 200 for response in responses)
+
+            asyncio.run(run())
+
+        # Caching, the catalog and agent caps are disabled so every search exercises the full pipeline
+        unbounded_scheduler = SearchScheduler(max_agents=searches * 4, max_queued=searches * 4)
+        with StubOpenAIServer(latency=options["rtt"]), \
+                mock.patch.object(views, "search_website", stub_search_website(options["browse"])), \
+                mock.patch.object(views, "get_result_cache", lambda: ResultCache(default_ttl=0, stale_ttl=0)), \
+                mock.patch.object(views, "get_catalog", lambda: CatalogStore(enabled=False)), \
+                mock.patch.object(views, "get_search_scheduler", lambda: unbounded_scheduler):
+            for name, run in ((f"{options['threads']} threads", thread_per_search), ("async view", async_view)):
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{name:>12}: {searches} searches in {elapsed:.1f} s, {searches / elapsed:.1f} searches/s"
+                )
@@ -0,0 +1,73 @@
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment
+
+from products import views
+from products.benchmarking import DEFAULT_STUB_RESPONSES, StubOpenAIServer, stub_search_website
+from products.catalog import CatalogStore
+from products.models import SourcedFromEnum
+from products.result_cache import ResultCache
+from products.scheduler import SearchScheduler
+
+
+class Command(BaseCommand):
+    help = "Measure search latency percentiles with one deliberately slow site, with and without deadlines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--searches", type=int, default=50, help="Number of searches to run per mode")
+        parser.add_argument("--browse", type=float, default=0.5, help="Stubbed browsing time of the healthy sites in seconds")
+        parser.add_argument("--slow", type=float, default=10.0, help="Stubbed browsing time of the slow site in seconds")
+        parser.add_argument("--budget", type=float, default=2.0, help="Request latency budget in seconds")
+        parser.add_argument("--concurrency", type=int, default=4, help="Searches in flight at once")
+        parser.add_argument("--rtt", type=float, default=0.1, help="Stubbed OpenAI round trip time in seconds")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        searches: int = options["searches"]
+        payloads = [{"query": f"men black jeans under {1000 + index}"} for index in range(searches)]
+        websites = [website.value for website in SourcedFromEnum]
+        statuses: Dict[str, int] = {}
+
+        async def run() -> List[float]:
+            client = AsyncClient()
+            in_flight = asyncio.Semaphore(options["concurrency"])
+
+            async def timed(payload) -> float:
+                async with in_flight:
+                    started = time.perf_counter()
+                    response = await client.post("/api/search/", payload, content_type="application/json")
+                assert response.status_code == 200, response.status_code
+                for site in response.json()["sites"].values():
+                    statuses[site["status"]] = statuses.get(site["status"], 0) + 1
+                return time.perf_counter() - started
+
+            return await asyncio.gather(*(timed(payload) for payload in payloads))
+
+        # Every search covers all sites; meesho never answers within the budget
+        responses = {"StructuredSearchQuery": {**DEFAULT_STUB_RESPONSES["StructuredSearchQuery"], "source_from": websites}}
+        search_website = stub_search_website(options["browse"], {SourcedFromEnum.meesho: options["slow"]})
+        unbounded_scheduler = SearchScheduler(max_agents=searches * 4, max_queued=searches * 4)
+        modes = (
+            ("no deadlines", {"SEARCH_LATENCY_BUDGET": options["slow"] * 10, "SEARCH_SITE_DEADLINES": {}}),
+            (f"{options['budget']:g} s budget", {"SEARCH_LATENCY_BUDGET": options["budget"], "SEARCH_SITE_DEADLINES": {}}),
+        )
+
+        with StubOpenAIServer(latency=options["rtt"], responses=responses), \
+                mock.patch.object(views, "search_website", search_website), \
+                mock.patch.object(views, "get_result_cache", lambda: ResultCache(default_ttl=0, stale_ttl=0)), \
+                mock.patch.object(views, "get_catalog", lambda: CatalogStore(enabled=False)), \
+                mock.patch.object(views, "get_search_scheduler", lambda: unbounded_scheduler):
+            for name, overrides in modes:
+                statuses.clear()
+                with override_settings(**overrides):
+                    latencies = sorted(asyncio.run(run()))
+                p50 = statistics.median(latencies)
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                summary = ", ".join(f"{status} {count}" for status, count in sorted(statuses.items()))
+                self.stdout.write(f"{name:>14}: p50 {p50:.2f} s, p99 {p99:.2f} s, max {latencies[-1]:.2f} s ({summary})")
@@ -0,0 +1,130 @@
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from browser_use import Controller
+from django.core.management.base import BaseCommand, CommandError
+from langchain_openai import ChatOpenAI
+
+from products.browser_pool import get_browser_pool
+from products.extractors import EXTRACTORS
+from products.models import Product, SourcedFromEnum
+from products.prompts import AGENT_OUTPUT_MODEL
+from products.search import LLM_MODEL, WEBSITE_URLS, run_agent
+
+FIXTURES_DIR: Path = Path(__file__).resolve().parents[2] / "extractor_fixtures"
+
+# What each saved page must parse to: the product count and the first product's fields
+EXPECTED: Dict[SourcedFromEnum, Dict[str, Any]] = {
+    SourcedFromEnum.myntra: {
+        "count": 3,
+        "product_name": "Roadster Men Black Skinny Fit Mid-Rise Clean Look Stretchable Jeans",
+        "product_url": "https://www.myntra.com/jeans/roadster/roadster-men-black-skinny-fit-jeans/2467318/buy",
+        "product_image_url": "https://assets.myntassets.com/assets/images/2467318/2023/1/5/jeans.jpg",
+        "maximum_retail_price": 2199.0,
+        "selling_price": 769.0,
+    },
+    SourcedFromEnum.ajio: {
+        "count": 3,
+        "product_name": "DNMX Men Slim Fit Mid-Rise Jeans",
+        "product_url": "https://www.ajio.com/dnmx-men-slim-fit-mid-rise-jeans/p/469586423_black",
+        "product_image_url": "https://assets.ajio.com/medias/sys_master/root/20230901/jeans-473Wx593H-469586423-black-MODEL.jpg",
+        "maximum_retail_price": 1299.0,
+        "selling_price": 699.0,
+    },
+    SourcedFromEnum.meesho: {
+        "count": 3,
+        "product_name": "Trendy Men Black Denim Jeans",
+        "product_url": "https://www.meesho.com/trendy-men-black-denim-jeans/p/5a8xq1",
+        "product_image_url": "https://images.meesho.com/images/products/5a8xq1/1_512.jpg",
+        "maximum_retail_price": 999.0,
+        "selling_price": 389.0,
+    },
+    SourcedFromEnum.flipkart: {
+        "count": 3,
+        "product_name": "Slim Men Black Jeans",
+        "product_url": "https://www.flipkart.com/roadster-slim-men-black-jeans/p/itm8b1d3e1c1f2a4",
+        "product_image_url": "https://rukminim2.flixcart.com/image/612/612/xif0q/jeans/black-slim.jpeg?q=70",
+        "maximum_retail_price": 1999.0,
+        "selling_price": 649.0,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Check and time the deterministic site extractors against saved result pages, and optionally compare them "
+        "with the agent on live sites"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=200, help="Parses per fixture")
+        parser.add_argument("--live", action="store_true", help="Also run extractor and agent against the live sites")
+        parser.add_argument("--query", default="Men black jeans")
+
+    def handle(self, *args, **options):
+        mistakes: List[str] = []
+        for website, extractor in EXTRACTORS.items():
+            html = (FIXTURES_DIR / f"{website.value}.html").read_text()
+            products = extractor.parse(html)
+            mistakes.extend(self.check_fixture(website, products))
+            if not products:
+                continue
+
+            started = time.perf_counter()
+            for _ in range(options["runs"]):
+                extractor.parse(html)
+            elapsed_ms = (time.perf_counter() - started) * 1000 / options["runs"]
+            self.stdout.write(f"{website.value:>9}: {len(products)} products, {elapsed_ms:.2f} ms per parse")
+
+        if mistakes:
+            raise CommandError("Extractors parsed the saved pages wrong:\n" + "\n".join(mistakes))
+
+        if options["live"]:
+            self._compare_live(options["query"])
+
+    @staticmethod
+    def check_fixture(website: SourcedFromEnum, products: List[Product]) -> List[str]:
+        """
+        Compare a saved page's parsed products with the expected count and first product.
+        """
+        expected = EXPECTED.get(website)
+        if expected is None:
+            return [f"{website.value}: no expected output for the saved page"]
+        mistakes = []
+        if len(products) != expected["count"]:
+            mistakes.append(f"{website.value}: {len(products)} products instead of {expected['count']}")
+        if products:
+            first = products[0].model_dump()
+            mistakes.extend(
+                f"{website.value}: {field} {first[field]!r} != {value!r}"
+                for field, value in expected.items()
+                if field != "count" and first[field] != value
+            )
+        mistakes.extend(
+            f"{website.value}: {product.product_name!r} is sourced from {product.sourced_from.value}"
+            for product in products
+            if product.sourced_from != website
+        )
+        return mistakes
+
+    def _compare_live(self, search_query: str) -> None:
+        browser_pool = get_browser_pool()
+        llm = ChatOpenAI(model=LLM_MODEL)
+        controller = Controller(output_model=AGENT_OUTPUT_MODEL)
+
+        async def timed(website) -> List[str]:
+            lines = []
+            async with browser_pool.context() as browser_context:
+                started = time.perf_counter()
+                products = await EXTRACTORS[website].extract(browser_context, search_query)
+                lines.append(f"{website.value:>9}: extractor {len(products)} products in {time.perf_counter() - started:.1f} s")
+            async with browser_pool.context() as browser_context:
+                started = time.perf_counter()
+                products = await run_agent(WEBSITE_URLS[website], search_query, llm, controller, browser_context)
+                lines.append(f"{website.value:>9}: agent {len(products)} products in {time.perf_counter() - started:.1f} s")
+            return lines
+
+        for website in EXTRACTORS:
+            for line in browser_pool.run(timed(website)):
+                self.stdout.write(line)
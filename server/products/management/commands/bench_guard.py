@@ -0,0 +1,83 @@
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import views
+from products.benchmarking import GUARD_CORPUS, StubOpenAIServer
+from products.guard import LocalGuard
+from products.llm_cache import LLMResponseCache
+from products.views import ProductSearchView
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the local guard tier against the labelled guard corpus and measure the share of queries it resolves "
+        "and the guard latency with and without it, against a stubbed OpenAI endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rtt", type=float, default=0.4, help="Stubbed OpenAI round trip time in seconds")
+        parser.add_argument("--repeat", type=int, default=2000, help="Local classifications timed per query")
+        parser.add_argument(
+            "--min-resolved", type=float, default=0.55, help="Fail if the local tier resolves a smaller share of the corpus"
+        )
+
+    def handle(self, *args, **options):
+        guard = LocalGuard()
+        outcomes: Dict[str, int] = {"approved": 0, "rejected": 0, "escalated": 0}
+        mistakes: List[str] = []
+        for query, safe in GUARD_CORPUS:
+            decision = guard.decide(query)
+            if decision.result is None:
+                outcomes["escalated"] += 1
+                continue
+            outcomes["approved" if decision.result.is_safe else "rejected"] += 1
+            if decision.result.is_safe != safe:
+                mistakes.append(f"{'approved unsafe' if safe is False else 'rejected safe'}: {query!r} ({decision.reason})")
+
+        total = len(GUARD_CORPUS)
+        resolved = outcomes["approved"] + outcomes["rejected"]
+        self.stdout.write(
+            f"{total} labelled queries: {outcomes['approved']} approved, {outcomes['rejected']} rejected, "
+            f"{outcomes['escalated']} escalated; {resolved / total:.0%} resolved locally, {len(mistakes)} wrong"
+        )
+
+        durations: List[float] = []
+        for query, _ in GUARD_CORPUS:
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                guard.decide(query)
+            durations.append((time.perf_counter() - started) / options["repeat"])
+        durations.sort()
+        self.stdout.write(
+            f"local tier: median {statistics.median(durations) * 1e6:.1f} us, "
+            f"max {durations[-1] * 1e6:.1f} us per query"
+        )
+
+        async def guard_all() -> List[float]:
+            latencies = []
+            for query, _ in GUARD_CORPUS:
+                started = time.perf_counter()
+                await ProductSearchView.avalidate_query(query)
+                latencies.append(time.perf_counter() - started)
+            return latencies
+
+        # Every escalated query pays an LLM round trip: the guard cache is disabled
+        with StubOpenAIServer(latency=options["rtt"]), \
+                mock.patch.object(views, "get_guard_cache", lambda: LLMResponseCache(max_entries=0)):
+            for name, tiered in (("LLM only", LocalGuard(enabled=False)), ("tiered", LocalGuard())):
+                with mock.patch.object(views, "get_local_guard", lambda: tiered):
+                    latencies = asyncio.run(guard_all())
+                self.stdout.write(
+                    f"{name:>9}: guard latency mean {statistics.mean(latencies) * 1000:.1f} ms, "
+                    f"median {statistics.median(latencies) * 1000:.1f} ms"
+                )
+
+        if resolved / total < options["min_resolved"]:
+            mistakes.append(f"resolved {resolved / total:.0%} locally, below {options['min_resolved']:.0%}")
+        if mistakes:
+            raise CommandError("Local guard checks failed:\n" + "\n".join(mistakes))
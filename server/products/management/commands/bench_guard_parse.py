@@ -0,0 +1,82 @@
+import asyncio
+import statistics
+import time
+from typing import List
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import serializers, views
+from products.benchmarking import StubOpenAIServer
+from products.guard import LocalGuard
+from products.llm_cache import get_guard_cache, get_structuring_cache
+from products.query_parser import RuleBasedQueryParser
+from products.serializers import ProductSearchSerializer
+from products.views import ProductSearchView
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare time to the first browser step for sequential vs concurrent guard and query structuring, and with "
+        "warm LLM caches, against a stubbed OpenAI endpoint. The local guard and rule parser are turned off so both "
+        "steps call the LLM"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rtt", type=float, default=0.5, help="Stubbed OpenAI round trip time in seconds")
+        parser.add_argument("--runs", type=int, default=5, help="Number of measured runs per mode")
+        parser.add_argument("--query", default="find men's black jeans under 2000 on flipkart")
+
+    def handle(self, *args, **options):
+        rtt: float = options["rtt"]
+        serializer = ProductSearchSerializer(data={"query": options["query"]})
+        serializer.is_valid(raise_exception=True)
+
+        def sequential() -> None:
+            ProductSearchView.validate_query(serializer.data["query"])
+            serializer.to_search_plan(serializer.to_structured_query())
+
+        def concurrent() -> None:
+            _, structured_query = asyncio.run(ProductSearchView.guard_and_structure(serializer))
+            serializer.to_search_plan(structured_query)
+
+        def clear_llm_caches() -> None:
+            get_guard_cache().clear()
+            get_structuring_cache().clear()
+
+        failures: List[str] = []
+        guard, parser = LocalGuard(enabled=False), RuleBasedQueryParser(enabled=False)
+        with StubOpenAIServer(latency=rtt) as stub, \
+                mock.patch.object(views, "get_local_guard", lambda: guard), \
+                mock.patch.object(serializers, "get_query_parser", lambda: parser):
+            for name, run, clear_caches in (
+                ("sequential", sequential, True),
+                ("concurrent", concurrent, True),
+                ("cached", concurrent, False),
+            ):
+                timings: List[float] = []
+                requests_before = stub.request_count
+                for _ in range(options["runs"]):
+                    if clear_caches:
+                        clear_llm_caches()
+                    started = time.perf_counter()
+                    run()
+                    timings.append(time.perf_counter() - started)
+                median = statistics.median(timings)
+                llm_calls = stub.request_count - requests_before
+                self.stdout.write(
+                    f"{name:>10}: median {median * 1000:.0f} ms ({median / rtt:.2f} x RTT), {llm_calls} LLM calls"
+                )
+                # Uncached runs call the guard and the structuring LLM once each; cached runs call neither
+                expected_calls = 2 * options["runs"] if clear_caches else 0
+                if llm_calls != expected_calls:
+                    failures.append(f"{name}: {llm_calls} LLM calls instead of {expected_calls}")
+
+        for cache_name, cache in (("guard", get_guard_cache()), ("structuring", get_structuring_cache())):
+            stats = cache.stats()
+            self.stdout.write(f"{cache_name} cache: {stats['llm_calls_saved']} LLM calls and {stats['ms_saved']} ms saved")
+            if stats["llm_calls_saved"] < options["runs"]:
+                failures.append(f"{cache_name} cache saved {stats['llm_calls_saved']} LLM calls")
+
+        if failures:
+            raise CommandError("Guard and structuring checks failed: " + "; ".join(failures))
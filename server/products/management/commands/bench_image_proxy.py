@@ -0,0 +1,127 @@
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+from unittest import mock
+from urllib.parse import quote
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.test.utils import setup_test_environment
+
+from products import serializers, views
+from products.benchmarking import StubImageServer
+from products.images import PILLOW_AVAILABLE, ImageProxy, ImageProxyError, ThumbnailCache
+from products.models import Product, SourcedFromEnum
+from products.serializers import ProductResponseSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a grid of product images through the thumbnail proxy from a local stub image host, and measure "
+        "bytes saved, cold and cached latency, conditional requests and cache eviction"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", type=int, default=24, help="Distinct product images in the grid")
+        parser.add_argument("--latency", type=float, default=0.05, help="Stub image host latency in seconds")
+        parser.add_argument("--width", type=int, default=400, help="Thumbnail width in pixels")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        if not PILLOW_AVAILABLE:
+            self.stdout.write("Pillow is not installed: images are cached and served without resizing")
+        count: int = options["images"]
+        failures: List[str] = []
+
+        with StubImageServer(latency=options["latency"]) as image_host, \
+                tempfile.TemporaryDirectory() as cache_dir:
+            proxy = ImageProxy(ThumbnailCache(Path(cache_dir)), width=options["width"], allowed_hosts=("127.0.0.1",))
+            products = [
+                Product(
+                    product_name=f"Stub product {index}",
+                    product_url=f"https://www.myntra.com/p/{index}",
+                    product_image_url=image_host.image_url(index),
+                    maximum_retail_price=999,
+                    discount_percentage=50,
+                    selling_price=499,
+                    sourced_from=SourcedFromEnum.myntra,
+                )
+                for index in range(count)
+            ]
+            source_bytes = sum(len(image_host.image(index)) for index in range(count))
+
+            with mock.patch.object(views, "get_image_proxy", lambda: proxy), \
+                    mock.patch.object(serializers, "get_image_proxy", lambda: proxy):
+                urls = [product["product_image_url"] for product in ProductResponseSerializer(products, many=True).data]
+                if not all(url.startswith("/api/img/?") for url in urls):
+                    failures.append("search responses don't point at the proxy")
+
+                async def fetch_all(headers: List[Dict[str, str]]) -> List[tuple]:
+                    client = AsyncClient()
+
+                    async def fetch(url: str, headers: Dict[str, str]) -> tuple:
+                        started = time.perf_counter()
+                        response = await client.get(url, headers=headers)
+                        return time.perf_counter() - started, response
+
+                    # One at a time, as a browser's few connections to one host would, so latencies aren't queueing
+                    return [await fetch(url, url_headers) for url, url_headers in zip(urls, headers)]
+
+                cold = asyncio.run(fetch_all([{}] * count))
+                warm = asyncio.run(fetch_all([{}] * count))
+                conditional = asyncio.run(fetch_all([{"If-None-Match": response.get("ETag", "")} for _, response in warm]))
+                tampered = asyncio.run(AsyncClient().get(urls[0].replace("&s=", "&s=0")))
+
+            if any(response.status_code != 200 for _, response in cold + warm):
+                failures.append("some thumbnails failed")
+            thumbnail_bytes = sum(len(response.content) for _, response in warm)
+            fetches = image_host.request_count
+            not_modified = sum(response.status_code == 304 for _, response in conditional)
+            cache_control = warm[0][1].get("Cache-Control", "")
+            self.stdout.write(
+                f"{count} images: {source_bytes / 1024:.0f} KiB from the image host, {thumbnail_bytes / 1024:.0f} KiB "
+                f"as {warm[0][1]['Content-Type']} thumbnails ({source_bytes / max(thumbnail_bytes, 1):.0f}x smaller)"
+            )
+            self.stdout.write(
+                f"cold: p50 {statistics.median(t for t, _ in cold) * 1000:.1f} ms, "
+                f"cached: p50 {statistics.median(t for t, _ in warm) * 1000:.1f} ms; "
+                f"{fetches} fetches from the image host for {2 * count} requests"
+            )
+            self.stdout.write(f"If-None-Match: {not_modified} of {count} answered 304; Cache-Control: {cache_control}")
+            if fetches != count:
+                failures.append(f"{fetches} fetches instead of {count}")
+            if not_modified != count or "immutable" not in cache_control:
+                failures.append("missing validators or cache headers")
+            if tampered.status_code != 403:
+                failures.append(f"tampered signature answered {tampered.status_code}")
+
+            # Redirects are followed only while they stay on allowed hosts
+            async def follow(target: str) -> str:
+                try:
+                    await proxy._fetch(f"{image_host.base_url}/redirect?to={quote(target, safe='')}")
+                    return "fetched"
+                except ImageProxyError as e:
+                    return str(e)
+
+            allowed_redirect = asyncio.run(follow("/img/0.jpg"))
+            foreign_redirect = asyncio.run(follow(image_host.image_url(0).replace("127.0.0.1", "localhost")))
+            self.stdout.write(f"redirects: same host {allowed_redirect}, other host: {foreign_redirect}")
+            if allowed_redirect != "fetched" or "isn't allowed" not in foreign_redirect:
+                failures.append("redirects aren't checked against the allowed hosts")
+
+            # Shrink the budget to half the thumbnails: the least recently read are evicted
+            proxy.cache.max_bytes = thumbnail_bytes // 2
+            proxy.cache.evict()
+            cache_stats = proxy.cache.stats()
+            self.stdout.write(
+                f"eviction: {cache_stats['evictions']} thumbnails evicted to fit {proxy.cache.max_bytes / 1024:.0f} KiB, "
+                f"{cache_stats['bytes'] / 1024:.0f} KiB kept"
+            )
+            if cache_stats["bytes"] > proxy.cache.max_bytes:
+                failures.append("cache over its size budget after eviction")
+
+        if failures:
+            raise CommandError("Image proxy checks failed: " + "; ".join(failures))
@@ -0,0 +1,76 @@
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+from browser_use import Controller
+from django.core.management.base import BaseCommand
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from products.benchmarking import StubOpenAIServer
+from products.llm_clients import get_controller, get_llm_clients
+from products.models import QueryValidationResult
+from products.prompts import AGENT_OUTPUT_MODEL
+from products.search import LLM_MODEL
+
+MESSAGES = [{"role": "user", "content": "<QUERY>men black jeans under 2000</QUERY>"}]
+
+
+class Command(BaseCommand):
+    help = "Measure the per-call and per-request cost of building OpenAI and LangChain clients against reusing pooled ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=200, help="Calls timed per mode")
+
+    def handle(self, *args, **options):
+        calls: int = options["calls"]
+
+        def timed(call: Callable[[], object]) -> float:
+            durations = []
+            for _ in range(calls):
+                started = time.perf_counter()
+                call()
+                durations.append(time.perf_counter() - started)
+            return statistics.median(durations) * 1000
+
+        async def atimed(call: Callable[[], Awaitable[object]]) -> float:
+            durations = []
+            for _ in range(calls):
+                started = time.perf_counter()
+                await call()
+                durations.append(time.perf_counter() - started)
+            return statistics.median(durations) * 1000
+
+        def parse(client: OpenAI) -> object:
+            return client.beta.chat.completions.parse(model=LLM_MODEL, messages=MESSAGES, response_format=QueryValidationResult)
+
+        async def aparse(client: AsyncOpenAI) -> object:
+            return await client.beta.chat.completions.parse(model=LLM_MODEL, messages=MESSAGES, response_format=QueryValidationResult)
+
+        # The stub answers at once over plain HTTP, so what remains is client and connection setup;
+        # against api.openai.com a new connection also pays a TLS handshake
+        with StubOpenAIServer(latency=0):
+            sync_new = timed(lambda: parse(OpenAI()))
+            sync_pooled = timed(lambda: parse(get_llm_clients().openai))
+
+            async def async_modes() -> List[float]:
+                new = await atimed(lambda: aparse(AsyncOpenAI()))
+                pooled = await atimed(lambda: aparse(get_llm_clients().async_openai()))
+
+                async def build_agent_clients() -> object:
+                    return ChatOpenAI(model=LLM_MODEL), Controller(output_model=AGENT_OUTPUT_MODEL)
+
+                async def shared_agent_clients() -> object:
+                    return get_llm_clients().chat_model(LLM_MODEL), get_controller()
+
+                return [new, pooled, await atimed(build_agent_clients), await atimed(shared_agent_clients)]
+
+            async_new, async_pooled, agent_new, agent_shared = asyncio.run(async_modes())
+
+        self.stdout.write(f"  sync call: new client {sync_new:.2f} ms, pooled {sync_pooled:.2f} ms")
+        self.stdout.write(f" async call: new client {async_new:.2f} ms, pooled {async_pooled:.2f} ms")
+        self.stdout.write(f"agent setup: ChatOpenAI + Controller {agent_new:.2f} ms, shared {agent_shared:.3f} ms")
+        # A search makes the guard and structuring calls and sets up the agent clients once
+        saved = 2 * (async_new - async_pooled) + (agent_new - agent_shared)
+        self.stdout.write(f"Saved per search request: {saved:.2f} ms, before any TLS handshake")
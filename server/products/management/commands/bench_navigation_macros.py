@@ -0,0 +1,188 @@
+import asyncio
+import json
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.management.commands.bench_prompts import TRANSCRIPTS_DIR, load_tokenizer
+from products.filters import translate_filters
+from products.models import GenderEnum, SourcedFromEnum, StructuredSearchQuery
+from products.navigation import NavigationMacros, NavigationStep
+
+QUERIES: List[str] = [
+    "Women red kurta",
+    "Men white sneakers",
+    "Kids blue t-shirt",
+    "Men brown leather wallet",
+    "Women black handbag",
+    "Men navy blue polo t-shirt",
+    "Women green saree",
+    "Men grey joggers",
+]
+
+
+class FakeKeyboard:
+    def __init__(self, page: "FakePage"):
+        self.page = page
+
+    async def press(self, keys: str) -> None:
+        if keys == "Enter" and self.page.typed is not None:
+            await self.page.goto(f"{self.page.site}/search/results?sid={abs(hash(self.page.typed)) % 10000}")
+
+
+class FakePage:
+    """
+    A page of a simulated site: results pages list products for the query in their URL, or the one typed in.
+    """
+
+    def __init__(self, site: str, serves_results: bool = True):
+        self.site = site
+        self.serves_results = serves_results
+        self.url = "about:blank"
+        self.typed: Optional[str] = None
+        self.keyboard = FakeKeyboard(self)
+        self.fills: List[str] = []
+
+    async def goto(self, url: str, wait_until: str = "load") -> None:
+        self.url = url
+
+    async def fill(self, selector: str, text: str) -> None:
+        self.fills.append(selector)
+        self.typed = text
+
+    async def click(self, selector: str) -> None:
+        pass
+
+    async def wait_for_load_state(self, state: str = "load") -> None:
+        pass
+
+    async def evaluate(self, script: str) -> Dict[str, Any]:
+        on_results = self.url.startswith(self.site) and self.url.rstrip("/") != self.site
+        if not (self.serves_results and on_results):
+            return {"links": 8, "text": "oops! page not found"}
+        query = self.typed or re.split(r"[?&]rawQuery=", self.url)[-1].replace("%20", " ")
+        return {"links": 120, "text": f"{query.lower()} - 2453 items | add to bag"}
+
+
+class FakeContext:
+    def __init__(self, page: FakePage):
+        self.page = page
+
+    async def get_current_page(self) -> FakePage:
+        return self.page
+
+
+class Command(BaseCommand):
+    help = (
+        "Learn navigation macros from the recorded agent transcripts and simulated runs, and measure replay hit "
+        "rate and the agent steps and tokens replays save, including macros that stop working"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transcript", default=str(TRANSCRIPTS_DIR / "myntra.json"), help="Recorded agent transcript (JSON)")
+        parser.add_argument("--searches", type=int, default=40, help="Simulated searches replaying the learned macro")
+
+    def handle(self, *args, **options):
+        transcript: Dict[str, Any] = json.loads(Path(options["transcript"]).read_text())
+        website = SourcedFromEnum(transcript["website"])
+        tokenize, exact = load_tokenizer()
+        if not exact:
+            self.stderr.write("o200k_base encoding unavailable, token counts are approximate")
+
+        # Each recorded step's request: its browser state plus the actions it decided on
+        steps: List[NavigationStep] = []
+        for step in transcript["steps"]:
+            url = re.search(r"Current url: (\S+)", step["state"]).group(1)
+            steps.append(NavigationStep(
+                url=url,
+                actions=step["model_output"]["action"],
+                xpaths=[None] * len(step["model_output"]["action"]),
+                tokens=len(tokenize(step["state"])) + len(tokenize(json.dumps(step["model_output"]))),
+            ))
+        checks: Dict[str, bool] = {}
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "macros.json"
+            macros = NavigationMacros(path=path, max_failures=3)
+            checks["a run starting on the results page teaches nothing"] = macros.learn(website, transcript["search_query"], steps[1:]) is None
+            macro = macros.learn(website, transcript["search_query"], steps)
+            if macro is None:
+                raise CommandError(f"No navigation macro learned from {options['transcript']}")
+            self.stdout.write(
+                f"learned {website.value}: {macro.url_template}, saves {macro.nav_steps} step(s) and "
+                f"{macro.nav_tokens} tokens per search"
+            )
+            self.stdout.write(f"  '{QUERIES[0]}' -> {macro.url_for(QUERIES[0])}")
+            checks["template fills in a new query"] = (
+                macro.url_for(QUERIES[0]) == "https://www.myntra.com/women-red-kurta?rawQuery=Women%20red%20kurta"
+            )
+
+            # A run that finished on a filtered results page: its filters belong to that query, not the next one
+            filtered_site = SourcedFromEnum.flipkart
+            learned_filters = translate_filters(filtered_site, StructuredSearchQuery(has_only_unsupported_platforms=False, item_name="jeans", gender=GenderEnum.Men, max_price=2000))
+            filtered_steps = [
+                NavigationStep("https://www.flipkart.com/", [{"input_text": {"index": 2, "text": "jeans"}}, {"send_keys": {"keys": "Enter"}}], ["html/body/div/header/form/input", None], 900),
+                NavigationStep(learned_filters.apply("https://www.flipkart.com/search?q=jeans"), [{"done": {"products": [], "success": True}}], [None], 2400),
+            ]
+            filtered = macros.learn(filtered_site, "jeans", filtered_steps)
+            query_filters = translate_filters(filtered_site, StructuredSearchQuery(has_only_unsupported_platforms=False, item_name="kurta", gender=GenderEnum.Women))
+            checks["learned templates keep no filters and replay the current query's"] = (
+                filtered is not None and filtered.url_template == "https://www.flipkart.com/search?q={query_percent}"
+                and filtered.url_for("kurta", query_filters) == query_filters.apply("https://www.flipkart.com/search?q=kurta")
+            )
+
+            # A site whose results URL hides the query: the typing and Enter are replayed instead
+            opaque_site = SourcedFromEnum.meesho
+            opaque_steps = [
+                NavigationStep("https://www.meesho.com/", [{"input_text": {"index": 3, "text": "Men grey joggers"}}, {"send_keys": {"keys": "Enter"}}], ["html/body/header/div/input", None], 900),
+                NavigationStep("https://www.meesho.com/search/results?sid=42", [{"scroll_down": {}}], [None], 1800),
+                NavigationStep("https://www.meesho.com/search/results?sid=42", [{"done": {"products": [], "success": True}}], [None], 2400),
+            ]
+            opaque = macros.learn(opaque_site, "Men grey joggers", opaque_steps)
+            checks["actions are learned when the URL hides the query"] = (
+                opaque is not None and opaque.url_template is None and opaque.actions[0]["text"] == "{query}"
+            )
+            checks["macros survive a restart"] = NavigationMacros(path=path).get(website) is not None
+
+            async def simulate() -> None:
+                # The search's start page already shows results: opened for the agent, nothing replayed
+                start_page = "https://www.myntra.com/women-red-kurta?rawQuery=Women%20red%20kurta"
+                opened = await macros.replay(website, FakeContext(FakePage("https://www.myntra.com")), QUERIES[0], start_page)
+                checks["a start page showing results is kept"] = opened == start_page and macros.stats()["replays"] == 0
+
+                # The start pages show no results, as when the agent learned the macros
+                for index in range(options["searches"]):
+                    query = QUERIES[index % len(QUERIES)]
+                    await macros.replay(website, FakeContext(FakePage("https://www.myntra.com")), query, "https://www.myntra.com/")
+                    page = FakePage("https://www.meesho.com")
+                    await macros.replay(opaque_site, FakeContext(page), query, "https://www.meesho.com/")
+                checks["replayed actions type into the learned element"] = page.fills == ["xpath=html/body/header/div/input"]
+
+                # The site changes its URLs: replays land on an error page until the macro is dropped
+                for query in QUERIES[:4]:
+                    await macros.replay(
+                        website, FakeContext(FakePage("https://www.myntra.com", serves_results=False)), query, "https://www.myntra.com/"
+                    )
+                # A replay that wanders off the site fails its check, and only counts against that site's macro
+                await macros.replay(opaque_site, FakeContext(FakePage("https://www.elsewhere.com")), QUERIES[0], "https://www.meesho.com/")
+
+            asyncio.run(simulate())
+            stats = macros.stats()
+            checks["every valid replay is a hit"] = stats["replay_hits"] == 2 * options["searches"]
+            checks["a broken macro is dropped after 3 failures"] = (
+                macros.get(website) is None and macros.get(opaque_site) is not None and stats["dropped"] == 1
+            )
+            checks["the drop is persisted"] = NavigationMacros(path=path).get(website) is None
+
+        self.stdout.write(
+            f"{stats['replays']} replays: {stats['replay_hits']} hits, {stats['replay_failures']} failures "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['dropped']} macro dropped; saved {stats['steps_saved']} "
+            f"agent steps and {stats['tokens_saved']} tokens"
+        )
+        failed = [check for check, passed in checks.items() if not passed]
+        if failed:
+            raise CommandError("Navigation macro checks failed: " + "; ".join(failed))
+        self.stdout.write(f"all {len(checks)} checks passed")
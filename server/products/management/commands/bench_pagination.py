@@ -0,0 +1,95 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment
+
+from products import views
+from products.benchmarking import DEFAULT_STUB_RESPONSES, StubOpenAIServer, stub_search_website
+from products.catalog import CatalogStore
+from products.models import SourcedFromEnum
+from products.pagination import SearchSession
+from products.result_cache import ResultCache
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure paging through search results with cursors, with and without prefetching the next page, and check "
+        "the next page is only prefetched for clients that page"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--browse", type=float, default=1.0, help="Stubbed browsing time per results page in seconds")
+        parser.add_argument("--per-page", type=int, default=10, help="Products on each site's results page")
+        parser.add_argument("--count", type=int, default=20, help="Products requested per page")
+        parser.add_argument("--pages", type=int, default=4, help="Pages requested per search")
+        parser.add_argument("--think", type=float, default=1.5, help="Seconds between pages, as a user scrolling")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        websites = [website.value for website in SourcedFromEnum]
+
+        async def browse() -> List[Tuple[float, int]]:
+            client = AsyncClient()
+            pages: List[Tuple[float, int]] = []
+            payload: Dict[str, object] = {"query": "men black jeans", "count": options["count"]}
+            for _ in range(options["pages"]):
+                started = time.perf_counter()
+                response = await client.post("/api/search/", payload, content_type="application/json")
+                assert response.status_code == 200, response.status_code
+                body = response.json()
+                pages.append((time.perf_counter() - started, len(body["products"])))
+                if not body["cursor"]:
+                    break
+                payload = {"cursor": body["cursor"], "count": options["count"]}
+                await asyncio.sleep(options["think"])
+            return pages
+
+        async def prefetched_after(payload: Dict[str, object]) -> bool:
+            """
+            Search once and report whether a second results page was browsed while the user reads the first.
+            """
+            browsed_pages.clear()
+            response = await AsyncClient().post("/api/search/", payload, content_type="application/json")
+            assert response.status_code == 200, response.status_code
+            await asyncio.sleep(options["browse"] * 1.5)
+            return any(page > 1 for page in browsed_pages)
+
+        responses = {"StructuredSearchQuery": {**DEFAULT_STUB_RESPONSES["StructuredSearchQuery"], "source_from": websites}}
+        stub = stub_search_website(options["browse"], products_per_page=options["per_page"])
+        browsed_pages: List[int] = []
+
+        async def search_website(*args: Any, page: int = 1, **kwargs: Any):
+            browsed_pages.append(page)
+            return await stub(*args, page=page, **kwargs)
+
+        modes = (
+            ("prefetch", SearchSession.start_prefetch),
+            ("no prefetch", lambda session, count, fetch: None),
+        )
+
+        with StubOpenAIServer(latency=0.05, responses=responses), \
+                override_settings(SEARCH_LATENCY_BUDGET=60, SEARCH_MAX_PAGES=50), \
+                mock.patch.object(views, "search_website", search_website), \
+                mock.patch.object(views, "get_result_cache", lambda: ResultCache(default_ttl=0, stale_ttl=0)), \
+                mock.patch.object(views, "get_catalog", lambda: CatalogStore(enabled=False)):
+            for name, start_prefetch in modes:
+                with mock.patch.object(SearchSession, "start_prefetch", start_prefetch):
+                    pages = asyncio.run(browse())
+                summary = ", ".join(f"page {number} {seconds:.2f} s ({count} products)" for number, (seconds, count) in enumerate(pages, 1))
+                self.stdout.write(f"{name:>11}: {summary}")
+
+            # Only a client that asks for a page size or resumes a cursor has the next page browsed ahead
+            without_count = asyncio.run(prefetched_after({"query": "men black jeans"}))
+            # Asking for every product of the first pages leaves the next count to browse
+            first_pages = options["per_page"] * len(websites)
+            with_count = asyncio.run(prefetched_after({"query": "men black jeans", "count": first_pages}))
+            self.stdout.write(
+                f"next page prefetched: {'yes' if without_count else 'no'} for a plain search, "
+                f"{'yes' if with_count else 'no'} with a count"
+            )
+            if without_count or not with_count:
+                raise CommandError("The next page should be prefetched only for searches that ask for a count")
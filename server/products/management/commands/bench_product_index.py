@@ -0,0 +1,66 @@
+import random
+import resource
+import statistics
+import time
+from typing import List
+
+from django.core.management.base import BaseCommand
+
+from products.benchmarking import COLORS, ITEMS, MATERIALS, synthetic_products
+from products.models import GenderEnum, SourcedFromEnum, StructuredSearchQuery
+from products.product_index import ProductIndex
+
+def synthetic_queries(count: int, seed: int = 11) -> List[StructuredSearchQuery]:
+    """
+    Generate structured queries mixing item names with optional colors, material, gender and price bounds.
+    """
+    rng = random.Random(seed)
+    queries: List[StructuredSearchQuery] = []
+    for _ in range(count):
+        min_price = rng.choice([None, None, 300, 500])
+        queries.append(StructuredSearchQuery(
+            item_name=rng.choice(ITEMS),
+            item_colors=rng.sample(COLORS, rng.choice([0, 1, 1, 2])) or None,
+            material=rng.choice(MATERIALS) if rng.random() < 0.3 else None,
+            gender=rng.choice([GenderEnum.Men, GenderEnum.Women, None]),
+            min_price=min_price,
+            max_price=rng.choice([None, 1000, 1500, 2000, 5000]),
+            has_only_unsupported_platforms=False,
+        ))
+    return queries
+
+
+class Command(BaseCommand):
+    help = "Measure build time, memory and query latency of the in-process product index over synthetic catalogs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Catalog sizes")
+        parser.add_argument("--queries", type=int, default=2000, help="Queries per size")
+
+    def handle(self, *args, **options):
+        queries = synthetic_queries(options["queries"])
+        websites = list(SourcedFromEnum)
+
+        for size in options["sizes"]:
+            rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            started = time.perf_counter()
+            index = ProductIndex(synthetic_products(size))
+            build_s = time.perf_counter() - started
+            rss_growth_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before_kb) / 1024
+
+            latencies_us: List[float] = []
+            found: List[int] = []
+            for position, query in enumerate(queries):
+                started = time.perf_counter()
+                results = index.search(query, websites[position % len(websites)])
+                latencies_us.append((time.perf_counter() - started) * 1e6)
+                found.append(len(results))
+
+            latencies_us.sort()
+            p99 = latencies_us[min(len(latencies_us) - 1, int(len(latencies_us) * 0.99))]
+            self.stdout.write(
+                f"{size:>9,} products: built in {build_s:.1f} s (+{rss_growth_mb:.0f} MB peak RSS), "
+                f"query p50 {statistics.median(latencies_us):.0f} us, p99 {p99:.0f} us, max {latencies_us[-1]:.0f} us, "
+                f"{statistics.mean(found):.1f} results on average"
+            )
+            del index
@@ -0,0 +1,160 @@
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple, Type
+
+import tiktoken
+from browser_use import Controller
+from browser_use.agent.prompts import SystemPrompt
+from browser_use.agent.views import AgentOutput
+from django.core.management.base import BaseCommand
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel
+
+from products.models import Products, SourcedFromEnum
+from products.prompts import AGENT_OUTPUT_MODEL, build_agent_task
+from products.search import WEBSITE_URLS
+
+TRANSCRIPTS_DIR: Path = Path(__file__).resolve().parents[2] / "agent_transcripts"
+
+# OpenAI caches prompt prefixes of at least 1024 tokens, in 128 token increments
+CACHE_MIN_TOKENS: int = 1024
+CACHE_INCREMENT: int = 128
+
+
+def legacy_agent_task(website_url: str, search_query: str) -> str:
+    """
+    The task string search_website sent before the prompt builder, kept for comparison.
+    """
+    return f"""
+        INSTRUCTIONS FOR DATA COLLECTION:
+
+        When conducting a search on {website_url}, follow these steps to extract relevant product information:
+
+        1. Navigate to the website: Open {website_url} in a browser.
+        2. Perform a search: Locate the search box and enter the exact query: '{search_query}'. Please press enter key next after entering the query.
+        3. Analyze the search results page: Focus on the first page and extract up to 10 most relevant products. Prioritize top-ranking results.
+        4. Extract the following details for each product:
+
+        - Product Name: The name of the product as displayed on the website.
+        - Product URL: The complete HTTPS link to the product's dedicated page.
+        - Product Image URL: The full HTTPS link to the product's main image.
+        - Maximum Retail Price (MRP): The original price before discounts (if available).
+        - Discount Percentage: The percentage of discount applied (if any, otherwise 0).
+        - Selling Price: The current price at which the product is being sold.
+        - Sourced From: The name of the e-commerce platform where the product is listed.
+
+        5. If no products match the search criteria, **do not return anything**.
+
+
+        6. Ensure Accuracy & Formatting:
+        - Extract only relevant products matching the search query.
+        - Verify that URLs are complete and lead to the correct product pages.
+        - Ensure numerical values (MRP, discount, selling price) are correctly formatted.
+        - Return the data in valid JSON format based on the provided schema.
+            {Products.model_json_schema()}
+        """
+
+
+def load_tokenizer() -> Tuple[Callable[[str], List[Any]], bool]:
+    """
+    Tokenize with gpt-4o-mini's encoding, or approximate with words and punctuation when it can't be downloaded.
+    Returns the tokenizer and whether its counts are exact.
+    """
+    try:
+        return tiktoken.get_encoding("o200k_base").encode, True
+    except Exception:
+        return re.compile(r"\w+|[^\w\s]").findall, False
+
+
+def cacheable(prefix_tokens: int) -> int:
+    """
+    Tokens of a shared prefix the provider can serve from its prompt cache.
+    """
+    if prefix_tokens < CACHE_MIN_TOKENS:
+        return 0
+    return CACHE_MIN_TOKENS + (prefix_tokens - CACHE_MIN_TOKENS) // CACHE_INCREMENT * CACHE_INCREMENT
+
+
+class Command(BaseCommand):
+    help = "Compare the tokens and estimated prefill latency of the legacy and compact agent prompts over a recorded agent transcript"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transcript", default=str(TRANSCRIPTS_DIR / "myntra.json"), help="Recorded agent transcript (JSON)")
+        parser.add_argument("--prefill-tps", type=float, default=4000, help="Uncached input tokens the provider prefills per second")
+        parser.add_argument("--builds", type=int, default=1000, help="Task builds to time")
+
+    def handle(self, *args, **options):
+        transcript: Dict[str, Any] = json.loads(Path(options["transcript"]).read_text())
+        website = SourcedFromEnum(transcript["website"])
+        other_website = next(other for other in SourcedFromEnum if other != website)
+        tokenize, exact = load_tokenizer()
+        if not exact:
+            self.stderr.write("o200k_base encoding unavailable, token counts are approximate")
+
+        def request_text(build_task: Callable[[str, str], str], output_model: Type[BaseModel], site: SourcedFromEnum, steps: int) -> str:
+            # Serialize a step's request in the order the provider sees it: tools, system prompt, task, history, state
+            controller = Controller(output_model=output_model)
+            tool = convert_to_openai_tool(AgentOutput.type_with_custom_actions(controller.registry.create_action_model()))
+            parts: List[str] = [
+                json.dumps(tool),
+                SystemPrompt(controller.registry.get_prompt_description()).get_system_message().content,
+                f'Your ultimate task is: """{build_task(WEBSITE_URLS[site], transcript["search_query"])}""".',
+            ]
+            for step in transcript["steps"][:steps]:
+                parts.append(json.dumps(step["model_output"]))
+            parts.append(transcript["steps"][steps]["state"])
+            return "\n".join(parts)
+
+        def shared_prefix(first: str, second: str) -> int:
+            first_tokens, second_tokens = tokenize(first), tokenize(second)
+            length = 0
+            for a, b in zip(first_tokens, second_tokens):
+                if a != b:
+                    break
+                length += 1
+            return length
+
+        prompts = (
+            ("legacy", legacy_agent_task, Products),
+            ("compact", build_agent_task, AGENT_OUTPUT_MODEL),
+        )
+        totals: Dict[str, Dict[str, float]] = {}
+        for name, build_task, output_model in prompts:
+            self.stdout.write(f"{name} prompt:")
+            total_input = total_cached = 0
+            previous = ""
+            for index in range(len(transcript["steps"])):
+                text = request_text(build_task, output_model, website, index)
+                tokens = len(tokenize(text))
+                if index == 0:
+                    # A search on another site moments earlier leaves its prefix in the cache
+                    prefix = shared_prefix(text, request_text(build_task, output_model, other_website, 0))
+                else:
+                    prefix = shared_prefix(text, previous)
+                cached = cacheable(prefix)
+                total_input += tokens
+                total_cached += cached
+                previous = text
+                self.stdout.write(f"  step {index + 1}: {tokens} input tokens, {cached} cacheable")
+
+            started = time.perf_counter()
+            for _ in range(options["builds"]):
+                build_task(WEBSITE_URLS[website], transcript["search_query"])
+            build_us = (time.perf_counter() - started) * 1e6 / options["builds"]
+
+            prefill_s = (total_input - total_cached) / options["prefill_tps"]
+            totals[name] = {"input": total_input, "cached": total_cached, "prefill": prefill_s}
+            self.stdout.write(
+                f"  total: {total_input} input tokens, {total_cached} cacheable, "
+                f"~{prefill_s:.2f} s estimated prefill, {build_us:.1f} us per task build"
+            )
+
+        legacy, compact = totals["legacy"], totals["compact"]
+        self.stdout.write(
+            f"compact vs legacy: {1 - compact['input'] / legacy['input']:.0%} fewer input tokens, "
+            f"{1 - (compact['input'] - compact['cached']) / (legacy['input'] - legacy['cached']):.0%} fewer uncached tokens, "
+            f"~{legacy['prefill'] - compact['prefill']:.2f} s less prefill per site search "
+            "(text only; screenshots cost the same in both)"
+        )
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import re
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import serializers
+from products.benchmarking import PARSER_FALLBACK_CORPUS, STRUCTURING_CORPUS, StubOpenAIServer
+from products.llm_cache import LLMResponseCache
+from products.models import StructuredSearchQuery
+from products.product_index import tokenize
+from products.query_parser import RuleBasedQueryParser
+from products.serializers import STRUCTURED_QUERY_SYSTEM_PROMPT, ProductSearchSerializer
+
+FIELDS: Tuple[str, ...] = tuple(StructuredSearchQuery.model_fields)
+
+
+def prompt_examples() -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    The example queries and outputs embedded in the structuring prompt.
+    """
+    return [
+        (query, json.loads(output))
+        for query, output in re.findall(r'Query: "(.+?)"\s*(\{.*?\n\s*\})', STRUCTURED_QUERY_SYSTEM_PROMPT, re.DOTALL)
+    ]
+
+
+def normalized(field: str, value: Any) -> Any:
+    # The prompt's examples write gender in lower case and may leave lists empty instead of null
+    if value is None or value == []:
+        return None
+    if field == "item_name":
+        return tuple(tokenize(value))
+    if isinstance(value, list):
+        return sorted(str(getattr(item, "value", item)).lower() for item in value)
+    if field in ("min_price", "max_price"):
+        return float(value)
+    if isinstance(value, bool):
+        return value
+    return str(getattr(value, "value", value)).lower()
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the rule-based query parser against the structuring prompt's examples and the labelled structuring "
+        "corpus, and measure the share it parses locally and the structuring latency with and without it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rtt", type=float, default=0.6, help="Stubbed OpenAI round trip time in seconds")
+        parser.add_argument("--repeat", type=int, default=500, help="Local parses timed per query")
+        parser.add_argument(
+            "--min-parsed", type=float, default=0.8, help="Fail if the rules parse a smaller share of the corpus"
+        )
+
+    def handle(self, *args, **options):
+        parser = RuleBasedQueryParser()
+        corpus = prompt_examples() + STRUCTURING_CORPUS
+        if not prompt_examples():
+            raise CommandError("No examples found in the structuring prompt")
+
+        parsed_locally = 0
+        field_hits: Dict[str, int] = {field: 0 for field in FIELDS}
+        mistakes: List[str] = []
+        for query, expected in corpus:
+            parsed = parser.parse(query)
+            if parsed.confidence < parser.min_confidence:
+                self.stdout.write(f"  LLM {parsed.confidence:.2f} {query!r}: {', '.join(parsed.doubts)}")
+                continue
+            parsed_locally += 1
+            actual = parsed.structured_query.model_dump()
+            expected = {"has_only_unsupported_platforms": False, **expected}
+            wrong = [
+                field for field in FIELDS
+                if normalized(field, actual[field]) != normalized(field, expected.get(field))
+            ]
+            for field in FIELDS:
+                field_hits[field] += field not in wrong
+            if wrong:
+                mistakes.append(
+                    f"{query!r}: " + ", ".join(f"{field} {actual[field]!r} != {expected.get(field)!r}" for field in wrong)
+                )
+
+        for query in PARSER_FALLBACK_CORPUS:
+            parsed = parser.parse(query)
+            if parsed.confidence >= parser.min_confidence:
+                mistakes.append(
+                    f"{query!r}: parsed locally at {parsed.confidence:.2f} as {parsed.structured_query.item_name!r}, "
+                    "should go to the LLM"
+                )
+
+        total = len(corpus)
+        self.stdout.write(
+            f"{total} labelled queries ({len(prompt_examples())} from the prompt): {parsed_locally} parsed locally "
+            f"({parsed_locally / total:.0%}), {total - parsed_locally} left to the LLM, {len(mistakes)} parsed wrong; "
+            f"{len(PARSER_FALLBACK_CORPUS)} queries checked to go to the LLM"
+        )
+        if parsed_locally:
+            self.stdout.write("field accuracy on local parses: " + ", ".join(
+                f"{field} {hits / parsed_locally:.0%}" for field, hits in field_hits.items()
+            ))
+
+        durations: List[float] = []
+        for query, _ in corpus:
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                parser.parse(query)
+            durations.append((time.perf_counter() - started) / options["repeat"])
+        durations.sort()
+        self.stdout.write(
+            f"local parse: median {statistics.median(durations) * 1e6:.1f} us, max {durations[-1] * 1e6:.1f} us per query"
+        )
+
+        async def structure_all() -> List[float]:
+            latencies = []
+            for query, _ in corpus:
+                serializer = ProductSearchSerializer(data={"query": query})
+                serializer.is_valid(raise_exception=True)
+                started = time.perf_counter()
+                await serializer.ato_structured_query()
+                latencies.append(time.perf_counter() - started)
+            return latencies
+
+        # Every query the rules leave pays an LLM round trip: the structuring cache is disabled
+        with StubOpenAIServer(latency=options["rtt"]), \
+                mock.patch.object(serializers, "get_structuring_cache", lambda: LLMResponseCache(max_entries=0)):
+            for name, tiered in (("LLM only", RuleBasedQueryParser(enabled=False)), ("tiered", RuleBasedQueryParser())):
+                with mock.patch.object(serializers, "get_query_parser", lambda: tiered):
+                    latencies = asyncio.run(structure_all())
+                self.stdout.write(
+                    f"{name:>9}: structuring latency mean {statistics.mean(latencies) * 1000:.1f} ms, "
+                    f"median {statistics.median(latencies) * 1000:.1f} ms"
+                )
+
+        if parsed_locally / total < options["min_parsed"]:
+            mistakes.append(f"parsed {parsed_locally / total:.0%} locally, below {options['min_parsed']:.0%}")
+        if mistakes:
+            raise CommandError("Rule-based parser checks failed:\n" + "\n".join(mistakes))
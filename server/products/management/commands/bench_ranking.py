@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+from typing import Callable, List
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.benchmarking import synthetic_products
+from products.models import GenderEnum, Product, SourcedFromEnum, StructuredSearchQuery
+from products.product_index import tokenize
+from products.ranking import QueryRelevance, rank_products
+
+QUERY = StructuredSearchQuery(
+    item_name="Jeans",
+    item_colors=["Black"],
+    material="Denim",
+    gender=GenderEnum.Men,
+    has_only_unsupported_platforms=False,
+)
+
+
+def site_lists(count: int, duplicate_rate: float, seed: int = 3) -> List[List[Product]]:
+    """
+    Split synthetic products into cheapest-first per-website lists, relisting a share of them on another
+    website with a reordered name, a resized image and a slightly different price.
+    """
+    rng = random.Random(seed)
+    websites = list(SourcedFromEnum)
+    lists: List[List[Product]] = [[] for _ in websites]
+    for position, product in enumerate(synthetic_products(count)):
+        lists[position % len(websites)].append(product)
+        if rng.random() < duplicate_rate:
+            words = product.product_name.split()
+            rng.shuffle(words)
+            lists[(position + 1) % len(websites)].append(product.model_copy(update={
+                "product_name": " ".join(words),
+                "product_image_url": product.product_image_url.replace(".jpg", "_400x600.jpg"),
+                "selling_price": round(product.selling_price * rng.uniform(0.9, 1.1)),
+                "sourced_from": websites[(position + 1) % len(websites)],
+            }))
+    for products in lists:
+        products.sort(key=lambda product: product.selling_price)
+    return lists
+
+
+def concatenate_and_sort(lists: List[List[Product]]) -> List[Product]:
+    """
+    Baseline: concatenate the lists and fully re-sort by relevance and price, without deduplication.
+    """
+    query_relevance = QueryRelevance(QUERY)
+    products = [product for products in lists for product in products]
+    return sorted(products, key=lambda product: (-query_relevance.score(set(tokenize(product.product_name))), product.selling_price))
+
+
+class Command(BaseCommand):
+    help = "Measure the cross-site merge, deduplication and ranking stage against concatenating and re-sorting"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10_000, 100_000], help="Products across all websites")
+        parser.add_argument("--duplicate-rate", type=float, default=0.2, help="Share of products relisted on another website")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per size")
+
+    def handle(self, *args, **options):
+        self.check_deduplication()
+        for size in options["sizes"]:
+            lists = site_lists(size, options["duplicate_rate"])
+            total = sum(len(products) for products in lists)
+
+            def timed(stage: Callable[[], List[Product]]) -> float:
+                durations = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    stage()
+                    durations.append(time.perf_counter() - started)
+                return statistics.median(durations) * 1000
+
+            ranked = rank_products(lists, QUERY)
+            ranked_ms = timed(lambda: rank_products(lists, QUERY))
+            baseline_ms = timed(lambda: concatenate_and_sort(lists))
+            self.stdout.write(
+                f"{total:>7,} listings: merged and ranked in {ranked_ms:.2f} ms ({ranked_ms * 1000 / total:.2f} us each), "
+                f"concatenate and sort {baseline_ms:.2f} ms; {total - len(ranked):,} duplicates collapsed"
+            )
+
+    def check_deduplication(self) -> None:
+        """
+        Generic titles on one website are different products; the same title on another website is a relisting.
+        """
+        first, second = synthetic_products(2)
+        generic = {"product_name": "Men Regular Fit Solid Casual Shirt", "sourced_from": SourcedFromEnum.flipkart}
+        flipkart = [
+            first.model_copy(update=generic),
+            second.model_copy(update={**generic, "selling_price": second.selling_price + 1}),
+        ]
+        relisted = first.model_copy(update={
+            "product_name": "Solid Casual Shirt Regular Fit",
+            "product_url": "https://www.myntra.com/shirts/relisted/buy",
+            "product_image_url": "https://assets.myntassets.com/relisted-shirt.jpg",
+            "sourced_from": SourcedFromEnum.myntra,
+            "selling_price": first.selling_price + 2,
+        })
+        ranked = rank_products([flipkart, [relisted]], QUERY)
+        if [product.sourced_from for product in ranked] != [SourcedFromEnum.flipkart, SourcedFromEnum.flipkart]:
+            raise CommandError(
+                "Ranking should keep both same-site listings and collapse the cross-site one, got "
+                + ", ".join(f"{product.sourced_from} {product.product_name!r}" for product in ranked)
+            )
+        self.stdout.write("deduplication: same-site generic titles kept, cross-site relisting collapsed")
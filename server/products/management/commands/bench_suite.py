@@ -0,0 +1,216 @@
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment
+
+from products import serializers, views
+from products.benchmarking import DEFAULT_STUB_RESPONSES, StubOpenAIServer, stub_search_website
+from products.browser_pool import process_tree_rss_mb
+from products.catalog import CatalogStore
+from products.guard import LocalGuard
+from products.llm_cache import LLMResponseCache
+from products.models import SourcedFromEnum
+from products.query_parser import RuleBasedQueryParser
+from products.replay import REPLAY, Cassette, ReplayOpenAIServer, replay_search_website
+from products.result_cache import ResultCache
+from products.scheduler import SearchScheduler
+
+# Recorded search replayed by default: its products come from the saved extractor fixtures
+DEFAULT_CASSETTE: Path = Path(__file__).resolve().parents[2] / "cassettes" / "men-black-jeans"
+
+# Whether a higher value of each benchmark is better
+HIGHER_IS_BETTER: Dict[str, bool] = {
+    "latency_p50_s": False,
+    "latency_p95_s": False,
+    "throughput_per_s": True,
+    "memory_peak_kib_per_search": False,
+    "memory_rss_peak_mib": False,
+    "latency_p50_local_tiers_s": False,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Offline benchmark suite for the whole search path: end-to-end latency, throughput under concurrency and "
+        "memory per search, replayed from a cassette or stubbed, optionally compared against a baseline. The local "
+        "guard and rule parser are off so every search calls the LLM; their latency is reported separately"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cassette", default=str(DEFAULT_CASSETTE), help="Cassette recorded with record_search")
+        parser.add_argument("--stubbed", action="store_true", help="Use stubbed OpenAI and site searches instead of a cassette")
+        parser.add_argument("--browser", action="store_true", help="Replay the cassette's pages through the browser, extractors and agent")
+        parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier of the recorded OpenAI and site latencies")
+        parser.add_argument("--rtt", type=float, default=0.1, help="Stubbed OpenAI round trip time in seconds, with --stubbed")
+        parser.add_argument("--browse", type=float, default=0.5, help="Stubbed per-site browsing time in seconds, with --stubbed")
+        parser.add_argument("--searches", type=int, default=20, help="Sequential searches timed for latency")
+        parser.add_argument("--concurrency", type=int, default=16, help="Searches in flight for throughput and memory")
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+        parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before a regression fails the run")
+
+    @contextlib.contextmanager
+    def backends(self, options: Dict[str, Any]) -> Iterator[str]:
+        """
+        Point OpenAI and the site searches at the cassette or the stubs, with every cache disabled so each search
+        runs the whole pipeline, and yield the query to search for.
+        """
+        patches: List[Any] = [
+            mock.patch.object(views, "get_result_cache", lambda: ResultCache(default_ttl=0, stale_ttl=0)),
+            mock.patch.object(views, "get_catalog", lambda: CatalogStore(enabled=False)),
+            mock.patch.object(views, "get_guard_cache", lambda: LLMResponseCache(max_entries=0)),
+            mock.patch("products.serializers.get_structuring_cache", lambda: LLMResponseCache(max_entries=0)),
+        ]
+        if not options["stubbed"]:
+            cassette = Cassette(options["cassette"])
+            if cassette.query is None:
+                raise CommandError(f"{options['cassette']} holds no recorded search")
+            server = ReplayOpenAIServer(cassette, REPLAY, latency_scale=options["latency_scale"])
+            if options["browser"]:
+                patches.append(override_settings(SEARCH_PAGE_SNAPSHOTS={"path": options["cassette"], "mode": REPLAY}))
+            else:
+                patches.append(mock.patch.object(
+                    views, "search_website", replay_search_website(cassette, latency_scale=options["latency_scale"])
+                ))
+            query = cassette.query
+        else:
+            websites = [website.value for website in SourcedFromEnum]
+            responses = {"StructuredSearchQuery": {**DEFAULT_STUB_RESPONSES["StructuredSearchQuery"], "source_from": websites}}
+            server = StubOpenAIServer(latency=options["rtt"], responses=responses)
+            patches.append(mock.patch.object(views, "search_website", stub_search_website(options["browse"])))
+            query = "men black jeans"
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(server)
+            for patch in patches:
+                stack.enter_context(patch)
+            yield query
+        if isinstance(server, ReplayOpenAIServer) and server.misses:
+            raise CommandError(f"{server.misses} OpenAI requests weren't in the cassette; re-record it")
+
+    @staticmethod
+    @contextlib.contextmanager
+    def local_tiers_off() -> Iterator[None]:
+        """
+        Turn the local guard and the rule-based parser off, so every search pays the guard and structuring LLM calls.
+        """
+        with mock.patch.object(views, "get_local_guard", lambda: LocalGuard(enabled=False)), \
+                mock.patch.object(serializers, "get_query_parser", lambda: RuleBasedQueryParser(enabled=False)):
+            yield
+
+    @staticmethod
+    @contextlib.contextmanager
+    def peak_rss(samples: List[float], interval: float = 0.02) -> Iterator[None]:
+        """
+        Sample the resident memory of this process and its children (browsers and their driver) until exit.
+        """
+        stop = threading.Event()
+
+        def sample() -> None:
+            while True:
+                samples.append(process_tree_rss_mb([os.getpid()]) or 0.0)
+                if stop.wait(interval):
+                    return
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        concurrency: int = options["concurrency"]
+        results: Dict[str, float] = {}
+
+        async def search(client: AsyncClient, query: str) -> None:
+            response = await client.post("/api/search/", {"query": query}, content_type="application/json")
+            if response.status_code != 200:
+                raise CommandError(f"Search failed with HTTP {response.status_code}: {response.content[:200]!r}")
+
+        def run(benchmark: Callable[[AsyncClient], Any]) -> Any:
+            async def main() -> Any:
+                return await benchmark(AsyncClient())
+            return asyncio.run(main())
+
+        async def latency(client: AsyncClient) -> List[float]:
+            durations = []
+            for _ in range(options["searches"]):
+                started = time.perf_counter()
+                await search(client, query)
+                durations.append(time.perf_counter() - started)
+            return sorted(durations)
+
+        async def concurrent(client: AsyncClient) -> float:
+            started = time.perf_counter()
+            await asyncio.gather(*(search(client, query) for _ in range(concurrency)))
+            return time.perf_counter() - started
+
+        unbounded_scheduler = SearchScheduler(max_agents=concurrency * 8, max_queued=concurrency * 8)
+        with self.backends(options) as query, \
+                mock.patch.object(views, "get_search_scheduler", lambda: unbounded_scheduler):
+            with self.local_tiers_off():
+                # Warm up imports, clients and the browser pool outside the timings
+                run(lambda client: search(client, query))
+
+                durations = run(latency)
+                results["latency_p50_s"] = statistics.median(durations)
+                results["latency_p95_s"] = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+
+                results["throughput_per_s"] = concurrency / run(concurrent)
+
+                # tracemalloc sees Python allocations only; the resident memory includes the browsers' processes
+                rss_samples: List[float] = []
+                tracemalloc.start()
+                try:
+                    with self.peak_rss(rss_samples):
+                        run(concurrent)
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                results["memory_peak_kib_per_search"] = peak / 1024 / concurrency
+                results["memory_rss_peak_mib"] = max(rss_samples)
+
+            # As served: the local guard and rule parser answer what they can without the LLM
+            results["latency_p50_local_tiers_s"] = statistics.median(run(latency))
+
+        for name, value in results.items():
+            self.stdout.write(f"{name:>27}: {value:.3f}")
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump({
+                    "results": results,
+                    "python": platform.python_version(),
+                    "cassette": None if options["stubbed"] else options["cassette"],
+                    "browser": options["browser"],
+                }, file, indent=1)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline: Dict[str, float] = json.load(file)["results"]
+            regressions = []
+            for name, value in results.items():
+                if name not in baseline or not baseline[name]:
+                    continue
+                change = value / baseline[name] - 1
+                worse = -change if HIGHER_IS_BETTER[name] else change
+                self.stdout.write(f"{name:>27}: {change:+.1%} vs baseline")
+                if worse > options["tolerance"]:
+                    regressions.append(f"{name} {baseline[name]:.3f} -> {value:.3f}")
+            if regressions:
+                raise CommandError(f"Regressed beyond {options['tolerance']:.0%}: {'; '.join(regressions)}")
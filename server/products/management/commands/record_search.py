@@ -0,0 +1,62 @@
+import asyncio
+from typing import Dict, Optional
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment
+
+from products import serializers, views
+from products.catalog import CatalogStore
+from products.guard import LocalGuard
+from products.llm_cache import LLMResponseCache
+from products.query_parser import RuleBasedQueryParser
+from products.replay import RECORD, Cassette, ReplayOpenAIServer, record_search_website
+from products.result_cache import ResultCache
+
+
+class Command(BaseCommand):
+    help = "Record a live search's OpenAI responses, products and browser pages into a cassette for offline benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("cassette", help="Directory to record into")
+        parser.add_argument("--query", required=True, help="Natural language query to search for")
+        parser.add_argument("--count", type=int, default=None, help="Products per page")
+        parser.add_argument("--pages", type=int, default=1, help="Result pages to fetch, following cursors")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        cassette = Cassette(options["cassette"])
+        cassette.query = options["query"]
+
+        async def search() -> None:
+            client = AsyncClient()
+            payload: Dict[str, object] = {"query": options["query"]}
+            if options["count"]:
+                payload["count"] = options["count"]
+            for page in range(1, options["pages"] + 1):
+                response = await client.post("/api/search/", payload, content_type="application/json")
+                body = response.json()
+                self.stdout.write(f"page {page}: HTTP {response.status_code}, {len(body.get('products', []))} products")
+                cursor: Optional[str] = body.get("cursor")
+                if not cursor:
+                    break
+                payload = {"cursor": cursor, **({"count": options["count"]} if options["count"] else {})}
+
+        # Nothing may be answered from a cache or the local guard and parser, or it would be missing from the cassette
+        with ReplayOpenAIServer(cassette, RECORD), \
+                override_settings(SEARCH_PAGE_SNAPSHOTS={"path": options["cassette"], "mode": RECORD}), \
+                mock.patch.object(views, "search_website", record_search_website(views.search_website, cassette)), \
+                mock.patch.object(views, "get_result_cache", lambda: ResultCache(default_ttl=0, stale_ttl=0)), \
+                mock.patch.object(views, "get_catalog", lambda: CatalogStore(enabled=False)), \
+                mock.patch.object(views, "get_guard_cache", lambda: LLMResponseCache(max_entries=0)), \
+                mock.patch("products.serializers.get_structuring_cache", lambda: LLMResponseCache(max_entries=0)), \
+                mock.patch.object(views, "get_local_guard", lambda: LocalGuard(enabled=False)), \
+                mock.patch.object(serializers, "get_query_parser", lambda: RuleBasedQueryParser(enabled=False)):
+            asyncio.run(search())
+        cassette.save()
+
+        pages = sum(len(site_pages) for site_pages in cassette.sites.values())
+        self.stdout.write(
+            f"Recorded {len(cassette.responses)} OpenAI response keys and {pages} site pages into {options['cassette']}"
+        )
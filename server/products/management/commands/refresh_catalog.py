@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from typing import List
+
+from browser_use import Controller
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from langchain_openai import ChatOpenAI
+
+from products.browser_pool import get_browser_pool
+from products.catalog import DEFAULT_POPULAR_WINDOW, CatalogStore, get_catalog
+from products.models import CatalogQuery, Product, SourcedFromEnum, StructuredSearchQuery
+from products.llm_clients import get_controller, get_llm_clients
+from products.scheduler import get_search_scheduler, get_site_deadline
+from products.search import LLM_MODEL, search_website
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Background worker that keeps the most requested catalog queries fresh by re-scraping them on a schedule"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run a single refresh round and exit")
+        parser.add_argument("--interval", type=float, default=getattr(settings, "CATALOG_REFRESH_INTERVAL", 15 * 60), help="Seconds between refresh rounds")
+        parser.add_argument("--top", type=int, default=getattr(settings, "CATALOG_REFRESH_TOP", 20), help="Queries refreshed per round")
+        parser.add_argument("--refresh-after", type=float, default=getattr(settings, "CATALOG_REFRESH_AFTER", 60 * 60), help="Age in seconds after which a query is due")
+
+    def handle(self, *args, **options):
+        catalog: CatalogStore = get_catalog()
+        window: float = getattr(settings, "CATALOG_POPULAR_WINDOW", DEFAULT_POPULAR_WINDOW)
+
+        while True:
+            queries: List[CatalogQuery] = catalog.popular_queries(options["top"], options["refresh_after"], window)
+            if queries:
+                started = time.perf_counter()
+                refreshed: int = get_browser_pool().run(self.refresh(catalog, queries))
+                written: int = catalog.flush()
+                self.stdout.write(
+                    f"Refreshed {refreshed}/{len(queries)} queries, {written} products written "
+                    f"in {time.perf_counter() - started:.1f} s"
+                )
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+
+    @staticmethod
+    async def refresh(catalog: CatalogStore, queries: List[CatalogQuery]) -> int:
+        """
+        Re-scrape queries concurrently, within the scheduler's agent caps and each site's deadline.
+
+        Args:
+            catalog: Store receiving the scraped products
+            queries: Queries due for a refresh
+
+        Returns:
+            int: Number of queries that returned products
+        """
+        llm: ChatOpenAI = get_llm_clients().chat_model(LLM_MODEL)
+        controller: Controller = get_controller()
+        scheduler = get_search_scheduler()
+
+        async def refresh_one(query: CatalogQuery) -> bool:
+            website = SourcedFromEnum(query.sourced_from)
+            structured_query = StructuredSearchQuery.model_validate(query.structured_query)
+            try:
+                async with asyncio.timeout(get_site_deadline(website)):
+                    async with scheduler.slot(website):
+                        products: List[Product] = await search_website(
+                            website, query.search_string, llm, controller, get_browser_pool(),
+                            structured_query=structured_query
+                        )
+            except Exception as e:
+                logger.warning(f"Refreshing '{query.search_string}' on {website} failed: {str(e)}")
+                return False
+            if products:
+                catalog.record_scrape(
+                    structured_query,
+                    query.search_string,
+                    website,
+                    products
+                )
+            return bool(products)
+
+        results = await asyncio.gather(*(refresh_one(query) for query in queries))
+        return sum(results)
@@ -0,0 +1,353 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Coroutine, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from django.conf import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_TIMING_HEADER: bool = False
+
+# Histogram buckets in seconds, from a cached LLM answer to a slow agent run
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 90, 120)
+
+T = TypeVar("T")
+
+# Yields (labels, value) samples of a gauge, read when the metrics are scraped
+Collector = Callable[[], Iterable[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """
+    Monotonic count per label combination.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    """
+    Distribution of observed values per label combination, as cumulative buckets plus sum and count.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: count per bucket (the last one is +Inf), then the sum
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, values in series:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(cumulative)}")
+        return lines
+
+
+class Gauge:
+    """
+    Values read from a collector at scrape time, such as the sizes and in-flight counts components keep.
+    """
+
+    metric_type: str = "gauge"
+
+    def __init__(self, name: str, documentation: str, collector: Collector):
+        self.name = name
+        self.documentation = documentation
+        self.collector = collector
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        try:
+            samples = list(self.collector())
+        except Exception as e:
+            logger.warning(f"Collecting {self.name} failed: {str(e)}")
+            return lines
+        for labels, value in samples:
+            lines.append(f"{self.name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return lines
+
+
+class CollectedCounter(Gauge):
+    """
+    Monotonic counts read from a collector at scrape time, such as the hit and miss counters components keep.
+    """
+
+    metric_type: str = "counter"
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics rendered in the Prometheus text exposition format.
+    Recording is a dictionary update under a lock, so timing a stage costs a few microseconds.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Any) -> Any:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, collector: Collector) -> Gauge:
+        return self._register(Gauge(name, documentation, collector))
+
+    def collected_counter(self, name: str, documentation: str, collector: Collector) -> CollectedCounter:
+        return self._register(CollectedCounter(name, documentation, collector))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY: MetricsRegistry = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "search_stage_seconds", "Duration of a search pipeline stage", ["stage"]
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "search_request_seconds", "Duration of a search request", ["endpoint", "status"]
+)
+SITE_SECONDS = REGISTRY.histogram(
+    "search_site_seconds", "Duration of one website's search, queueing included", ["site", "status"]
+)
+SITE_STAGE_SECONDS = REGISTRY.histogram(
+    "search_site_stage_seconds", "Duration of the extractor or an agent run on a website", ["site", "stage"]
+)
+AGENT_STEP_SECONDS = REGISTRY.histogram(
+    "search_agent_step_seconds", "Duration of a single agent step", ["site"]
+)
+SITE_FAILURES = REGISTRY.counter(
+    "search_site_failures_total", "Website searches that timed out or failed", ["site", "reason"]
+)
+LLM_CALLS = REGISTRY.counter(
+    "llm_calls_total", "LLM calls made", ["purpose"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "LLM tokens billed, by kind: input (including cached), cached and output", ["purpose", "kind"]
+)
+BROWSER_LAUNCHES = REGISTRY.counter(
+    "browser_launches_total", "Browsers launched by the browser pool"
+)
+
+
+def record_llm_usage(purpose: str, input_tokens: int = 0, cached_tokens: int = 0, output_tokens: int = 0, calls: int = 1) -> None:
+    """
+    Count LLM calls and the tokens they were billed for.
+
+    Args:
+        purpose: What the calls were for, e.g. "guard", "structuring" or "agent"
+        input_tokens: Prompt tokens, cached ones included
+        cached_tokens: Prompt tokens served from the provider's prompt cache
+        output_tokens: Completion tokens
+        calls: Number of calls
+    """
+    LLM_CALLS.inc(calls, purpose=purpose)
+    LLM_TOKENS.inc(input_tokens, purpose=purpose, kind="input")
+    LLM_TOKENS.inc(cached_tokens, purpose=purpose, kind="cached")
+    LLM_TOKENS.inc(output_tokens, purpose=purpose, kind="output")
+
+
+def record_completion_usage(purpose: str, completion: Any) -> None:
+    """
+    Count an OpenAI chat completion and the tokens in its usage block.
+    """
+    usage = getattr(completion, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    record_llm_usage(
+        purpose,
+        input_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+        output_tokens=getattr(usage, "completion_tokens", 0) or 0,
+    )
+
+
+class RequestTimings:
+    """
+    Wall time spent per stage while handling one request, rendered as a Server-Timing header.
+    Stages that run concurrently, such as the websites' searches, each report their own duration.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        """
+        Milliseconds per stage, plus the total so far.
+        """
+        timings = {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 1)
+        return timings
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.as_dict().items())
+
+
+# The timings of the request being handled; copied into tasks, including those run on the browser pool's loop
+_request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextlib.contextmanager
+def track_request() -> Iterator[RequestTimings]:
+    """
+    Collect the stage timings of the request handled within the block.
+    """
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def tracked_task(coroutine: Coroutine[Any, Any, T], timings: RequestTimings) -> "asyncio.Task[T]":
+    """
+    Run a coroutine as a task whose stages are collected into the given timings.
+    Streamed responses use this, as their generators can't hold a context variable across yields.
+    """
+    context = contextvars.copy_context()
+    context.run(_request_timings.set, timings)
+    return asyncio.get_running_loop().create_task(coroutine, context=context)
+
+
+def record_stage(stage: str, seconds: float, histogram: Histogram = STAGE_SECONDS, /, **labels: Any) -> None:
+    """
+    Observe a stage's duration in its histogram and in the current request's timings.
+
+    Args:
+        stage: Name in the request's timings; also the "stage" label of the default histogram
+        seconds: How long the stage took
+        histogram: Histogram to observe, search_stage_seconds by default
+        **labels: Labels of a histogram other than the default
+    """
+    histogram.observe(seconds, **(labels or {"stage": stage}))
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextlib.contextmanager
+def timed_stage(stage: str, histogram: Histogram = STAGE_SECONDS, /, **labels: Any) -> Iterator[None]:
+    """
+    Time the block as a stage, see record_stage.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started, histogram, **labels)
+
+
+def timing_header_enabled() -> bool:
+    """
+    Whether responses carry the Server-Timing debug header, from Django settings.
+    """
+    return getattr(settings, "SEARCH_TIMING_HEADER", DEFAULT_TIMING_HEADER)
+
+
+def register_stats(
+    name: str,
+    documentation: str,
+    stats: Callable[[], Dict[str, Any]],
+    gauges: Sequence[str] = (),
+    label: str = "stat",
+) -> None:
+    """
+    Expose a component's stats(), one sample per numeric entry: its monotonic counters as the counter
+    {name}_total, and the entries named in gauges (sizes, in-flight counts, ratios) as the gauge {name}.
+
+    Args:
+        name: Metric name prefix
+        documentation: Help text of both metrics
+        stats: The component's stats() method
+        gauges: Entries that can go down
+        label: Label holding the entry's name
+    """
+    def collector(as_gauges: bool) -> Collector:
+        def collect() -> Iterator[Tuple[Dict[str, str], float]]:
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and (key in gauges) == as_gauges:
+                    yield {label: key}, value
+        return collect
+
+    REGISTRY.collected_counter(f"{name}_total", documentation, collector(False))
+    if gauges:
+        REGISTRY.gauge(name, documentation, collector(True))
@@ -0,0 +1,85 @@
+# Generated by Django 5.2 on 2026-10-17 22:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=128, unique=True)),
+                ('sourced_from', models.CharField(choices=[('myntra', 'myntra'), ('meesho', 'meesho'), ('ajio', 'ajio'), ('flipkart', 'flipkart')], max_length=16)),
+                ('structured_query', models.JSONField()),
+                ('search_string', models.CharField(max_length=512)),
+                ('request_count', models.IntegerField(default=0)),
+                ('last_requested_at', models.DateTimeField(null=True)),
+                ('refreshed_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CatalogProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_url', models.CharField(max_length=2048, unique=True)),
+                ('product_name', models.CharField(max_length=512)),
+                ('product_image_url', models.CharField(max_length=2048)),
+                ('maximum_retail_price', models.FloatField(null=True)),
+                ('discount_percentage', models.IntegerField(null=True)),
+                ('selling_price', models.FloatField()),
+                ('sourced_from', models.CharField(choices=[('myntra', 'myntra'), ('meesho', 'meesho'), ('ajio', 'ajio'), ('flipkart', 'flipkart')], max_length=16)),
+                ('first_seen_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sourced_from', 'selling_price'], name='catalog_source_price_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogQueryResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='products.catalogproduct')),
+                ('query', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='products.catalogquery')),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.AddField(
+            model_name='catalogquery',
+            name='products',
+            field=models.ManyToManyField(related_name='queries', through='products.CatalogQueryResult', to='products.catalogproduct'),
+        ),
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selling_price', models.FloatField()),
+                ('maximum_retail_price', models.FloatField(null=True)),
+                ('recorded_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='products.catalogproduct')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='catalogqueryresult',
+            constraint=models.UniqueConstraint(fields=('query', 'product'), name='catalog_query_result_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogquery',
+            index=models.Index(fields=['request_count'], name='catalog_query_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricehistory',
+            index=models.Index(fields=['product', 'recorded_at'], name='price_history_product_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.db import models
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from enum import Enum
@@ -82,7 +83,110 @@ class Product(BaseModel):
 class Products(BaseModel):
     products: List[Product]
 
+class SiteStatusEnum(str, Enum):
+    ok = "ok"
+    timeout = "timeout"
+    error = "error"
+    cached = "cached"
+
+class SiteSearchResult(BaseModel):
+    """
+    Outcome of searching one website for a request.
+    """
+    website: SourcedFromEnum
+    status: SiteStatusEnum
+    products: List[Product] = Field(default_factory=list)
+    elapsed_ms: float = 0
+
+class SearchPlan(BaseModel):
+    """
+    Per-request query plan, produced once from the parsed query and passed through the search pipeline.
+    """
+    structured_query: StructuredSearchQuery
+    search_string: str
+    websites: List[SourcedFromEnum]
+    unsupported_message: Optional[str] = None
+
 # Define a validation model for query safety checks
 class QueryValidationResult(BaseModel):
     is_safe: bool = Field(description="Whether the query is a legitimate product search")
     reason: Optional[str] = Field(None, description="Reason why query was rejected if unsafe")
+
+
+# Local product catalog, stored in the Django database
+
+class CatalogProduct(models.Model):
+    """
+    Latest known listing of a product, keyed by its URL.
+    """
+    product_url = models.CharField(max_length=2048, unique=True)
+    product_name = models.CharField(max_length=512)
+    product_image_url = models.CharField(max_length=2048)
+    maximum_retail_price = models.FloatField(null=True)
+    discount_percentage = models.IntegerField(null=True)
+    selling_price = models.FloatField()
+    sourced_from = models.CharField(max_length=16, choices=[(source.value, source.value) for source in SourcedFromEnum])
+    first_seen_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["sourced_from", "selling_price"], name="catalog_source_price_idx"),
+        ]
+
+    def to_product(self) -> Product:
+        return Product(
+            product_name=self.product_name,
+            product_url=self.product_url,
+            product_image_url=self.product_image_url,
+            maximum_retail_price=self.maximum_retail_price,
+            discount_percentage=self.discount_percentage,
+            selling_price=self.selling_price,
+            sourced_from=SourcedFromEnum(self.sourced_from),
+        )
+
+class PriceHistory(models.Model):
+    """
+    A product's price whenever a scrape found it changed.
+    """
+    product = models.ForeignKey(CatalogProduct, on_delete=models.CASCADE, related_name="price_history")
+    selling_price = models.FloatField()
+    maximum_retail_price = models.FloatField(null=True)
+    recorded_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "recorded_at"], name="price_history_product_idx"),
+        ]
+
+class CatalogQuery(models.Model):
+    """
+    A structured query as searched on one website: how often it is requested and when it was last scraped.
+    """
+    key = models.CharField(max_length=128, unique=True)
+    sourced_from = models.CharField(max_length=16, choices=[(source.value, source.value) for source in SourcedFromEnum])
+    structured_query = models.JSONField()
+    search_string = models.CharField(max_length=512)
+    request_count = models.IntegerField(default=0)
+    last_requested_at = models.DateTimeField(null=True)
+    refreshed_at = models.DateTimeField(null=True)
+    products = models.ManyToManyField(CatalogProduct, through="CatalogQueryResult", related_name="queries")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["request_count"], name="catalog_query_popularity_idx"),
+        ]
+
+class CatalogQueryResult(models.Model):
+    """
+    A product in a query's results, in the website's ranking order.
+    """
+    query = models.ForeignKey(CatalogQuery, on_delete=models.CASCADE, related_name="results")
+    product = models.ForeignKey(CatalogProduct, on_delete=models.CASCADE)
+    rank = models.IntegerField()
+
+    class Meta:
+        ordering = ["rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["query", "product"], name="catalog_query_result_unique"),
+        ]
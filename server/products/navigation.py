@@ -0,0 +1,397 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, quote_plus, urlsplit
+
+from django.conf import settings
+
+from .filters import SiteFilters, strip_filters
+from .models import SourcedFromEnum
+from .product_index import tokenize
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_ENABLED: bool = True
+DEFAULT_MAX_FAILURES: int = 3
+DEFAULT_MIN_LINKS: int = 20
+DEFAULT_REPLAY_TIMEOUT: float = 15.0
+
+# How a results URL may spell the query "Men black jeans", longest spellings matched first
+QUERY_ENCODINGS: Dict[str, Any] = {
+    "query_percent": lambda query: quote(query, safe=""),
+    "query_plus": lambda query: quote_plus(query),
+    "query_dash": lambda query: "-".join(query.lower().split()),
+}
+# Agent actions a macro can replay; anything else (scrolling, extraction, done) isn't navigation
+REPLAYABLE_ACTIONS = ("go_to_url", "open_tab", "input_text", "send_keys", "click_element")
+
+# Read by the validity check: how many links the page has and its title and visible text
+_PAGE_SUMMARY_SCRIPT: str = """() => ({
+    links: document.querySelectorAll('a[href]').length,
+    text: (document.title + ' ' + (document.body ? document.body.innerText.slice(0, 20000) : '')).toLowerCase()
+})"""
+
+
+@dataclass
+class NavigationStep:
+    """
+    One agent step as the learner sees it: the page it started on, its actions (each as {name: params}),
+    the XPath of the element each action used, if any, and the tokens the step's LLM call cost.
+    """
+    url: Optional[str]
+    actions: List[Dict[str, Any]]
+    xpaths: List[Optional[str]] = field(default_factory=list)
+    tokens: int = 0
+
+
+@dataclass
+class NavigationMacro:
+    """
+    A site's learned way from its start page to the results for a query.
+
+    url_template holds the results URL with the query replaced by {query_percent}, {query_plus} or {query_dash}
+    placeholders and the site's filter parameters removed, and is opened directly, with the current query's
+    filters, when present. Otherwise actions are replayed on the page the search
+    opened, as they were on start_url: {"action": "input_text", "xpath": ..., "text": "{query}"}, "send_keys",
+    "click_element" or "go_to_url". nav_steps and nav_tokens are what the agent spent getting there, saved on every
+    replay.
+    """
+    website: str
+    start_url: str
+    url_template: Optional[str]
+    actions: List[Dict[str, Any]]
+    nav_steps: int
+    nav_tokens: int
+    learned_at: float
+    replays: int = 0
+    failures: int = 0
+
+    def url_for(self, query: str, filters: Optional[SiteFilters] = None) -> Optional[str]:
+        if self.url_template is None:
+            return None
+        url = self.url_template
+        for placeholder, encode in QUERY_ENCODINGS.items():
+            url = url.replace(f"{{{placeholder}}}", encode(query))
+        # Templates saved before filters were stripped may still carry another query's constraints
+        url = strip_filters(SourcedFromEnum(self.website), url)
+        return filters.apply(url) if filters is not None else url
+
+
+def url_template(url: str, query: str) -> Optional[str]:
+    """
+    Turn a results URL into a template by replacing every spelling of the query with its placeholder.
+
+    Returns:
+        str | None: The template, or None when the URL doesn't contain the query
+    """
+    template = url
+    for placeholder, encode in sorted(QUERY_ENCODINGS.items(), key=lambda item: -len(item[1](query))):
+        spelling = encode(query)
+        if spelling:
+            template = re.sub(re.escape(spelling), f"{{{placeholder}}}", template, flags=re.IGNORECASE)
+    return template if template != url else None
+
+
+def steps_from_history(history: Any, token_counts: Optional[List[int]] = None) -> List[NavigationStep]:
+    """
+    Read a browser-use AgentHistoryList into NavigationSteps.
+
+    Args:
+        history: The agent run's history
+        token_counts: Tokens of each step's LLM call, in order, when known
+    """
+    steps: List[NavigationStep] = []
+    for index, item in enumerate(history.history):
+        actions = [action.model_dump(exclude_none=True) for action in item.model_output.action] if item.model_output else []
+        steps.append(NavigationStep(
+            url=item.state.url,
+            actions=actions,
+            xpaths=[element.xpath if element is not None else None for element in item.state.interacted_element],
+            tokens=token_counts[index] if token_counts and index < len(token_counts) else 0,
+        ))
+    return steps
+
+
+class NavigationMacros:
+    """
+    Learned per-site navigation macros, so the agent goes straight to the results page and spends its LLM
+    steps only on extracting products.
+
+    After an agent run that had to navigate (find the search box, type, press Enter) before finding products,
+    because the page it was started on didn't show them, learn() keeps the navigating actions and, when the
+    results URL spells out the query, a URL template. Later agent runs on the site open their start page (the
+    extractor's filtered results URL) through replay() first, and only when that page fails the validity check
+    (still on the site, enough links, the query's words on the page) is the macro replayed: the template is
+    opened, or the actions are replayed, and the result must pass the same check. A replay that fails leaves the
+    agent to navigate itself, and a macro failing max_failures times in a row is dropped until the agent's
+    navigation teaches a new one.
+    With a path, macros are kept in a JSON file across restarts.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = DEFAULT_ENABLED,
+        path: Optional[Path] = None,
+        max_failures: int = DEFAULT_MAX_FAILURES,
+        min_links: int = DEFAULT_MIN_LINKS,
+        replay_timeout: float = DEFAULT_REPLAY_TIMEOUT,
+    ):
+        self.enabled = enabled
+        self.path = Path(path) if path else None
+        self.max_failures = max_failures
+        self.min_links = min_links
+        self.replay_timeout = replay_timeout
+        self.counters: Dict[str, int] = {
+            "learned": 0,
+            "start_page_valid": 0,
+            "replays": 0,
+            "replay_hits": 0,
+            "replay_failures": 0,
+            "dropped": 0,
+            "steps_saved": 0,
+            "tokens_saved": 0,
+        }
+        self._macros: Dict[str, NavigationMacro] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            self._macros = {
+                website: NavigationMacro(**macro) for website, macro in json.loads(self.path.read_text()).items()
+            }
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Could not read navigation macros from {self.path}: {str(e)}")
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            payload = json.dumps({website: asdict(macro) for website, macro in self._macros.items()}, indent=2)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(payload)
+        except OSError as e:
+            logger.warning(f"Could not write navigation macros to {self.path}: {str(e)}")
+
+    def get(self, website: SourcedFromEnum) -> Optional[NavigationMacro]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._macros.get(website.value)
+
+    def learn(self, website: SourcedFromEnum, query: str, steps: List[NavigationStep]) -> Optional[NavigationMacro]:
+        """
+        Learn a macro from a successful agent run.
+
+        The results page is the one the run finished on; the steps before the first step on that page are
+        the navigation. Runs that started on the results page teach nothing. The site's filter parameters are
+        removed from the learned URLs, since they hold the constraints of this query and not of later ones.
+
+        Args:
+            website: The website searched
+            query: The search string the agent was given
+            steps: The run's steps, see steps_from_history()
+
+        Returns:
+            NavigationMacro | None: The new macro, or None when there was no navigation to learn
+        """
+        if not self.enabled or not steps or not steps[0].url:
+            return None
+        results_url: Optional[str] = steps[-1].url
+        arrived: int = next((index for index, step in enumerate(steps) if step.url == results_url), 0)
+        if arrived == 0 or results_url is None:
+            return None
+
+        actions: List[Dict[str, Any]] = []
+        for step in steps[:arrived]:
+            for index, action in enumerate(step.actions):
+                name, params = next(iter(action.items()))
+                if name not in REPLAYABLE_ACTIONS:
+                    continue
+                recorded: Dict[str, Any] = {"action": name, "xpath": step.xpaths[index] if index < len(step.xpaths) else None}
+                if name == "input_text":
+                    text: str = params.get("text", "")
+                    recorded["text"] = "{query}" if text.strip().lower() == query.strip().lower() else text
+                elif name == "send_keys":
+                    recorded["keys"] = params.get("keys")
+                elif name in ("go_to_url", "open_tab"):
+                    url: str = strip_filters(website, params.get("url", ""))
+                    recorded["url"] = url_template(url, query) or url
+                actions.append(recorded)
+
+        template: Optional[str] = url_template(strip_filters(website, results_url), query)
+        if template is None and not all(
+            action["xpath"] or action["action"] in ("send_keys", "go_to_url", "open_tab") for action in actions
+        ):
+            logger.info(f"Navigation on {website} can't be replayed: no query in {results_url} and no element paths")
+            return None
+
+        macro = NavigationMacro(
+            website=website.value,
+            start_url=steps[0].url,
+            url_template=template,
+            actions=actions,
+            nav_steps=arrived,
+            nav_tokens=sum(step.tokens for step in steps[:arrived]),
+            learned_at=time.time(),
+        )
+        with self._lock:
+            self._macros[website.value] = macro
+            self.counters["learned"] += 1
+        logger.info(f"Learned navigation macro for {website}: {template or f'{len(actions)} actions'}, saves {arrived} steps")
+        self._save()
+        return macro
+
+    async def results_page_valid(self, page: Any, query: str, start_url: str) -> bool:
+        """
+        Validity check of a replayed page: still on the site, with enough links to be a results page,
+        and showing at least one of the query's words.
+        """
+        site_host: str = (urlsplit(start_url).hostname or "").removeprefix("www.")
+        if not (urlsplit(page.url).hostname or "").endswith(site_host):
+            return False
+        summary: Dict[str, Any] = await page.evaluate(_PAGE_SUMMARY_SCRIPT)
+        words: List[str] = [word for word in tokenize(query) if len(word) >= 3]
+        return summary["links"] >= self.min_links and (not words or any(word in summary["text"] for word in words))
+
+    async def _navigate(self, macro: NavigationMacro, page: Any, query: str, filters: Optional[SiteFilters]) -> None:
+        url: Optional[str] = macro.url_for(query, filters)
+        if url is not None:
+            await page.goto(url, wait_until="domcontentloaded")
+            return
+        for action in macro.actions:
+            name: str = action["action"]
+            if name in ("go_to_url", "open_tab"):
+                await page.goto(action["url"].replace("{query}", query), wait_until="domcontentloaded")
+            elif name == "input_text":
+                await page.fill(f"xpath={action['xpath']}", action["text"].replace("{query}", query))
+            elif name == "send_keys":
+                await page.keyboard.press(action["keys"])
+            elif name == "click_element":
+                await page.click(f"xpath={action['xpath']}")
+        await page.wait_for_load_state("domcontentloaded")
+
+    async def replay(
+        self,
+        website: SourcedFromEnum,
+        browser_context: Any,
+        query: str,
+        start_url: str,
+        filters: Optional[SiteFilters] = None,
+    ) -> Optional[str]:
+        """
+        Open the search's start page in the browser context's current page, and replay the site's macro when
+        the start page doesn't show results for the query.
+
+        Args:
+            website: The website to search on
+            browser_context: The search's browser context
+            query: The search string
+            start_url: The page the agent would start on, such as the extractor's filtered results URL
+            filters: The query's URL filters, applied to the macro's URL template
+
+        Returns:
+            str | None: The URL of the open results page, either the start page or the replayed one, when it
+            passed the validity check; None when the site has no macro or the replay failed, and the agent has to
+            open the start page and navigate itself
+        """
+        macro: Optional[NavigationMacro] = self.get(website)
+        if macro is None:
+            return None
+        replayed: bool = False
+        try:
+            page = await browser_context.get_current_page()
+            async with asyncio.timeout(self.replay_timeout):
+                await page.goto(start_url, wait_until="domcontentloaded")
+                if await self.results_page_valid(page, query, start_url):
+                    with self._lock:
+                        self.counters["start_page_valid"] += 1
+                    return page.url
+                replayed = True
+                await self._navigate(macro, page, query, filters)
+                valid: bool = await self.results_page_valid(page, query, start_url)
+        except Exception as e:
+            logger.info(f"Navigation macro replay on {website} failed: {str(e)}")
+            valid = False
+        if not replayed:
+            # The start page didn't load, which says nothing about the macro
+            return None
+
+        dropped: bool = False
+        with self._lock:
+            self.counters["replays"] += 1
+            if valid:
+                macro.replays += 1
+                macro.failures = 0
+                self.counters["replay_hits"] += 1
+                self.counters["steps_saved"] += macro.nav_steps
+                self.counters["tokens_saved"] += macro.nav_tokens
+            else:
+                macro.failures += 1
+                self.counters["replay_failures"] += 1
+                if macro.failures >= self.max_failures and self._macros.get(website.value) is macro:
+                    del self._macros[website.value]
+                    self.counters["dropped"] += 1
+                    dropped = True
+        if dropped:
+            logger.info(f"Dropped the navigation macro for {website} after {macro.failures} failed replays")
+            self._save()
+        return page.url if valid else None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Learn/replay counters, the replay hit rate, the agent steps and tokens replays saved, and each
+        site's macro.
+        """
+        with self._lock:
+            replays = self.counters["replays"]
+            return {
+                **self.counters,
+                "hit_rate": round(self.counters["replay_hits"] / replays, 3) if replays else 0.0,
+                "macros": len(self._macros),
+                "sites": {
+                    website: {
+                        "url_template": macro.url_template,
+                        "actions": len(macro.actions),
+                        "nav_steps": macro.nav_steps,
+                        "replays": macro.replays,
+                        "failures": macro.failures,
+                    }
+                    for website, macro in self._macros.items()
+                },
+            }
+
+
+_navigation_macros: Optional[NavigationMacros] = None
+_navigation_macros_lock = threading.Lock()
+
+
+def get_navigation_macros() -> NavigationMacros:
+    """
+    Get the process-wide navigation macros, configured from Django settings.
+
+    Returns:
+        NavigationMacros: The shared macros
+    """
+    global _navigation_macros
+    with _navigation_macros_lock:
+        if _navigation_macros is None:
+            _navigation_macros = NavigationMacros(
+                enabled=getattr(settings, "NAVIGATION_MACROS_ENABLED", DEFAULT_ENABLED),
+                path=getattr(settings, "NAVIGATION_MACROS_PATH", None),
+                max_failures=getattr(settings, "NAVIGATION_MACRO_MAX_FAILURES", DEFAULT_MAX_FAILURES),
+                min_links=getattr(settings, "NAVIGATION_MACRO_MIN_LINKS", DEFAULT_MIN_LINKS),
+                replay_timeout=getattr(settings, "NAVIGATION_MACRO_REPLAY_TIMEOUT", DEFAULT_REPLAY_TIMEOUT),
+            )
+        return _navigation_macros
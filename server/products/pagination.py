@@ -0,0 +1,213 @@
+import asyncio
+import contextlib
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from .models import Product, SearchPlan, SourcedFromEnum
+from .ranking import rank_products
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_PAGE_SIZE: int = 20
+DEFAULT_MAX_PAGES: int = 5
+DEFAULT_CURSOR_TTL: float = 15 * 60
+DEFAULT_MAX_CURSORS: int = 1000
+
+# Browses one results page of a website, pages numbered from 1
+FetchPage = Callable[[SourcedFromEnum, int], Awaitable[List[Product]]]
+
+
+class SearchSession:
+    """
+    Paging state of one search: the next results page of every website that still has more, and the products
+    browsed but not returned yet, already ranked and without duplicates of earlier pages.
+
+    Sessions live on the browser pool's event loop; every method must be called from it.
+    """
+
+    def __init__(self, plan: SearchPlan, max_pages: int = DEFAULT_MAX_PAGES):
+        self.plan = plan
+        self.max_pages = max_pages
+        self.next_pages: Dict[SourcedFromEnum, int] = {}
+        self.buffer: List[Product] = []
+        self.seen: Set[str] = set()
+        self.returned: int = 0
+        self.pages_browsed: int = 0
+        self.prefetch: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def has_more(self) -> bool:
+        return bool(self.buffer or self.next_pages)
+
+    def add_pages(self, pages: Iterable[Tuple[SourcedFromEnum, int, List[Product]]]) -> None:
+        """
+        Rank a round of browsed pages into the buffer. A website stays in the session while its pages have
+        products and it is under the page limit.
+
+        Args:
+            pages: (website, page number, products) of each browsed page
+        """
+        product_lists: List[List[Product]] = []
+        for website, page, products in pages:
+            self.pages_browsed += 1
+            if products and page < self.max_pages:
+                self.next_pages[website] = page + 1
+            else:
+                self.next_pages.pop(website, None)
+            product_lists.append(products)
+        self.buffer.extend(rank_products(product_lists, self.plan.structured_query, self.seen))
+
+    async def _browse_next_pages(self, fetch: FetchPage) -> None:
+        websites: List[Tuple[SourcedFromEnum, int]] = list(self.next_pages.items())
+        results = await asyncio.gather(*(fetch(website, page) for website, page in websites), return_exceptions=True)
+
+        pages: List[Tuple[SourcedFromEnum, int, List[Product]]] = []
+        for (website, page), result in zip(websites, results):
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                # A site that fails or runs out of time is done paging; the others carry on
+                logger.warning(f"Browsing page {page} of {website} failed: {type(result).__name__} {str(result)}")
+                result = []
+            pages.append((website, page, result))
+        self.add_pages(pages)
+
+    async def _fill(self, count: int, fetch: FetchPage) -> None:
+        async with self._lock:
+            while len(self.buffer) < count and self.next_pages:
+                await self._browse_next_pages(fetch)
+
+    async def collect(self, count: int, fetch: FetchPage) -> None:
+        """
+        Browse further pages of every website still in the session until count products are waiting,
+        or no website has more. A prefetch still running is waited for first, without cancelling it if the
+        caller gives up.
+        """
+        if self.prefetch is not None:
+            with contextlib.suppress(Exception):
+                await asyncio.shield(self.prefetch)
+        await self._fill(count, fetch)
+
+    def take(self, count: int) -> List[Product]:
+        """
+        Remove and return up to count products from the front of the buffer.
+        """
+        products, self.buffer = self.buffer[:count], self.buffer[count:]
+        self.returned += len(products)
+        return products
+
+    def start_prefetch(self, count: int, fetch: FetchPage) -> None:
+        """
+        Start browsing for the next page of count products in the background, while this page is returned.
+        """
+        if self.prefetch is None or self.prefetch.done():
+            self.prefetch = asyncio.create_task(self._fill(count, fetch))
+
+    def close(self) -> None:
+        if self.prefetch is not None:
+            self.prefetch.cancel()
+
+
+class CursorStore:
+    """
+    In-process store of search sessions behind opaque cursor tokens.
+
+    Sessions expire ttl seconds after their last page and the least recently used are dropped beyond
+    max_sessions, cancelling any prefetch still browsing. Cursors are only valid in the process that issued them.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_CURSOR_TTL, max_sessions: int = DEFAULT_MAX_CURSORS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.counters: Dict[str, int] = {"issued": 0, "resumed": 0, "expired": 0, "evictions": 0}
+        self._sessions: "OrderedDict[str, Tuple[SearchSession, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> List[SearchSession]:
+        expired: List[SearchSession] = []
+        while self._sessions:
+            token, (session, expires_at) = next(iter(self._sessions.items()))
+            if expires_at > now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[token]
+            self.counters["expired" if expires_at <= now else "evictions"] += 1
+            expired.append(session)
+        return expired
+
+    def issue(self, session: SearchSession) -> str:
+        """
+        Store a session and return a new cursor resuming it. Each cursor resumes its session once.
+        """
+        now = time.monotonic()
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._sessions[token] = (session, now + self.ttl)
+            self.counters["issued"] += 1
+            expired = self._expire(now)
+        for stale in expired:
+            stale.close()
+        return token
+
+    def resume(self, token: str) -> Optional[SearchSession]:
+        """
+        Take the session behind a cursor, or None when it is unknown, expired or already resumed.
+        """
+        with self._lock:
+            expired = self._expire(time.monotonic())
+            entry = self._sessions.pop(token, None)
+            if entry is not None:
+                self.counters["resumed"] += 1
+        for stale in expired:
+            stale.close()
+        return entry[0] if entry is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Cursor counters plus the number of live sessions.
+        """
+        with self._lock:
+            return {**self.counters, "sessions": len(self._sessions)}
+
+
+_cursor_store: Optional[CursorStore] = None
+_cursor_store_lock = threading.Lock()
+
+
+def get_cursor_store() -> CursorStore:
+    """
+    Get the process-wide cursor store, configured from Django settings.
+
+    Returns:
+        CursorStore: The shared store
+    """
+    global _cursor_store
+    with _cursor_store_lock:
+        if _cursor_store is None:
+            _cursor_store = CursorStore(
+                ttl=getattr(settings, "SEARCH_CURSOR_TTL", DEFAULT_CURSOR_TTL),
+                max_sessions=getattr(settings, "SEARCH_MAX_CURSORS", DEFAULT_MAX_CURSORS),
+            )
+        return _cursor_store
+
+
+def get_page_size() -> int:
+    """
+    Products per page when a request doesn't ask for a count.
+    """
+    return getattr(settings, "SEARCH_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+
+
+def get_max_pages() -> int:
+    """
+    Results pages browsed per website and search at most.
+    """
+    return getattr(settings, "SEARCH_MAX_PAGES", DEFAULT_MAX_PAGES)
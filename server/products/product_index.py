@@ -0,0 +1,321 @@
+import logging
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+
+from .catalog import DEFAULT_MAX_AGE
+from .models import CatalogProduct, GenderEnum, Product, SourcedFromEnum, StructuredSearchQuery
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_REBUILD_INTERVAL: float = 60.0
+DEFAULT_MIN_RESULTS: int = 5
+DEFAULT_LIMIT: int = 10
+
+GENDER_TOKENS: Dict[str, int] = {"men": 1, "man": 1, "boy": 1, "women": 2, "woman": 2, "girl": 2, "ladie": 2}
+GENDER_CODES: Dict[GenderEnum, int] = {GenderEnum.Men: 1, GenderEnum.Women: 2}
+
+# Token lists at least this dense are kept as bitmaps, sparser ones as id arrays
+BITMAP_DENSITY: float = 1 / 256
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase alphanumeric tokens with a trailing plural "s" removed, so "Jeans" and "jean" match.
+    """
+    return [
+        token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+        for token in _TOKEN_PATTERN.findall(text.lower())
+    ]
+
+
+def to_bitmap(ids: Iterable[int], size: int) -> int:
+    """
+    Pack ids below size into an int with those bits set.
+    """
+    packed = bytearray((size + 7) // 8)
+    for product_id in ids:
+        packed[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(packed, "little")
+
+
+def lowest_bits(bitmap: int, count: int) -> List[int]:
+    """
+    Positions of the lowest set bits of a bitmap, at most count of them.
+    """
+    positions: List[int] = []
+    while bitmap and len(positions) < count:
+        lowest = bitmap & -bitmap
+        positions.append(lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return positions
+
+
+class ProductIndexShard:
+    """
+    The products of one website, numbered in ascending selling price.
+
+    Every token of the product names maps to the set of ids containing it, held as an int bitmap so that
+    intersections and unions run as single big-int operations, and a price range is the bitmap of a contiguous
+    id range found by binary search on the price column. Columns are typed arrays rather than per-product objects
+    to keep a million products compact.
+    """
+
+    def __init__(self, website: SourcedFromEnum, products: List[Product]):
+        products.sort(key=lambda product: product.selling_price)
+        self.website = website
+        self.names: List[str] = [product.product_name for product in products]
+        self.urls: List[str] = [product.product_url for product in products]
+        self.image_urls: List[str] = [product.product_image_url for product in products]
+        self.prices = array("d", (product.selling_price for product in products))
+        self.mrps = array("d", (product.maximum_retail_price or 0.0 for product in products))
+        self.discounts = array("i", (product.discount_percentage or 0 for product in products))
+
+        postings: Dict[str, List[int]] = {}
+        genders: Dict[int, List[int]] = {1: [], 2: []}
+        for product_id, name in enumerate(self.names):
+            gender = 0
+            for token in set(tokenize(name)):
+                postings.setdefault(token, []).append(product_id)
+                gender |= GENDER_TOKENS.get(token, 0)
+            # Names mentioning both genders are treated as unisex
+            if gender in genders:
+                genders[gender].append(product_id)
+
+        size = len(products)
+        self.bitmaps: Dict[str, int] = {}
+        self.sparse: Dict[str, array] = {}
+        for token, ids in postings.items():
+            if len(ids) >= size * BITMAP_DENSITY:
+                self.bitmaps[token] = to_bitmap(ids, size)
+            else:
+                self.sparse[token] = array("I", ids)
+        # Products naming only one gender, by gender code
+        self.gender_only: Dict[int, int] = {code: to_bitmap(ids, size) for code, ids in genders.items()}
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def bitmap(self, token: str) -> int:
+        if token in self.bitmaps:
+            return self.bitmaps[token]
+        ids = self.sparse.get(token)
+        return to_bitmap(ids, ids[-1] + 1) if ids else 0
+
+    def product(self, product_id: int) -> Product:
+        return Product(
+            product_name=self.names[product_id],
+            product_url=self.urls[product_id],
+            product_image_url=self.image_urls[product_id],
+            maximum_retail_price=self.mrps[product_id] or None,
+            discount_percentage=self.discounts[product_id],
+            selling_price=self.prices[product_id],
+            sourced_from=self.website,
+        )
+
+    def search(self, structured_query: StructuredSearchQuery, limit: int) -> List[Tuple[int, int]]:
+        """
+        The best-ranked matches of a query in this shard, as (score, product id) best first.
+        """
+        low, high = 0, len(self.prices)
+        if structured_query.min_price is not None and structured_query.min_price > 0:
+            low = bisect_left(self.prices, structured_query.min_price)
+        if structured_query.max_price is not None and structured_query.max_price > 0:
+            high = bisect_right(self.prices, structured_query.max_price)
+        if low >= high:
+            return []
+
+        matches = (1 << high) - (1 << low)
+        # Sparse lists first, they empty the bitmap soonest
+        for token in sorted(set(tokenize(structured_query.item_name)), key=lambda token: token in self.bitmaps):
+            matches &= self.bitmap(token)
+            if not matches:
+                return []
+        if structured_query.gender in GENDER_CODES:
+            matches &= ~self.gender_only[3 - GENDER_CODES[structured_query.gender]]
+
+        # levels[score] holds the matches with that many of the requested attributes
+        levels: List[int] = [matches]
+        for terms in (structured_query.item_colors or [], [structured_query.material] if structured_query.material else []):
+            attribute = 0
+            for term in terms:
+                for token in tokenize(term):
+                    attribute |= self.bitmap(token)
+            if not attribute & matches:
+                continue
+            levels = [levels[0] & ~attribute] + [
+                (levels[score] & ~attribute) | (levels[score - 1] & attribute) for score in range(1, len(levels))
+            ] + [levels[-1] & attribute]
+
+        ranked: List[Tuple[int, int]] = []
+        for score in range(len(levels) - 1, -1, -1):
+            ranked.extend((score, product_id) for product_id in lowest_bits(levels[score], limit - len(ranked)))
+            if len(ranked) >= limit:
+                break
+        return ranked
+
+
+class ProductIndex:
+    """
+    Immutable in-process index over products for answering structured queries without a browser,
+    sharded by website.
+    """
+
+    def __init__(self, products: Iterable[Product]):
+        by_website: Dict[SourcedFromEnum, List[Product]] = {}
+        for product in products:
+            by_website.setdefault(product.sourced_from, []).append(product)
+        self.shards: Dict[SourcedFromEnum, ProductIndexShard] = {
+            website: ProductIndexShard(website, website_products) for website, website_products in by_website.items()
+        }
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards.values())
+
+    def search(
+        self,
+        structured_query: StructuredSearchQuery,
+        website: Optional[SourcedFromEnum] = None,
+        limit: int = DEFAULT_LIMIT,
+    ) -> List[Product]:
+        """
+        Find products matching a structured query.
+
+        Every token of the item name must appear in the product name, the price must be within the query's
+        bounds, and a product naming only the other gender is excluded. Products matching more of the requested
+        colors and material rank first; ties are ordered cheapest first.
+
+        Args:
+            structured_query: The parsed query
+            website: Only return products from this website
+            limit: Maximum number of products
+
+        Returns:
+            list[Product]: The best-ranked products
+        """
+        shards = [self.shards[website]] if website in self.shards else [] if website is not None else list(self.shards.values())
+        ranked = [
+            (-score, shard.prices[product_id], shard, product_id)
+            for shard in shards
+            for score, product_id in shard.search(structured_query, limit)
+        ]
+        if len(shards) > 1:
+            ranked.sort(key=lambda match: match[:2])
+        return [shard.product(product_id) for _, _, shard, product_id in ranked[:limit]]
+
+
+class ProductIndexManager:
+    """
+    Keeps a ProductIndex of the catalog's fresh products, rebuilt in a background thread when the catalog changes.
+    Searches always use the last complete index, which is swapped in atomically.
+    """
+
+    def __init__(
+        self,
+        max_age: float,
+        rebuild_interval: float = DEFAULT_REBUILD_INTERVAL,
+        min_results: int = DEFAULT_MIN_RESULTS,
+    ):
+        self.max_age = max_age
+        self.rebuild_interval = rebuild_interval
+        self.min_results = min_results
+        self.counters: Dict[str, float] = {"hits": 0, "misses": 0, "rebuilds": 0, "last_rebuild_ms": 0.0}
+        self._index: Optional[ProductIndex] = None
+        self._built_from = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Start the rebuild thread, if it isn't running yet.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._rebuild_loop, name="product-index", daemon=True)
+                self._thread.start()
+
+    def _rebuild_loop(self) -> None:
+        while True:
+            try:
+                self.rebuild()
+            except Exception as e:
+                logger.error(f"Product index rebuild failed: {str(e)}")
+            finally:
+                close_old_connections()
+            time.sleep(self.rebuild_interval)
+
+    def rebuild(self, force: bool = False) -> None:
+        """
+        Rebuild the index from the catalog's products scraped within the maximum age, if the catalog changed.
+        """
+        fresh = CatalogProduct.objects.filter(updated_at__gte=timezone.now() - timedelta(seconds=self.max_age))
+        latest = fresh.aggregate(updated_at=Max("updated_at"), last_id=Max("id"))
+        if not force and latest == self._built_from:
+            return
+
+        started = time.perf_counter()
+        index = ProductIndex(product.to_product() for product in fresh.iterator(chunk_size=5000))
+        with self._lock:
+            self._index = index
+            self._built_from = latest
+            self.counters["rebuilds"] += 1
+            self.counters["last_rebuild_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def search(self, structured_query: StructuredSearchQuery, website: SourcedFromEnum) -> Optional[List[Product]]:
+        """
+        Answer a query for a website from the index, if it finds at least min_results products.
+
+        Returns:
+            list[Product] | None: The ranked products, or None when the index can't answer the query
+        """
+        self.start()
+        index = self._index
+        products = index.search(structured_query, website) if index is not None else []
+        with self._lock:
+            if len(products) >= self.min_results:
+                self.counters["hits"] += 1
+                return products
+            self.counters["misses"] += 1
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit/miss and rebuild counters plus the number of indexed products.
+        """
+        with self._lock:
+            return {**self.counters, "products": len(self._index) if self._index is not None else 0}
+
+
+_index_manager: Optional[ProductIndexManager] = None
+_index_manager_lock = threading.Lock()
+
+
+def get_product_index() -> ProductIndexManager:
+    """
+    Get the process-wide product index, configured from Django settings.
+
+    Returns:
+        ProductIndexManager: The shared index
+    """
+    global _index_manager
+    with _index_manager_lock:
+        if _index_manager is None:
+            _index_manager = ProductIndexManager(
+                max_age=getattr(settings, "CATALOG_MAX_AGE", DEFAULT_MAX_AGE),
+                rebuild_interval=getattr(settings, "PRODUCT_INDEX_REBUILD_INTERVAL", DEFAULT_REBUILD_INTERVAL),
+                min_results=getattr(settings, "PRODUCT_INDEX_MIN_RESULTS", DEFAULT_MIN_RESULTS),
+            )
+        return _index_manager
@@ -0,0 +1,194 @@
+import contextlib
+import json
+import logging
+import typing
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional, Type
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+from pydantic import BaseModel, create_model
+
+from .models import Products
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _compact_annotation(annotation: Any) -> Any:
+    """
+    Rebuild a type annotation with every nested model replaced by its compact form.
+    """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return compact_output_model(annotation)
+    origin = typing.get_origin(annotation)
+    if origin is None:
+        return annotation
+    args = tuple(_compact_annotation(arg) for arg in typing.get_args(annotation))
+    if origin in (list, List):
+        return List[args[0]]
+    return typing.Union[args]
+
+
+def compact_output_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    Copy a pydantic model without its field descriptions.
+    The copy validates the same JSON, but its schema - sent with every agent step - is a fraction of the size.
+
+    Args:
+        model: The model to copy
+
+    Returns:
+        type[BaseModel]: A model with the same name, fields and defaults
+    """
+    fields: Dict[str, Any] = {
+        name: (_compact_annotation(info.annotation), ... if info.is_required() else info.default)
+        for name, info in model.model_fields.items()
+    }
+    return create_model(model.__name__, **fields)
+
+
+def _type_sketch(annotation: Any) -> Any:
+    """
+    Describe an annotation the way a person would write an example JSON document.
+    """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {name: _type_sketch(info.annotation) for name, info in annotation.model_fields.items()}
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return "|".join(member.value for member in annotation)
+    origin = typing.get_origin(annotation)
+    if origin in (list, List):
+        return [_type_sketch(typing.get_args(annotation)[0])]
+    if origin is not None:
+        return "|".join(
+            "null" if arg is type(None) else str(_type_sketch(arg)) for arg in typing.get_args(annotation)
+        )
+    return {str: "string", int: "integer", float: "number", bool: "boolean"}.get(annotation, str(annotation))
+
+
+def schema_sketch(model: Type[BaseModel]) -> str:
+    """
+    Minimal one-line sketch of the JSON shape of a model, e.g. {"products": [{"product_name": "string", ...}]}.
+
+    Args:
+        model: The model to describe
+
+    Returns:
+        str: The sketch
+    """
+    return json.dumps(_type_sketch(model), separators=(",", ":"))
+
+
+# Output model handed to the agent's Controller, and the shape it is asked to return.
+# Both are built once at import so every agent step sends byte-identical tools and instructions.
+AGENT_OUTPUT_MODEL: Type[BaseModel] = compact_output_model(Products)
+AGENT_OUTPUT_SKETCH: str = schema_sketch(Products)
+
+# Everything that doesn't depend on the site or the query comes first, so the provider can reuse the
+# cached prefix across steps, sites and requests
+AGENT_TASK_PREFIX: str = f"""Collect product listings from an Indian e-commerce website.
+1. The website is already open, usually on the filtered results page for the query. If it doesn't show results for the query, type the query exactly as given into the site's search box and press Enter.
+2. From the results page that is open take up to 10 top-ranked products that match the query.
+3. For each product record the name as displayed, the full https product URL, the full https main image URL, the MRP (null if not shown), the discount percentage (0 if none), the selling price and the platform.
+4. Prices are plain numbers without currency symbols or separators.
+5. If nothing matches, return an empty products list.
+Finish with the done action, shaped as:
+{AGENT_OUTPUT_SKETCH}
+"""
+
+
+def build_agent_task(website_url: str, search_query: str) -> str:
+    """
+    Build the agent's task: the shared instructions followed by the site and query.
+
+    Args:
+        website_url: Base URL of the website to search on
+        search_query: The standardized search string
+
+    Returns:
+        str: The task string
+    """
+    return f"{AGENT_TASK_PREFIX}Website: {website_url}\nQuery: {search_query}"
+
+
+@dataclass
+class StepUsage:
+    """
+    Tokens billed for one LLM call of an agent.
+    """
+    input_tokens: int
+    cached_tokens: int
+    output_tokens: int
+
+
+@dataclass
+class TokenUsage:
+    """
+    Tokens billed for every LLM call made while recording, one entry per agent step.
+    """
+    steps: List[StepUsage] = field(default_factory=list)
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(step.input_tokens for step in self.steps)
+
+    @property
+    def cached_tokens(self) -> int:
+        return sum(step.cached_tokens for step in self.steps)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(step.output_tokens for step in self.steps)
+
+    def summary(self) -> str:
+        per_step = ", ".join(f"{step.input_tokens}/{step.cached_tokens}" for step in self.steps)
+        return (
+            f"{len(self.steps)} LLM calls, {self.input_tokens} input tokens ({self.cached_tokens} cached), "
+            f"{self.output_tokens} output tokens; input/cached per step: {per_step}"
+        )
+
+
+class TokenUsageRecorder(BaseCallbackHandler):
+    """
+    LangChain callback collecting the usage reported by each chat completion.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.usage = TokenUsage()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage_metadata: Optional[Dict[str, Any]] = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage_metadata:
+                    continue
+                self.usage.steps.append(StepUsage(
+                    input_tokens=usage_metadata.get("input_tokens", 0),
+                    cached_tokens=(usage_metadata.get("input_token_details") or {}).get("cache_read", 0),
+                    output_tokens=usage_metadata.get("output_tokens", 0),
+                ))
+
+
+_token_usage_recorder: ContextVar[Optional[TokenUsageRecorder]] = ContextVar("token_usage_recorder", default=None)
+register_configure_hook(_token_usage_recorder, inheritable=True)
+
+
+@contextlib.contextmanager
+def record_token_usage() -> Iterator[TokenUsage]:
+    """
+    Record the tokens of every LLM call made in the current task (and tasks it starts) inside the block.
+    Concurrent site searches each run in their own task, so their usage is recorded separately.
+
+    Yields:
+        TokenUsage: Filled in as calls complete
+    """
+    recorder = TokenUsageRecorder()
+    token = _token_usage_recorder.set(recorder)
+    try:
+        yield recorder.usage
+    finally:
+        _token_usage_recorder.reset(token)
@@ -0,0 +1,274 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern, Set, Tuple
+
+from django.conf import settings
+
+from .filters import COLOR_SYNONYMS, COLOR_WORDS, MATERIAL_WORDS
+from .guard import ACTION_WORDS, ATTRIBUTE_WORDS, OFF_TOPIC_WORDS, PRODUCT_WORDS
+from .models import GenderEnum, SizeEnum, SourcedFromEnum, StructuredSearchQuery
+from .product_index import tokenize
+
+# Defaults, overridable through Django settings
+DEFAULT_ENABLED: bool = True
+DEFAULT_MIN_CONFIDENCE: float = 0.7
+
+# Item names with more words outside the lexicon than this go to the LLM; the item name is what the agent searches
+MAX_UNKNOWN_WORDS: int = 1
+
+# Amounts below this are only read as prices when written with a currency ("under rs 20")
+MIN_BARE_PRICE: float = 50
+
+# Gazetteers
+GENDER_WORDS: Dict[str, GenderEnum] = {
+    **{word: GenderEnum.Men for word in ("men", "mens", "men's", "man", "male", "gents", "gent")},
+    **{word: GenderEnum.Women for word in ("women", "womens", "women's", "woman", "ladies", "lady", "female")},
+}
+SUPPORTED_PLATFORMS: Set[str] = {website.value for website in SourcedFromEnum}
+UNSUPPORTED_PLATFORMS: Tuple[str, ...] = (
+    "amazon", "nykaa", "tata cliq", "tatacliq", "snapdeal", "jiomart", "shopclues", "limeroad", "firstcry",
+    "bewakoof", "lenskart", "zara", "h&m", "uniqlo",
+)
+# Colors named in two words, kept as one color
+COLOR_PHRASES: Tuple[str, ...] = (
+    "navy blue", "sky blue", "light blue", "dark blue", "royal blue", "off white", "olive green", "dark green",
+    "light green", "bottle green", "light grey", "dark grey", "light pink", "baby pink", "wine red",
+)
+# Colors the site filters don't match on, but a query can still ask for
+EXTRA_COLORS: Set[str] = {"gold", "golden", "silver", "magenta", "turquoise", "rust", "wine", "coral", "mint"}
+SIZE_WORDS: Dict[str, SizeEnum] = {
+    "s": SizeEnum.S, "small": SizeEnum.S, "m": SizeEnum.M, "medium": SizeEnum.M, "l": SizeEnum.L, "large": SizeEnum.L,
+    "xl": SizeEnum.XL, "extra large": SizeEnum.XL, "xxl": SizeEnum.XXL, "2xl": SizeEnum.XXL,
+    "xxxl": SizeEnum.XXXL, "3xl": SizeEnum.XXXL, "xxxxl": SizeEnum.XXXXL, "4xl": SizeEnum.XXXXL,
+}
+# Words asking for something rather than describing it
+INTENT_WORDS: Set[str] = {
+    "find", "show", "me", "search", "searching", "looking", "look", "i", "want", "need", "get", "buy", "please",
+    "some", "a", "an", "the", "any", "can", "you", "give", "shop", "order", "online", "products", "product",
+}
+CONNECTOR_WORDS: Set[str] = {"for", "on", "in", "with", "from", "and", "or", "of", "to", "at", "by"}
+NEGATION_WORDS: Set[str] = {"not", "no", "without", "except", "excluding", "non"}
+
+# Compiled patterns
+_AMOUNT = r"(?:rs\.?\s*|inr\s*)?(\d+(?:\.\d+)?)\s*(k)?(?:\s*(?:rs\.?|inr|rupees?|/-))?"
+_PRICE_PATTERNS: List[Tuple[Pattern[str], str]] = [
+    (re.compile(rf"\b(?:between|from)\s+{_AMOUNT}\s+(?:and|to|-)\s+{_AMOUNT}"), "range"),
+    (re.compile(rf"(?<![\w.])(?:rs\.?\s*|inr\s*)?(\d+(?:\.\d+)?)\s*(k)?\s*(?:-|to)\s*{_AMOUNT}(?!\s*(?:x?l|inch))"), "range"),
+    (re.compile(rf"\b(?:under|below|less\s+than|lesser\s+than|within|upto|up\s+to|max(?:imum)?|not\s+more\s+than|"
+                rf"cheaper\s+than|at\s+most|budget(?:\s+of)?|for\s+less\s+than)\s+{_AMOUNT}"), "max"),
+    (re.compile(rf"\b(?:above|over|more\s+than|greater\s+than|at\s+least|min(?:imum)?|starting(?:\s+(?:at|from))?)\s+{_AMOUNT}"), "min"),
+]
+_CURRENCY_PATTERN = re.compile(r"rs|inr|rupee|/-|\dk")
+_SIZE_LIST = r"(?:xs|s|m|l|xl|xxl|xxxl|xxxxl|[2-4]xl|small|medium|large|extra\s+large)"
+_SIZE_PATTERN = re.compile(rf"\bsizes?\s*[:\-]?\s*((?:{_SIZE_LIST}(?:\s*(?:,|/|or|and|&)\s*|\s+)?)+)(?![\w])")
+_BARE_SIZE_PATTERN = re.compile(r"\b(xl|xxl|xxxl|xxxxl|[2-4]xl)\b")
+_NUMERIC_SIZE_PATTERN = re.compile(r"\bsizes?\s*\d+\b")
+_PLATFORM_PATTERN = re.compile(
+    r"\b(?:(?:on|from|at|in|via)\s+)?("
+    + "|".join(re.escape(name) for name in (*SUPPORTED_PLATFORMS, *UNSUPPORTED_PLATFORMS))
+    + r")(?:\.com|\.in)?(?![\w&])"
+)
+_COLOR_PATTERN = re.compile(
+    r"\b(" + "|".join(
+        re.escape(color) for color in (*COLOR_PHRASES, *sorted(COLOR_WORDS | set(COLOR_SYNONYMS) | EXTRA_COLORS, key=len, reverse=True))
+    ) + r")\b"
+)
+_TOKEN_PATTERN = re.compile(r"\d+\.\d+k?|[a-z0-9]+(?:['’\-][a-z0-9]+)*")
+_NUMBER_PATTERN = re.compile(r"^\d+(?:\.\d+)?k?$")
+
+
+@dataclass
+class ParsedQuery:
+    """
+    A query parsed by the rules, with how far the parse can be trusted (0 to 1) and what lowered that.
+    """
+    structured_query: StructuredSearchQuery
+    confidence: float
+    doubts: List[str]
+
+
+class RuleBasedQueryParser:
+    """
+    Deterministic StructuredSearchQuery extractor built from gazetteers and compiled patterns.
+
+    Prices, sizes, platforms, colors, material and gender are cut out of the query in that order, and what is
+    left, minus request words and dangling connectors, is the item name. Confidence drops for anything the rules
+    don't model: item names without a known product word, unknown words, leftover numbers, negations, questions
+    and instructions. An item name with more than MAX_UNKNOWN_WORDS unknown words is never trusted, since it is
+    passed to the browsing agent as is. Below min_confidence the caller should ask the LLM instead.
+    """
+
+    def __init__(self, enabled: bool = DEFAULT_ENABLED, min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self.counters: Dict[str, int] = {"parsed": 0, "llm_fallbacks": 0}
+        self._lock = threading.Lock()
+
+    def parse(self, query: str) -> ParsedQuery:
+        """
+        Parse a query with the rules alone.
+
+        Args:
+            query: The raw natural language query
+
+        Returns:
+            ParsedQuery: The structured query and the confidence in it
+        """
+        # Thousands separators go ("1,500" -> "1500"); other commas stay as separators
+        text = " " + re.sub(r"(?<=\d),(?=\d{3}\b)", "", query.lower()).replace("₹", " rs ").replace(",", " , ") + " "
+        doubts: List[str] = []
+
+        def cut(match: "re.Match[str]") -> None:
+            nonlocal text
+            start, end = match.span()
+            text = text[:start] + " " * (end - start) + text[end:]
+
+        # Prices
+        min_price: Optional[float] = None
+        max_price: Optional[float] = None
+        for pattern, kind in _PRICE_PATTERNS:
+            for match in list(pattern.finditer(text)):
+                values = [
+                    float(amount) * (1000 if thousands else 1)
+                    for amount, thousands in zip(match.groups()[::2], match.groups()[1::2])
+                ]
+                # Small bare numbers are sizes or counts ("shoes 8 to 10"), left in place for the confidence check
+                if max(values) < MIN_BARE_PRICE and not _CURRENCY_PATTERN.search(match.group()):
+                    continue
+                if kind == "range":
+                    min_price, max_price = min(values), max(values)
+                elif kind == "max":
+                    max_price = values[0]
+                else:
+                    min_price = values[0]
+                cut(match)
+
+        # Sizes; numeric sizes have no SizeEnum and stay in the item name
+        sizes: List[SizeEnum] = []
+        numeric_sizes: Set[str] = {token for match in _NUMERIC_SIZE_PATTERN.finditer(text) for token in match.group().split()}
+        for match in list(_SIZE_PATTERN.finditer(text)) + list(_BARE_SIZE_PATTERN.finditer(text)):
+            for size_word in re.findall(_SIZE_LIST, match.group(1)):
+                size = SIZE_WORDS.get(re.sub(r"\s+", " ", size_word))
+                if size is None:
+                    doubts.append(f"size '{size_word}'")
+                elif size not in sizes:
+                    sizes.append(size)
+            cut(match)
+
+        # Platforms
+        supported: List[SourcedFromEnum] = []
+        unsupported: List[str] = []
+        for match in list(_PLATFORM_PATTERN.finditer(text)):
+            name = match.group(1)
+            if name in SUPPORTED_PLATFORMS:
+                if SourcedFromEnum(name) not in supported:
+                    supported.append(SourcedFromEnum(name))
+            elif name not in unsupported:
+                unsupported.append(name)
+            cut(match)
+
+        # Colors, two-word ones first
+        colors: List[str] = []
+        for match in list(_COLOR_PATTERN.finditer(text)):
+            if match.group(1) not in colors:
+                colors.append(match.group(1))
+            cut(match)
+
+        # Material and gender, word by word; the rest is the item
+        material: Optional[str] = None
+        genders: Set[GenderEnum] = set()
+        item_words: List[str] = []
+        for word in _TOKEN_PATTERN.findall(text):
+            if word in GENDER_WORDS:
+                genders.add(GENDER_WORDS[word])
+            elif material is None and tokenize(word)[:1] == [word] and word in MATERIAL_WORDS:
+                material = word
+            elif word not in INTENT_WORDS:
+                item_words.append(word)
+        while item_words and item_words[0] in CONNECTOR_WORDS:
+            item_words.pop(0)
+        while item_words and item_words[-1] in CONNECTOR_WORDS:
+            item_words.pop()
+
+        confidence = 1.0
+        unknown: int = 0
+        item_tokens = [token for word in item_words for token in tokenize(word)]
+        if not any(token in PRODUCT_WORDS for token in item_tokens):
+            confidence -= 0.6
+            doubts.append("no known product")
+        for word in item_words:
+            tokens = tokenize(word)
+            if _NUMBER_PATTERN.match(word) and word not in numeric_sizes:
+                confidence -= 0.4
+                doubts.append(f"number '{word}'")
+            elif word in NEGATION_WORDS or any(token in OFF_TOPIC_WORDS or token in ACTION_WORDS for token in tokens):
+                confidence -= 0.5
+                doubts.append(f"'{word}'")
+            elif word not in CONNECTOR_WORDS and word not in numeric_sizes and not all(
+                token in PRODUCT_WORDS or token in ATTRIBUTE_WORDS for token in tokens
+            ):
+                confidence -= 0.1
+                unknown += 1
+                doubts.append(f"unknown '{word}'")
+        if unknown > MAX_UNKNOWN_WORDS:
+            confidence = 0.0
+        if len(genders) > 1:
+            doubts.append("both genders")
+        if doubts and confidence == 1.0:
+            confidence -= 0.1 * len(doubts)
+
+        structured_query = StructuredSearchQuery(
+            item_name=" ".join(item_words) or query.strip(),
+            item_colors=colors or None,
+            item_sizes=sizes or None,
+            min_price=min_price,
+            max_price=max_price,
+            material=material,
+            gender=genders.pop() if len(genders) == 1 else None,
+            source_from=supported or None,
+            unsupported_platforms=unsupported or None,
+            has_only_unsupported_platforms=bool(unsupported) and not supported,
+        )
+        return ParsedQuery(structured_query, round(max(confidence, 0.0), 2), doubts)
+
+    def try_parse(self, query: str) -> Optional[StructuredSearchQuery]:
+        """
+        The rule-based structured query, or None when the LLM should structure the query instead.
+        """
+        if not self.enabled:
+            return None
+        parsed = self.parse(query)
+        confident = parsed.confidence >= self.min_confidence
+        with self._lock:
+            self.counters["parsed" if confident else "llm_fallbacks"] += 1
+        return parsed.structured_query if confident else None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Queries parsed by the rules and sent to the LLM, and the share parsed locally.
+        """
+        with self._lock:
+            total = sum(self.counters.values())
+            return {**self.counters, "parsed_locally": round(self.counters["parsed"] / total, 3) if total else 0.0}
+
+
+_query_parser: Optional[RuleBasedQueryParser] = None
+_query_parser_lock = threading.Lock()
+
+
+def get_query_parser() -> RuleBasedQueryParser:
+    """
+    Get the process-wide rule-based query parser, configured from Django settings.
+
+    Returns:
+        RuleBasedQueryParser: The shared parser
+    """
+    global _query_parser
+    with _query_parser_lock:
+        if _query_parser is None:
+            _query_parser = RuleBasedQueryParser(
+                enabled=getattr(settings, "QUERY_PARSER_ENABLED", DEFAULT_ENABLED),
+                min_confidence=getattr(settings, "QUERY_PARSER_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE),
+            )
+        return _query_parser
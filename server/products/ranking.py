@@ -0,0 +1,123 @@
+import heapq
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from .models import Product, StructuredSearchQuery
+from .product_index import GENDER_CODES, GENDER_TOKENS, tokenize
+
+# Words that don't tell two listings apart
+NAME_STOPWORDS: Set[str] = {"for", "with", "and", "the", "of", "in", "by", "a", "an", "pack", "set", "unisex"}
+
+# Image basenames shorter than this are too generic ("image.jpg") to identify a product
+MIN_IMAGE_STEM_LENGTH: int = 8
+
+_IMAGE_SIZE_PATTERN = re.compile(r"([_-]?\d{2,4}x\d{2,4}|[_-](small|medium|large|thumb|zoom))$")
+
+
+def name_fingerprint(tokens: Iterable[str]) -> str:
+    """
+    Order-insensitive key of a tokenized product name: its tokens without gender words, stopwords or duplicates, sorted.
+    """
+    return " ".join(sorted({token for token in tokens if token not in NAME_STOPWORDS and token not in GENDER_TOKENS}))
+
+
+def image_fingerprint(url: str) -> Optional[str]:
+    """
+    Key of a product image that survives CDN hosts, query strings and resized variants, if it is specific enough.
+    """
+    basename = url.split("?", 1)[0].split("#", 1)[0].rsplit("/", 1)[-1].lower()
+    stem = _IMAGE_SIZE_PATTERN.sub("", basename.rsplit(".", 1)[0])
+    return stem if len(stem) >= MIN_IMAGE_STEM_LENGTH else None
+
+
+class QueryRelevance:
+    """
+    Scores how well a product name matches a structured query, as a small integer.
+
+    Naming every token of the item counts most, then each of the requested colors and material; naming only
+    the other gender counts against a product.
+    """
+
+    def __init__(self, structured_query: StructuredSearchQuery):
+        self.required: Set[str] = set(tokenize(structured_query.item_name))
+        self.attributes: List[Set[str]] = [
+            {token for term in terms for token in tokenize(term)}
+            for terms in (structured_query.item_colors or [], [structured_query.material] if structured_query.material else [])
+        ]
+        self.other_gender: int = 3 - GENDER_CODES[structured_query.gender] if structured_query.gender in GENDER_CODES else 0
+
+    def score(self, tokens: Set[str]) -> int:
+        score = 4 if self.required <= tokens else 2 if not self.required.isdisjoint(tokens) else 0
+        for attribute in self.attributes:
+            if not attribute.isdisjoint(tokens):
+                score += 1
+        if self.other_gender:
+            gender = 0
+            for token in tokens:
+                gender |= GENDER_TOKENS.get(token, 0)
+            if gender == self.other_gender:
+                score -= 1
+        return score
+
+
+def cheapest_first(products: List[Product]) -> List[Product]:
+    """
+    The products ordered by selling price, sorting only when they aren't already.
+    """
+    if all(products[index - 1].selling_price <= products[index].selling_price for index in range(1, len(products))):
+        return products
+    return sorted(products, key=lambda product: product.selling_price)
+
+
+def merge_by_price(product_lists: Iterable[List[Product]]) -> Iterator[Product]:
+    """
+    k-way merge of per-site product lists into one stream, cheapest first.
+    """
+    return heapq.merge(*(cheapest_first(products) for products in product_lists), key=lambda product: product.selling_price)
+
+
+def rank_products(
+    product_lists: Iterable[List[Product]],
+    structured_query: StructuredSearchQuery,
+    seen: Optional[Set[str]] = None,
+) -> List[Product]:
+    """
+    Combine the websites' results into a single ranked list.
+
+    The per-site lists are merged by price, near-duplicates are collapsed onto their cheapest listing, and
+    products are grouped by relevance to the query, most relevant first and cheapest first within a group.
+    Relevance takes a handful of values, so grouping is a bucket pass and the whole stage stays O(n log k)
+    for k websites.
+
+    Args:
+        product_lists: Each website's products
+        structured_query: The query the products were searched for
+        seen: Fingerprints of products already shown, such as earlier pages; updated with the new products
+
+    Returns:
+        list[Product]: The distinct products, best first
+    """
+    query_relevance = QueryRelevance(structured_query)
+    seen = seen if seen is not None else set()
+    buckets: Dict[int, List[Product]] = {}
+    for product in merge_by_price(product_lists):
+        tokens = tokenize(product.product_name)
+        # Listings are the same product when their URLs or image fingerprints match, or when their normalized
+        # names match across websites; one site's generic titles ("Men Regular Fit Solid Casual Shirt") name
+        # many different products
+        keys: List[str] = ["url:" + product.product_url.split("?", 1)[0].split("#", 1)[0].rstrip("/").lower()]
+        image_key = image_fingerprint(product.product_image_url)
+        if image_key is not None:
+            keys.append("image:" + image_key)
+        if any(key in seen for key in keys):
+            continue
+        name_key = name_fingerprint(tokens)
+        if name_key:
+            # A name is only ever kept from one website, so a name seen but not from this website is another's
+            site_name_key = f"name:{product.sourced_from.value}:{name_key}"
+            if "name:" + name_key in seen and site_name_key not in seen:
+                continue
+            keys += ["name:" + name_key, site_name_key]
+        seen.update(keys)
+        buckets.setdefault(query_relevance.score(set(tokens)), []).append(product)
+    return [product for score in sorted(buckets, reverse=True) for product in buckets[score]]
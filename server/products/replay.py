@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from browser_use.browser.context import BrowserContext
+from django.conf import settings
+
+from .benchmarking import StubOpenAIServer
+from .models import Product, SourcedFromEnum
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cassette modes
+RECORD: str = "record"
+REPLAY: str = "replay"
+
+# Defaults, overridable through Django settings
+DEFAULT_UPSTREAM: str = "https://api.openai.com/v1"
+
+# Output schemas answered the same whenever the prompt is: the guard's and the query structuring's
+DETERMINISTIC_SCHEMAS: Tuple[str, ...] = ("QueryValidationResult", "StructuredSearchQuery")
+
+# The first of the websites' hosts named outside the system prompt tells which site an agent is searching
+_SITE_PATTERN = re.compile(r"https?://(?:www\.)?(" + "|".join(website.value for website in SourcedFromEnum) + r")\.")
+
+# Search function with search.search_website's signature
+SearchWebsite = Callable[..., Awaitable[List[Product]]]
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    # Screenshots differ between runs of the same page, so only the text parts of a message identify it
+    content = message.get("content")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def request_keys(body: Dict[str, Any]) -> List[str]:
+    """
+    Keys a chat completion request is recorded and replayed under, most specific first.
+
+    Guard and structuring calls are keyed by their exact prompt. Agent steps carry page state and timestamps
+    that change between runs, so they are also keyed by the website the conversation is about and the step,
+    counted as the assistant turns so far; replaying an agent then follows the recorded run step by step.
+
+    Args:
+        body: The request's JSON body
+
+    Returns:
+        list[str]: Lookup keys
+    """
+    schema = (body.get("response_format") or {}).get("json_schema", {}).get("name")
+    if schema is None:
+        tools = body.get("tools") or [{}]
+        schema = tools[0].get("function", {}).get("name", "chat")
+    messages = body.get("messages") or []
+    texts = [f"{message.get('role')}:{_message_text(message)}" for message in messages]
+    keys = [f"{schema}:{hashlib.sha1(json.dumps(texts).encode()).hexdigest()}"]
+    if schema not in DETERMINISTIC_SCHEMAS:
+        match = _SITE_PATTERN.search("\n".join(
+            text for message, text in zip(messages, texts) if message.get("role") != "system"
+        ))
+        turn = sum(1 for message in messages if message.get("role") == "assistant")
+        keys.append(f"{schema}:{match.group(1) if match else 'unknown'}:step{turn}")
+    return keys
+
+
+class Cassette:
+    """
+    One search's recorded traffic in a directory: its OpenAI responses (openai.json), the query with each
+    website's products per results page (search.json) and browser page snapshots as HAR files (pages/).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.responses: Dict[str, Dict[str, Any]] = self._load("openai.json")
+        search: Dict[str, Any] = self._load("search.json")
+        self.query: Optional[str] = search.get("query")
+        self.sites: Dict[str, Dict[str, Dict[str, Any]]] = search.get("sites", {})
+        self._lock = threading.Lock()
+
+    def _load(self, name: str) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.path, name)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def save(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            for name, data in (("openai.json", self.responses), ("search.json", {"query": self.query, "sites": self.sites})):
+                with open(os.path.join(self.path, name), "w") as file:
+                    json.dump(data, file, indent=1, sort_keys=True)
+
+    def har_path(self, website: SourcedFromEnum, page: int) -> str:
+        return os.path.join(self.path, "pages", f"{website.value}-{page}.har")
+
+    def record_response(self, keys: List[str], status: int, response: Dict[str, Any], seconds: float) -> None:
+        with self._lock:
+            for key in keys:
+                self.responses[key] = {"status": status, "response": response, "seconds": round(seconds, 3)}
+
+    def find_response(self, keys: List[str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((self.responses[key] for key in keys if key in self.responses), None)
+
+    def record_site(self, website: SourcedFromEnum, page: int, products: List[Product], seconds: float) -> None:
+        with self._lock:
+            self.sites.setdefault(website.value, {})[str(page)] = {
+                "products": [product.model_dump(mode="json") for product in products],
+                "seconds": round(seconds, 3),
+            }
+
+    def find_site(self, website: SourcedFromEnum, page: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.sites.get(website.value, {}).get(str(page))
+
+
+class ReplayOpenAIServer(StubOpenAIServer):
+    """
+    Local OpenAI endpoint backed by a cassette.
+
+    Recording forwards every request to the real API with the caller's key and stores the response.
+    Replaying answers from the cassette after the recorded latency times latency_scale, or a fixed latency;
+    requests that weren't recorded get a 404, so a stale cassette fails loudly rather than quietly.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        mode: str = REPLAY,
+        latency: Optional[float] = None,
+        latency_scale: float = 1.0,
+        upstream: Optional[str] = None,
+    ):
+        super().__init__(latency=latency or 0.0)
+        self.cassette = cassette
+        self.mode = mode
+        self.fixed_latency = latency
+        self.latency_scale = latency_scale
+        self.upstream = upstream or getattr(settings, "REPLAY_OPENAI_UPSTREAM", DEFAULT_UPSTREAM)
+        # Captured before the stub points OPENAI_API_KEY at itself
+        self.upstream_key: Optional[str] = os.environ.get("OPENAI_API_KEY")
+        self.misses = 0
+
+    def complete(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any], float]:
+        keys = request_keys(body)
+        if self.mode == RECORD:
+            started = time.perf_counter()
+            status, response = self._forward(body)
+            self.cassette.record_response(keys, status, response, time.perf_counter() - started)
+            return status, response, 0.0
+
+        recorded = self.cassette.find_response(keys)
+        if recorded is None:
+            with self._lock:
+                self.misses += 1
+            logger.warning(f"No recorded OpenAI response for {keys[-1]}")
+            return 404, {"error": {"message": "Not in the cassette", "type": "replay_miss"}}, 0.0
+        latency = self.fixed_latency if self.fixed_latency is not None else recorded["seconds"] * self.latency_scale
+        return recorded["status"], recorded["response"], latency
+
+    def _forward(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        request = urllib.request.Request(
+            f"{self.upstream.rstrip('/')}/chat/completions",
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.upstream_key}"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"{}")
+
+
+def record_search_website(search_website: SearchWebsite, cassette: Cassette) -> SearchWebsite:
+    """
+    Wrap a search function so each website's products and search time are recorded per results page.
+    """
+    async def recording_search_website(website: SourcedFromEnum, *args: Any, page: int = 1, **kwargs: Any) -> List[Product]:
+        started = time.perf_counter()
+        products = await search_website(website, *args, page=page, **kwargs)
+        cassette.record_site(website, page, products, time.perf_counter() - started)
+        return products
+
+    return recording_search_website
+
+
+def replay_search_website(
+    cassette: Cassette,
+    latency: Optional[float] = None,
+    latency_scale: float = 1.0,
+) -> SearchWebsite:
+    """
+    Build a stand-in for search.search_website returning each website's recorded products for the page,
+    after its recorded search time times latency_scale or a fixed latency. Pages that weren't recorded are empty.
+    """
+    async def search_website(website: SourcedFromEnum, *args: Any, page: int = 1, **kwargs: Any) -> List[Product]:
+        recorded = cassette.find_site(website, page)
+        seconds = recorded["seconds"] * latency_scale if recorded is not None else 0.0
+        await asyncio.sleep(latency if latency is not None else seconds)
+        if recorded is None:
+            return []
+        return [Product.model_validate(product) for product in recorded["products"]]
+
+    return search_website
+
+
+class PageSnapshots:
+    """
+    Records every request a search's browser context makes into a per-site, per-page HAR file, or serves the
+    context from that file, aborting anything that wasn't recorded so replays never touch the network.
+    """
+
+    def __init__(self, cassette: Cassette, mode: str = REPLAY):
+        self.cassette = cassette
+        self.mode = mode
+
+    async def attach(self, browser_context: BrowserContext, website: SourcedFromEnum, page: int) -> None:
+        """
+        Route a freshly borrowed browser context through the website's snapshot.
+        """
+        har_path = self.cassette.har_path(website, page)
+        session = await browser_context.get_session()
+        if self.mode == RECORD:
+            os.makedirs(os.path.dirname(har_path), exist_ok=True)
+            # Playwright writes the HAR when the context closes
+            await session.context.route_from_har(har_path, update=True, update_content="embed", update_mode="minimal")
+        else:
+            await session.context.route_from_har(har_path, not_found="abort")
+
+
+_page_snapshots: Optional[PageSnapshots] = None
+_page_snapshots_lock = threading.Lock()
+
+
+def get_page_snapshots() -> Optional[PageSnapshots]:
+    """
+    Get the page snapshots browser contexts are recorded into or replayed from, if SEARCH_PAGE_SNAPSHOTS
+    configures any, e.g. {"path": "replay/jeans", "mode": "replay"}.
+
+    Returns:
+        PageSnapshots | None: The shared snapshots, or None when browsing the live sites
+    """
+    global _page_snapshots
+    config: Optional[Dict[str, str]] = getattr(settings, "SEARCH_PAGE_SNAPSHOTS", None)
+    if not config:
+        return None
+    with _page_snapshots_lock:
+        if _page_snapshots is None or _page_snapshots.cassette.path != config["path"] or _page_snapshots.mode != config.get("mode", REPLAY):
+            _page_snapshots = PageSnapshots(Cassette(config["path"]), config.get("mode", REPLAY))
+        return _page_snapshots
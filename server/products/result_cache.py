@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Product, Products, SourcedFromEnum, StructuredSearchQuery
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_TTL: float = 15 * 60
+DEFAULT_STALE_TTL: float = 60 * 60
+DEFAULT_MAX_BYTES: int = 32 * 1024 * 1024
+
+
+def normalized_query_key(structured_query: StructuredSearchQuery) -> Dict[str, object]:
+    """
+    Reduce a structured query to the fields that determine a site's results, in a canonical form.
+    Platform fields are left out because the site is part of the cache key.
+    """
+    return {
+        "item_name": " ".join(structured_query.item_name.lower().split()),
+        "item_colors": sorted({color.lower().strip() for color in structured_query.item_colors or []}),
+        "item_sizes": sorted({size.value for size in structured_query.item_sizes or []}),
+        "min_price": structured_query.min_price,
+        "max_price": structured_query.max_price,
+        "material": structured_query.material.lower().strip() if structured_query.material else None,
+        "gender": structured_query.gender.value if structured_query.gender else None,
+    }
+
+
+def result_cache_key(structured_query: StructuredSearchQuery, website: SourcedFromEnum) -> str:
+    """
+    Build the cache key for a site's results for a structured query.
+    """
+    payload = json.dumps([website.value, normalized_query_key(structured_query)], sort_keys=True)
+    return f"products:results:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+@dataclass
+class CachedResult:
+    """
+    A site's serialized products and when they were scraped.
+    """
+    payload: str
+    stored_at: float
+
+    def products(self) -> List[Product]:
+        return Products.model_validate_json(self.payload).products
+
+
+class ResultCache:
+    """
+    Two-tier cache of per-site search results.
+
+    The in-process tier is an LRU bounded by the size of the serialized products. The optional shared tier
+    uses a Django cache backend so results survive restarts and are shared between workers.
+    Entries are fresh for the site's TTL; for a further stale TTL they are still served while a background
+    refresh replaces them (stale-while-revalidate).
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[SourcedFromEnum, float]] = None,
+        default_ttl: float = DEFAULT_TTL,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        shared_cache_alias: Optional[str] = None,
+    ):
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.shared_cache_alias = shared_cache_alias
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "stale_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "evictions": 0,
+        }
+        self._entries: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._size: int = 0
+        self._refreshing: Set[str] = set()
+        # Strong references to the background refreshes, so none is garbage-collected while running
+        self._refresh_tasks: Set["asyncio.Task[None]"] = set()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, website: SourcedFromEnum) -> float:
+        return self.ttls.get(website, self.default_ttl)
+
+    def _get_local(self, key: str) -> Optional[CachedResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set_local(self, key: str, entry: CachedResult) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.payload)
+            self._entries[key] = entry
+            self._size += len(entry.payload)
+
+            # Evict least recently used entries until the tier fits its memory budget
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.payload)
+                self.counters["evictions"] += 1
+
+    def _get_shared(self, key: str) -> Optional[CachedResult]:
+        if self.shared_cache_alias is None:
+            return None
+        try:
+            value = caches[self.shared_cache_alias].get(key)
+        except Exception as e:
+            logger.warning(f"Shared result cache read failed: {str(e)}")
+            return None
+        return CachedResult(**value) if value else None
+
+    def _set_shared(self, key: str, entry: CachedResult, website: SourcedFromEnum) -> None:
+        if self.shared_cache_alias is None:
+            return
+        try:
+            caches[self.shared_cache_alias].set(
+                key,
+                {"payload": entry.payload, "stored_at": entry.stored_at},
+                timeout=self.ttl_for(website) + self.stale_ttl,
+            )
+        except Exception as e:
+            logger.warning(f"Shared result cache write failed: {str(e)}")
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        """
+        Look up an entry in the in-process tier, then in the shared tier.
+        """
+        entry = self._get_local(key)
+        if entry is None:
+            entry = self._get_shared(key)
+            if entry is not None:
+                self.counters["shared_hits"] += 1
+                self._set_local(key, entry)
+        return entry
+
+    def set(self, key: str, website: SourcedFromEnum, products: List[Product]) -> None:
+        """
+        Store a site's products in both tiers.
+        """
+        entry = CachedResult(payload=Products(products=products).model_dump_json(), stored_at=time.time())
+        self._set_local(key, entry)
+        self._set_shared(key, entry, website)
+
+    async def _refresh(self, key: str, website: SourcedFromEnum, fetch: Callable[[], Awaitable[List[Product]]]) -> None:
+        try:
+            products = await fetch()
+            if products:
+                self.set(key, website, products)
+            self.counters["refreshes"] += 1
+        except Exception as e:
+            self.counters["refresh_failures"] += 1
+            logger.error(f"Background refresh of {website} results failed: {str(e)}")
+        finally:
+            self._refreshing.discard(key)
+
+    def _refresh_done(self, task: "asyncio.Task[None]") -> None:
+        self._refresh_tasks.discard(task)
+        # _refresh() logs its own failures; this catches cancellation and anything it let through
+        if task.cancelled():
+            logger.warning("Background refresh of cached results was cancelled")
+        elif task.exception() is not None:
+            self.counters["refresh_failures"] += 1
+            logger.error(f"Background refresh of cached results failed: {str(task.exception())}")
+
+    async def get_or_fetch(
+        self,
+        structured_query: StructuredSearchQuery,
+        website: SourcedFromEnum,
+        fetch: Callable[[], Awaitable[List[Product]]],
+        refresh: Optional[Callable[[], Awaitable[List[Product]]]] = None,
+    ) -> Tuple[List[Product], bool]:
+        """
+        Return a site's cached products for a query, scraping them with fetch() on a miss.
+        Stale entries are returned immediately while refresh() refreshes them in the background.
+
+        Args:
+            structured_query: The parsed query
+            website: The website the products come from
+            fetch: Coroutine factory that scrapes the website
+            refresh: Coroutine factory for background refreshes, which must skip any store older than the stale
+                entry (such as the catalog); defaults to fetch
+
+        Returns:
+            tuple[list[Product], bool]: The site's products and whether they came from the cache
+        """
+        key = result_cache_key(structured_query, website)
+        entry = self.get(key)
+
+        if entry is not None:
+            age = time.time() - entry.stored_at
+            ttl = self.ttl_for(website)
+            if age <= ttl:
+                self.counters["hits"] += 1
+                return entry.products(), True
+            if age <= ttl + self.stale_ttl:
+                self.counters["stale_hits"] += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    task = asyncio.ensure_future(self._refresh(key, website, refresh or fetch))
+                    self._refresh_tasks.add(task)
+                    task.add_done_callback(self._refresh_done)
+                return entry.products(), True
+
+        self.counters["misses"] += 1
+        products = await fetch()
+        # Empty results are usually failures, so they are not cached
+        if products:
+            self.set(key, website, products)
+        return products, False
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Hit/miss/refresh counters plus the in-process tier's current size.
+        """
+        with self._lock:
+            return {**self.counters, "entries": len(self._entries), "bytes": self._size}
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Get the process-wide result cache, configured from Django settings.
+
+    Returns:
+        ResultCache: The shared cache
+    """
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                ttls={
+                    SourcedFromEnum(website): ttl
+                    for website, ttl in getattr(settings, "RESULT_CACHE_TTLS", {}).items()
+                },
+                default_ttl=getattr(settings, "RESULT_CACHE_DEFAULT_TTL", DEFAULT_TTL),
+                stale_ttl=getattr(settings, "RESULT_CACHE_STALE_TTL", DEFAULT_STALE_TTL),
+                max_bytes=getattr(settings, "RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES),
+                shared_cache_alias=getattr(settings, "RESULT_CACHE_SHARED_ALIAS", None),
+            )
+        return _result_cache
@@ -0,0 +1,194 @@
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional
+
+from django.conf import settings
+
+from .models import SourcedFromEnum
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_MAX_AGENTS: int = 8
+DEFAULT_MAX_QUEUED: int = 32
+DEFAULT_ADMISSION_TIMEOUT: float = 30.0
+DEFAULT_LATENCY_BUDGET: float = 90.0
+DEFAULT_SITE_DEADLINE: float = 75.0
+
+
+class SearchOverloaded(Exception):
+    """
+    Raised when a site search cannot be admitted: the wait queue is full or the admission timeout expired.
+    """
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SearchScheduler:
+    """
+    Admission control for site searches.
+
+    Enforces a global cap on live agents and per-site caps. Searches beyond the caps wait in a bounded queue;
+    when the queue is full they are rejected immediately, and waiters give up after the admission timeout.
+    Slots are awaited on the browser pool's event loop; counters are safe to read from any thread.
+    """
+
+    def __init__(
+        self,
+        max_agents: int = DEFAULT_MAX_AGENTS,
+        site_limits: Optional[Dict[SourcedFromEnum, int]] = None,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        admission_timeout: float = DEFAULT_ADMISSION_TIMEOUT,
+    ):
+        self.max_agents = max_agents
+        self.site_limits = site_limits or {}
+        self.max_queued = max_queued
+        self.admission_timeout = admission_timeout
+        self.counters: Dict[str, float] = {
+            "admitted": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+        self._running: Dict[SourcedFromEnum, int] = {}
+        self._waiting: int = 0
+        self._global: Optional[asyncio.Semaphore] = None
+        self._sites: Dict[SourcedFromEnum, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphores(self, website: SourcedFromEnum) -> tuple:
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_agents)
+        if website not in self._sites:
+            self._sites[website] = asyncio.Semaphore(self.site_limits.get(website, self.max_agents))
+        return self._sites[website], self._global
+
+    @contextlib.asynccontextmanager
+    async def slot(self, website: SourcedFromEnum) -> AsyncIterator[None]:
+        """
+        Hold a slot for one agent on a website for the duration of the block.
+
+        Args:
+            website: The website the agent will browse
+
+        Raises:
+            SearchOverloaded: If the wait queue is full or the slot is not granted within the admission timeout
+        """
+        site_semaphore, global_semaphore = self._semaphores(website)
+
+        with self._lock:
+            must_wait = site_semaphore.locked() or global_semaphore.locked()
+            if must_wait and self._waiting >= self.max_queued:
+                self.counters["rejected"] += 1
+                raise SearchOverloaded("Search queue is full")
+            self._waiting += 1
+
+        started = time.perf_counter()
+        acquired_site = acquired_global = False
+        try:
+            # Per-site slot first, so a search waiting on a busy site doesn't hold a global slot
+            async with asyncio.timeout(self.admission_timeout):
+                await site_semaphore.acquire()
+                acquired_site = True
+                await global_semaphore.acquire()
+                acquired_global = True
+        except TimeoutError:
+            if acquired_site:
+                site_semaphore.release()
+            with self._lock:
+                self.counters["timed_out"] += 1
+            raise SearchOverloaded(f"Timed out waiting for a {website.value} search slot")
+        except BaseException:
+            if acquired_global:
+                global_semaphore.release()
+            if acquired_site:
+                site_semaphore.release()
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._waiting -= 1
+                if acquired_global:
+                    self.counters["admitted"] += 1
+                    self.counters["wait_ms_total"] += wait_ms
+                    self.counters["wait_ms_max"] = max(self.counters["wait_ms_max"], wait_ms)
+                    self._running[website] = self._running.get(website, 0) + 1
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running[website] -= 1
+            global_semaphore.release()
+            site_semaphore.release()
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Queue depth, running agents per site and admission/wait-time counters.
+        """
+        with self._lock:
+            admitted = self.counters["admitted"]
+            return {
+                "queue_depth": self._waiting,
+                "running": sum(self._running.values()),
+                "running_per_site": {website.value: count for website, count in self._running.items()},
+                "admitted": admitted,
+                "rejected": self.counters["rejected"],
+                "timed_out": self.counters["timed_out"],
+                "wait_ms_avg": round(self.counters["wait_ms_total"] / admitted, 1) if admitted else 0.0,
+                "wait_ms_max": round(self.counters["wait_ms_max"], 1),
+            }
+
+
+_scheduler: Optional[SearchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_search_scheduler() -> SearchScheduler:
+    """
+    Get the process-wide search scheduler, configured from Django settings.
+
+    Returns:
+        SearchScheduler: The shared scheduler
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SearchScheduler(
+                max_agents=getattr(settings, "SEARCH_MAX_AGENTS", DEFAULT_MAX_AGENTS),
+                site_limits={
+                    SourcedFromEnum(website): limit
+                    for website, limit in getattr(settings, "SEARCH_SITE_AGENT_LIMITS", {}).items()
+                },
+                max_queued=getattr(settings, "SEARCH_MAX_QUEUED", DEFAULT_MAX_QUEUED),
+                admission_timeout=getattr(settings, "SEARCH_ADMISSION_TIMEOUT", DEFAULT_ADMISSION_TIMEOUT),
+            )
+        return _scheduler
+
+
+def get_latency_budget() -> float:
+    """
+    Seconds a search request may take end to end, from Django settings.
+    """
+    return getattr(settings, "SEARCH_LATENCY_BUDGET", DEFAULT_LATENCY_BUDGET)
+
+
+def get_site_deadline(website: SourcedFromEnum) -> float:
+    """
+    Seconds a single website's search may take, queueing included, from Django settings.
+
+    Args:
+        website: The website being searched
+
+    Returns:
+        float: The website's deadline
+    """
+    deadlines: Dict[str, float] = getattr(settings, "SEARCH_SITE_DEADLINES", {})
+    return deadlines.get(website.value, DEFAULT_SITE_DEADLINE)
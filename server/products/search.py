@@ -0,0 +1,264 @@
+from browser_use import (
+    Agent,
+    Controller,
+)
+from browser_use.browser.context import BrowserContext
+from langchain_openai import ChatOpenAI
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+import time
+
+from .browser_pool import BrowserPool
+from .extractors import get_extractor
+from .filters import SiteFilters, post_filter, translate_filters
+from .metrics import AGENT_STEP_SECONDS, SITE_STAGE_SECONDS, record_llm_usage, timed_stage
+from .models import Product, Products, SourcedFromEnum, StructuredSearchQuery
+from .navigation import get_navigation_macros, steps_from_history
+from .prompts import build_agent_task, record_token_usage
+from .replay import PageSnapshots, get_page_snapshots
+from .vision import VisionRun, get_vision_policy
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+WEBSITE_URLS: Dict[SourcedFromEnum, str] = {
+    SourcedFromEnum.ajio: "https://www.ajio.com",
+    SourcedFromEnum.meesho: "https://www.meesho.com",
+    SourcedFromEnum.myntra: "https://www.myntra.com",
+    SourcedFromEnum.flipkart: "https://www.flipkart.com"
+}
+LLM_MODEL: str = "gpt-4o-mini"
+
+# Receives progress events such as {"website": "myntra", "stage": "agent", "step": 2, "goal": "..."}
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def normalize_products(products: List[Product]) -> List[Product]:
+    """
+    Fill in missing MRPs, recompute discounts and sort products by selling price.
+
+    Args:
+        products: Products scraped from a single website
+
+    Returns:
+        list[Product]: The normalized products, cheapest first
+    """
+    for product in products:
+        if not product.maximum_retail_price:
+            product.maximum_retail_price = product.selling_price
+        product.discount_percentage = round(((product.maximum_retail_price - product.selling_price) / product.maximum_retail_price) * 100, 2)
+    products.sort(key=lambda p: p.selling_price)
+    return products
+
+
+async def run_agent(
+    website_url: str,
+    search_query: str,
+    llm: ChatOpenAI,
+    controller: Controller,
+    browser_context: BrowserContext,
+    on_step: Optional[Callable[[int, str], Awaitable[None]]] = None,
+    vision: Optional[VisionRun] = None,
+    start_url: Optional[str] = None,
+    website: Optional[SourcedFromEnum] = None,
+    page_open: bool = False,
+) -> List[Product]:
+    """
+    Run the browser automation agent for a website inside a borrowed browser context.
+
+    Args:
+        website_url: Base URL of the website to search on
+        search_query: The standardized search string
+        llm: Language model driving the agent
+        controller: Controller with the compact Products output model (prompts.AGENT_OUTPUT_MODEL)
+        browser_context: Isolated context borrowed from the browser pool
+        on_step: Optional callback receiving each step number and the agent's next goal
+        vision: Optional adaptive vision switch; without one every step sends a screenshot
+        start_url: Page to open first, such as the filtered results page; defaults to the website's home page
+        website: The website searched, labelling the step metrics; defaults to its URL
+        page_open: The context's current page already shows the results, such as after a navigation macro replay,
+            so no page is opened first; runs that had to navigate teach the site's navigation macro otherwise
+
+    Returns:
+        list: List of products found on the website
+    """
+    site: str = website.value if website is not None else website_url
+    # Each step reports once its next action is decided, so a step lasts from one callback to the next
+    last_step_at: List[float] = [time.perf_counter()]
+
+    async def step_callback(state: Any, model_output: Any, step: int) -> None:
+        now: float = time.perf_counter()
+        AGENT_STEP_SECONDS.observe(now - last_step_at[0], site=site)
+        last_step_at[0] = now
+        if vision is not None:
+            vision.observe_step(agent, state)
+        if on_step is not None:
+            await on_step(step, model_output.current_state.next_goal)
+
+    # Create and configure the browser automation agent
+    agent: Agent = Agent(
+        task=build_agent_task(website_url, search_query),
+        llm=llm,
+        controller=controller,
+        use_vision=vision.enabled if vision is not None else True,
+        initial_actions=[] if page_open else [
+            {"open_tab": {"url": start_url or website_url}},
+        ],
+        browser_context=browser_context,
+        register_new_step_callback=step_callback,
+    )
+
+    # Run the agent and get search results, recording the tokens each step costs
+    with record_token_usage() as usage:
+        history = await agent.run()
+    logger.info(f"Agent on {website_url}: {usage.summary()}")
+    record_llm_usage("agent", usage.input_tokens, usage.cached_tokens, usage.output_tokens, calls=len(usage.steps))
+    result: Optional[str] = history.final_result()
+
+    # Parse and return results if available
+    if result:
+        parsed: Products = Products.model_validate_json(result)
+        if parsed.products and website is not None and not page_open:
+            step_tokens: List[int] = [step.input_tokens + step.output_tokens for step in usage.steps]
+            get_navigation_macros().learn(website, search_query, steps_from_history(history, step_tokens))
+        return parsed.products
+    return []
+
+
+async def search_website(
+    website: SourcedFromEnum,
+    search_query: str,
+    llm: ChatOpenAI,
+    controller: Controller,
+    browser_pool: BrowserPool,
+    on_progress: Optional[ProgressCallback] = None,
+    structured_query: Optional[StructuredSearchQuery] = None,
+    page: int = 1,
+) -> List[Product]:
+    """
+    Search for products on a specific website.
+    Given the structured query, its constraints are applied as the site's own URL filters, so the extractor and
+    the agent start on a results page that already matches, and the results are post-filtered against it.
+    The site's deterministic extractor is tried first; the LLM agent only runs when it fails or finds nothing on the
+    first page. An extractor that reads a later page without products has reached the end of the results.
+    The agent reads the page text and only sends screenshots when the vision policy says the site needs them,
+    a step fails or the text-only run finds nothing. On sites where the agent had to navigate from its start page
+    before, the site's learned navigation macro is replayed when the start page shows no results, so the agent's
+    steps go to extraction rather than finding the search box.
+
+    Args:
+        website: Enum representing the website to search on
+        search_query: The standardized search string
+        llm: Language model driving the fallback agent
+        controller: Controller with the compact Products output model
+        browser_pool: Pool to borrow an isolated browser context from
+        on_progress: Optional callback receiving progress events for this website
+        structured_query: Optional parsed query to filter by; without it the search string is searched as is
+        page: Results page to collect, from 1; later pages are opened by URL
+
+    Returns:
+        list: List of products found on the website
+
+    Raises:
+        Exception: Errors from the browser or agent are logged and re-raised so callers can report the site's status
+    """
+    async def report(stage: str, **details: Any) -> None:
+        if on_progress is not None:
+            await on_progress({"website": website.value, "stage": stage, **details})
+
+    async def report_step(step: int, goal: str) -> None:
+        await report("agent", step=step, goal=goal)
+
+    def keep_matching(products: List[Product]) -> List[Product]:
+        with timed_stage("post_filter"):
+            products = normalize_products(products)
+            return post_filter(structured_query, products) if structured_query is not None else products
+
+    try:
+        website_url: str = WEBSITE_URLS[website]
+        extractor = get_extractor(website)
+
+        # Search for the query's text and apply its other constraints as the site's filters
+        filters: Optional[SiteFilters] = None
+        start_url: Optional[str] = None
+        if structured_query is not None:
+            filters = translate_filters(website, structured_query)
+            search_query = filters.search_text
+        if extractor is not None and (filters is not None or page > 1):
+            start_url = extractor.filtered_search_url(search_query, filters, page)
+        elif page > 1:
+            # Without a results URL to open, later pages aren't reachable
+            return []
+
+        # Borrow an isolated context from the shared browser pool
+        async with browser_pool.context() as browser_context:
+            # Offline benchmarks serve the pages from recorded snapshots
+            page_snapshots: Optional[PageSnapshots] = get_page_snapshots()
+            if page_snapshots is not None:
+                await page_snapshots.attach(browser_context, website, page)
+            if extractor is not None:
+                await report("extractor")
+                try:
+                    with timed_stage(f"{website.value}.extractor", SITE_STAGE_SECONDS, site=website.value, stage="extractor"):
+                        products: List[Product] = await extractor.extract(browser_context, search_query, filters, page)
+                    if products or page > 1:
+                        # A later page that lists nothing means the site has run out of results
+                        return keep_matching(products)
+                    logger.info(f"Extractor found no products on {website}, falling back to the agent")
+                except Exception as e:
+                    logger.warning(f"Extractor failed on {website}, falling back to the agent: {str(e)}")
+
+            # When the start page hasn't shown results before, go straight to them with the site's learned navigation
+            page_open: bool = False
+            if page == 1:
+                with timed_stage(f"{website.value}.navigation_macro", SITE_STAGE_SECONDS, site=website.value, stage="navigation_macro"):
+                    results_url: Optional[str] = await get_navigation_macros().replay(
+                        website, browser_context, search_query, start_url or website_url, filters
+                    )
+                if results_url is not None:
+                    start_url, page_open = results_url, True
+
+            await report("agent", step=0, goal="Starting browser agent")
+            vision: VisionRun = get_vision_policy().start(website)
+            with timed_stage(f"{website.value}.agent", SITE_STAGE_SECONDS, site=website.value, stage="agent"):
+                products = await run_agent(
+                    website_url,
+                    search_query,
+                    llm,
+                    controller,
+                    browser_context,
+                    on_step=report_step if on_progress else None,
+                    vision=vision,
+                    start_url=start_url,
+                    website=website,
+                    page_open=page_open
+                )
+            if not products and not vision.enabled:
+                # The page text wasn't enough - look again with screenshots
+                vision.fall_back("no products found without vision")
+                if vision.enabled:
+                    await report("agent", step=0, goal="Retrying with screenshots")
+                    if page_open:
+                        # Back to the replayed results page, which the first run may have left
+                        current_page = await browser_context.get_current_page()
+                        await current_page.goto(start_url, wait_until="domcontentloaded")
+                    with timed_stage(f"{website.value}.agent", SITE_STAGE_SECONDS, site=website.value, stage="agent"):
+                        products = await run_agent(
+                            website_url,
+                            search_query,
+                            llm,
+                            controller,
+                            browser_context,
+                            on_step=report_step if on_progress else None,
+                            vision=vision,
+                            start_url=start_url,
+                            website=website,
+                            page_open=page_open
+                        )
+            # Searches that fail or run out of time say nothing about whether the site needs vision
+            get_vision_policy().finish(vision)
+            return keep_matching(products)
+    except Exception as e:
+        logger.error(f"Error searching {website}: {str(e)}")
+        raise
@@ -1,29 +1,22 @@
 from rest_framework import serializers
-from .models import SourcedFromEnum, StructuredSearchQuery
-from typing import Tuple, List, Optional
-from openai import OpenAI
+from .images import get_image_proxy
+from .llm_cache import get_structuring_cache
+from .llm_clients import get_llm_clients
+from .metrics import record_completion_usage, timed_stage
+from .models import SearchPlan, SourcedFromEnum, StructuredSearchQuery
+from .query_parser import get_query_parser
+from typing import Any, Dict, Tuple, List, Optional
+from openai import AsyncOpenAI, OpenAI
+import logging
+import time
 
-class ProductSearchSerializer(serializers.Serializer):
-    query = serializers.CharField(required=True, help_text="Natural language search query for products")
-    
-    def to_structured_query(self) -> StructuredSearchQuery:
-        """
-        Convert the natural language query to a structured search query using GPT-4.
-        First validates the query for safety, then processes it if safe.
-        
-        Returns:
-            StructuredSearchQuery: The structured query object
-        """
-        client = OpenAI()
-        query = self.validated_data['query']
-        
-        try:
-            completion = client.beta.chat.completions.parse(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        'role': 'system',
-                        'content': f"""You are a helpful assistant that standardizes user queries into a structured format matching our StructuredSearchQuery model.
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Most products a single request may ask for
+MAX_RESULT_COUNT: int = 100
+
+STRUCTURED_QUERY_SYSTEM_PROMPT: str = f"""You are a helpful assistant that standardizes user queries into a structured format matching our StructuredSearchQuery model.
 
                 For e-commerce platforms analysis:
                 - source_from: List of ONLY the supported platforms mentioned in the query
@@ -84,33 +77,155 @@ class ProductSearchSerializer(serializers.Serializer):
                 }}
 
                 """
-                    },
-                    {
-                        'role': 'user',
-                        'content': query
-                    }
-                ],
-                response_format=StructuredSearchQuery
-            )
-            print(completion.choices[0].message.parsed)
-            return completion.choices[0].message.parsed
-            
+
+class ProductSearchSerializer(serializers.Serializer):
+    query = serializers.CharField(required=False, help_text="Natural language search query for products")
+    count = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=MAX_RESULT_COUNT,
+        help_text="Number of products to return; without it every product of the first results pages is returned"
+    )
+    cursor = serializers.CharField(required=False, help_text="Cursor from a previous response, to fetch its next page")
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        # A cursor stands in for the query it was issued for
+        if not attrs.get("query") and not attrs.get("cursor"):
+            raise serializers.ValidationError({"query": ["This field is required."]})
+        return attrs
+    
+    @staticmethod
+    def _structuring_messages(query: str) -> List[Dict[str, str]]:
+        """
+        Build the chat messages used to structure a natural language query.
+        """
+        return [
+            {
+                'role': 'system',
+                'content': STRUCTURED_QUERY_SYSTEM_PROMPT
+            },
+            {
+                'role': 'user',
+                'content': query
+            }
+        ]
+    
+    @staticmethod
+    def _structured_without_llm(query: str) -> Optional[StructuredSearchQuery]:
+        """
+        The structuring cache's answer, or else the rule-based parser's; None when the LLM has to structure the query.
+        """
+        cached_query: Optional[StructuredSearchQuery] = get_structuring_cache().get(query)
+        if cached_query is not None:
+            return cached_query
+
+        # Queries the rules parse confidently skip the LLM round trip
+        with timed_stage("parse_local"):
+            return get_query_parser().try_parse(query)
+
+    @staticmethod
+    def _llm_structured(query: str, completion: Any, started: float) -> StructuredSearchQuery:
+        """
+        Record the structuring LLM's completion for a query and cache its output.
+        """
+        record_completion_usage("structuring", completion)
+        structured_query: StructuredSearchQuery = completion.choices[0].message.parsed
+        logger.debug(f"Structured query: {structured_query}")
+        get_structuring_cache().set(query, structured_query, llm_ms=(time.perf_counter() - started) * 1000)
+        return structured_query
+
+    @staticmethod
+    def _structuring_failure(query: str, error: Exception) -> StructuredSearchQuery:
+        # If parsing fails, create a basic query with just the item name
+        logger.warning(f"Error converting to structured query: {str(error)}")
+        return StructuredSearchQuery(
+            item_name=query,
+            has_only_unsupported_platforms=False
+        )
+
+    def to_structured_query(self) -> StructuredSearchQuery:
+        """
+        Convert the natural language query to a structured search query, with the rule-based parser
+        when it is confident and GPT-4 otherwise.
+        
+        Returns:
+            StructuredSearchQuery: The structured query object
+        """
+        query = self.validated_data['query']
+        structured_query: Optional[StructuredSearchQuery] = self._structured_without_llm(query)
+        if structured_query is not None:
+            return structured_query
+        
+        client: OpenAI = get_llm_clients().openai
+        try:
+            started: float = time.perf_counter()
+            with timed_stage("parse"):
+                completion = client.beta.chat.completions.parse(
+                    model="gpt-4o-mini",
+                    messages=self._structuring_messages(query),
+                    response_format=StructuredSearchQuery
+                )
+            return self._llm_structured(query, completion, started)
+        except Exception as e:
+            return self._structuring_failure(query, e)
+    
+    async def ato_structured_query(self) -> StructuredSearchQuery:
+        """
+        Async variant of to_structured_query, so structuring can run alongside the safety check.
+        
+        Returns:
+            StructuredSearchQuery: The structured query object
+        """
+        query = self.validated_data['query']
+        structured_query: Optional[StructuredSearchQuery] = self._structured_without_llm(query)
+        if structured_query is not None:
+            return structured_query
+        
+        client: AsyncOpenAI = get_llm_clients().async_openai()
+        try:
+            started: float = time.perf_counter()
+            with timed_stage("parse"):
+                completion = await client.beta.chat.completions.parse(
+                    model="gpt-4o-mini",
+                    messages=self._structuring_messages(query),
+                    response_format=StructuredSearchQuery
+                )
+            return self._llm_structured(query, completion, started)
         except Exception as e:
-            # If parsing fails, create a basic query with just the item name
-            print("Error converting to structured query")
-            return StructuredSearchQuery(
-                item_name=query,
-                has_only_unsupported_platforms=False
-            )
+            return self._structuring_failure(query, e)
+    
+    def to_search_plan(self, structured_query: Optional[StructuredSearchQuery] = None) -> SearchPlan:
+        """
+        Parse the query once and build the plan shared by the rest of the search pipeline.
+        
+        Args:
+            structured_query: An already parsed query; parsed from the request data when omitted
+        
+        Returns:
+            SearchPlan: The structured query, search string and websites to search
+        """
+        if structured_query is None:
+            structured_query = self.to_structured_query()
+        websites, unsupported_message = self.get_source_websites(structured_query)
+        return SearchPlan(
+            structured_query=structured_query,
+            search_string=self.to_search_string(structured_query),
+            websites=websites,
+            unsupported_message=unsupported_message
+        )
     
-    def to_search_string(self) -> str:
+    def to_search_string(self, structured_query: Optional[StructuredSearchQuery] = None) -> str:
         """
         Convert the structured query into a standardized search string.
         
+        Args:
+            structured_query: An already parsed query; parsed from the request data when omitted
+            
         Returns:
             str: The standardized search string
         """
-        structured_query = self.to_structured_query()
+        if structured_query is None:
+            structured_query = self.to_structured_query()
         parts = []
         
         if structured_query.gender:
@@ -132,16 +247,20 @@ class ProductSearchSerializer(serializers.Serializer):
         
         return " ".join(parts)
     
-    def get_source_websites(self) -> Tuple[List[SourcedFromEnum], Optional[str]]:
+    def get_source_websites(self, structured_query: Optional[StructuredSearchQuery] = None) -> Tuple[List[SourcedFromEnum], Optional[str]]:
         """
         Get the list of websites to source products from and check for unsupported platforms.
         If source_from is None or empty, return all available websites.
         Otherwise, return the list of supported websites specified in the query and a message about unsupported platforms.
         
+        Args:
+            structured_query: An already parsed query; parsed from the request data when omitted
+        
         Returns:
             tuple[list[SourcedFromEnum], str | None]: List of supported websites to source products from and a message about unsupported platforms
         """
-        structured_query = self.to_structured_query()
+        if structured_query is None:
+            structured_query = self.to_structured_query()
         
         # If the query was invalid (rejected by validation), return empty list
         if structured_query.item_name == "invalid_query":
@@ -165,6 +284,15 @@ class ProductSearchSerializer(serializers.Serializer):
         return list(structured_query.source_from), message
 
 
+class ProductSearchStreamSerializer(ProductSearchSerializer):
+    """
+    Request body of the streaming search, which always searches for a query: there is no stream to resume from a
+    cursor, so its next page is fetched from POST /api/search/.
+    """
+    query = serializers.CharField(help_text="Natural language search query for products")
+    cursor = None
+
+
 # Serializer for formatting product search results
 # Used to structure and validate product data before sending to clients
 class ProductResponseSerializer(serializers.Serializer):
@@ -174,4 +302,17 @@ class ProductResponseSerializer(serializers.Serializer):
     maximum_retail_price = serializers.FloatField()
     discount_percentage = serializers.IntegerField()
     selling_price = serializers.FloatField()
-    sourced_from = serializers.ChoiceField(choices=[(x.value, x.value) for x in SourcedFromEnum])
\ No newline at end of file
+    sourced_from = serializers.ChoiceField(choices=[(x.value, x.value) for x in SourcedFromEnum])
+
+    def to_representation(self, instance: Any) -> Dict[str, Any]:
+        """
+        Point the product image at a small thumbnail served by our image proxy, made absolute with the
+        request's host when the serializer is given the request in its context.
+        """
+        data: Dict[str, Any] = super().to_representation(instance)
+        request = self.context.get("request")
+        data["product_image_url"] = get_image_proxy().thumbnail_url(
+            data["product_image_url"],
+            origin=request.build_absolute_uri("/") if request is not None else None
+        )
+        return data
@@ -0,0 +1,245 @@
+import base64
+import logging
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from django.conf import settings
+
+from .models import SourcedFromEnum
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through Django settings
+DEFAULT_MODE: str = "adaptive"
+DEFAULT_FALLBACK_THRESHOLD: float = 0.5
+DEFAULT_MIN_SAMPLES: int = 5
+DEFAULT_WINDOW: int = 20
+DEFAULT_PROBE_EVERY: int = 10
+
+VISION_MODES: Tuple[str, ...] = ("adaptive", "always", "never")
+
+
+def png_size(screenshot_b64: str) -> Optional[Tuple[int, int]]:
+    """
+    Width and height of a base64 encoded PNG, read from its header.
+    """
+    try:
+        header = base64.b64decode(screenshot_b64[:32])
+    except ValueError:
+        return None
+    if len(header) < 24 or header[:8] != b"\x89PNG\r\n\x1a\n":
+        return None
+    return int.from_bytes(header[16:20], "big"), int.from_bytes(header[20:24], "big")
+
+
+def image_tokens(width: int, height: int) -> int:
+    """
+    Input tokens of a high detail image for the GPT-4o family: the image is scaled to fit 2048x2048,
+    then its short side to 768, and costs 85 tokens plus 170 per 512px tile.
+    """
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+class SiteVisionStats:
+    """
+    Vision usage and fallback outcomes of one website's agent runs.
+    """
+
+    def __init__(self, window: int):
+        self.runs: int = 0
+        self.text_first_runs: int = 0
+        self.vision_first_runs: int = 0
+        self.vision_preferred_runs: int = 0
+        self.fallbacks: int = 0
+        self.steps_with_vision: int = 0
+        self.steps_without_vision: int = 0
+        self.screenshot_bytes_saved: int = 0
+        self.image_tokens_saved: int = 0
+        # Whether each recent text-first run had to fall back to vision
+        self.recent_fallbacks: Deque[bool] = deque(maxlen=window)
+
+    @property
+    def fallback_rate(self) -> float:
+        return sum(self.recent_fallbacks) / len(self.recent_fallbacks) if self.recent_fallbacks else 0.0
+
+
+class VisionRun:
+    """
+    Vision switch for a single website search. Starts DOM-only or with vision as the policy decides,
+    and turns vision on for the rest of the search once a step fails.
+    """
+
+    def __init__(self, policy: "VisionPolicy", website: SourcedFromEnum, enabled: bool):
+        self.policy = policy
+        self.website = website
+        self.enabled = enabled
+        self.started_with_vision = enabled
+        self.fell_back = False
+
+    def fall_back(self, reason: str) -> None:
+        """
+        Turn vision on for the remaining steps.
+        """
+        if self.enabled or self.policy.mode == "never":
+            return
+        logger.info(f"Turning on vision for {self.website}: {reason}")
+        self.enabled = True
+        self.fell_back = True
+
+    def observe_step(self, agent: Any, state: Any) -> None:
+        """
+        Account for the screenshot of the step the agent just took and check the previous step's result.
+        Called from the agent's step callback; a failure turns vision on from the next step.
+
+        Args:
+            agent: The browser_use Agent
+            state: The BrowserState the step was decided on
+        """
+        self.policy.record_step(self.website, self.enabled, getattr(state, "screenshot", None))
+        if any(result.error for result in agent.state.last_result or []):
+            self.fall_back("previous step failed")
+            agent.settings.use_vision = self.enabled
+
+
+class VisionPolicy:
+    """
+    Decides per website whether agents start with screenshots.
+
+    Agents run DOM-only unless the site's recent text-first runs needed to fall back to vision at least
+    fallback_threshold of the time; such sites start with vision, but every probe_every-th run still tries
+    DOM-only so the decision follows the site if its pages change.
+    """
+
+    def __init__(
+        self,
+        mode: str = DEFAULT_MODE,
+        fallback_threshold: float = DEFAULT_FALLBACK_THRESHOLD,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        window: int = DEFAULT_WINDOW,
+        probe_every: int = DEFAULT_PROBE_EVERY,
+    ):
+        if mode not in VISION_MODES:
+            raise ValueError(f"Unknown vision mode {mode!r}, expected one of {', '.join(VISION_MODES)}")
+        self.mode = mode
+        self.fallback_threshold = fallback_threshold
+        self.min_samples = min_samples
+        self.window = window
+        self.probe_every = probe_every
+        self._sites: Dict[SourcedFromEnum, SiteVisionStats] = {}
+        self._lock = threading.Lock()
+
+    def _site(self, website: SourcedFromEnum) -> SiteVisionStats:
+        if website not in self._sites:
+            self._sites[website] = SiteVisionStats(self.window)
+        return self._sites[website]
+
+    def _prefers_vision(self, site: SiteVisionStats) -> bool:
+        if self.mode != "adaptive":
+            return self.mode == "always"
+        return len(site.recent_fallbacks) >= self.min_samples and site.fallback_rate >= self.fallback_threshold
+
+    def start(self, website: SourcedFromEnum) -> VisionRun:
+        """
+        Begin an agent search on a website.
+
+        Args:
+            website: The website being searched
+
+        Returns:
+            VisionRun: The search's vision switch
+        """
+        with self._lock:
+            site = self._site(website)
+            enabled = self._prefers_vision(site)
+            if enabled and self.mode == "adaptive":
+                # Every probe_every-th run tries DOM-only again to re-measure the site
+                site.vision_preferred_runs += 1
+                enabled = site.vision_preferred_runs % self.probe_every != 0
+            site.runs += 1
+            if enabled:
+                site.vision_first_runs += 1
+            else:
+                site.text_first_runs += 1
+        return VisionRun(self, website, enabled)
+
+    def finish(self, run: VisionRun) -> None:
+        """
+        Record how a text-first search went, so the site's default follows its fallback rate.
+        """
+        with self._lock:
+            site = self._site(run.website)
+            if run.fell_back:
+                site.fallbacks += 1
+            if not run.started_with_vision:
+                site.recent_fallbacks.append(run.fell_back)
+
+    def record_step(self, website: SourcedFromEnum, vision: bool, screenshot_b64: Optional[str]) -> None:
+        """
+        Count an agent step, and the upload and tokens saved when its screenshot was left out.
+        """
+        with self._lock:
+            site = self._site(website)
+            if vision:
+                site.steps_with_vision += 1
+                return
+            site.steps_without_vision += 1
+            if screenshot_b64:
+                site.screenshot_bytes_saved += len(screenshot_b64)
+                size = png_size(screenshot_b64)
+                if size is not None:
+                    site.image_tokens_saved += image_tokens(*size)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-website vision mode, fallback rate and the bytes and tokens saved by skipping screenshots.
+        """
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "sites": {
+                    website.value: {
+                        "starts_with_vision": self._prefers_vision(site),
+                        "runs": site.runs,
+                        "text_first_runs": site.text_first_runs,
+                        "vision_first_runs": site.vision_first_runs,
+                        "fallbacks": site.fallbacks,
+                        "fallback_rate": round(site.fallback_rate, 3),
+                        "steps_with_vision": site.steps_with_vision,
+                        "steps_without_vision": site.steps_without_vision,
+                        "screenshot_bytes_saved": site.screenshot_bytes_saved,
+                        "image_tokens_saved": site.image_tokens_saved,
+                    }
+                    for website, site in self._sites.items()
+                },
+            }
+
+
+_vision_policy: Optional[VisionPolicy] = None
+_vision_policy_lock = threading.Lock()
+
+
+def get_vision_policy() -> VisionPolicy:
+    """
+    Get the process-wide vision policy, configured from Django settings.
+
+    Returns:
+        VisionPolicy: The shared policy
+    """
+    global _vision_policy
+    with _vision_policy_lock:
+        if _vision_policy is None:
+            _vision_policy = VisionPolicy(
+                mode=getattr(settings, "AGENT_VISION_MODE", DEFAULT_MODE),
+                fallback_threshold=getattr(settings, "AGENT_VISION_FALLBACK_THRESHOLD", DEFAULT_FALLBACK_THRESHOLD),
+                min_samples=getattr(settings, "AGENT_VISION_MIN_SAMPLES", DEFAULT_MIN_SAMPLES),
+                window=getattr(settings, "AGENT_VISION_WINDOW", DEFAULT_WINDOW),
+                probe_every=getattr(settings, "AGENT_VISION_PROBE_EVERY", DEFAULT_PROBE_EVERY),
+            )
+        return _vision_policy
@@ -7,10 +7,32 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
 
+import asyncio
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from products.browser_pool import get_browser_pool, start_browser_warmup
+
+
+async def application(scope, receive, send):
+    """
+    The Django application, plus the ASGI lifespan protocol: the shared browsers are launched when the server
+    starts, so the first search skips the cold start, and closed when it stops.
+    """
+    if scope["type"] != "lifespan":
+        return await django_application(scope, receive, send)
+
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_browser_warmup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await asyncio.to_thread(get_browser_pool().shutdown)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -86,10 +86,269 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # The catalog writer and refresh worker write concurrently with searches reading
+            'timeout': 20,
+            'init_command': 'PRAGMA journal_mode=WAL;',
+        },
     }
 }
 
 
+# Browser pool
+# Warm browsers shared by all searches; each agent gets its own isolated context. A browser is recycled after
+# BROWSER_POOL_MAX_USES contexts or once its own processes use more than BROWSER_POOL_MAX_MEMORY_MB.
+# Browsers run headless unless BROWSER_POOL_HEADLESS is off. With BROWSER_POOL_WARMUP, servers launch the browsers
+# when they start (on the ASGI lifespan startup, or when the WSGI application loads) rather than on the first search.
+
+BROWSER_POOL_SIZE = 2
+
+BROWSER_POOL_MAX_USES = 50
+
+BROWSER_POOL_MAX_MEMORY_MB = 4096
+
+BROWSER_POOL_HEADLESS = True
+
+BROWSER_POOL_WARMUP = True
+
+
+# Search scheduler
+# Caps on concurrently running agents, globally and per site. Searches beyond the caps wait in a bounded
+# queue; a full queue or a wait longer than SEARCH_ADMISSION_TIMEOUT (seconds) returns 503.
+
+SEARCH_MAX_AGENTS = 8
+
+SEARCH_SITE_AGENT_LIMITS = {
+    'flipkart': 3,
+    'myntra': 3,
+    'ajio': 3,
+    'meesho': 3,
+}
+
+SEARCH_MAX_QUEUED = 32
+
+SEARCH_ADMISSION_TIMEOUT = 30
+
+# Search deadlines
+# A request's site searches must finish within SEARCH_LATENCY_BUDGET seconds of the request arriving, and each
+# site within its own deadline. Sites that run out of time are cancelled and the response carries the
+# products of the other sites, with a per-site status.
+
+SEARCH_LATENCY_BUDGET = 90
+
+SEARCH_SITE_DEADLINES = {
+    'flipkart': 75,
+    'myntra': 75,
+    'ajio': 75,
+    'meesho': 75,
+}
+
+# Search pagination
+# Responses carry a cursor for the next SEARCH_PAGE_SIZE products (or the request's count). Sites keep being
+# browsed page by page, at most SEARCH_MAX_PAGES per site. For requests that resume a cursor or ask for a count,
+# the next page is browsed in the background while the current one is returned. Cursors expire after SEARCH_CURSOR_TTL seconds; at most SEARCH_MAX_CURSORS are
+# kept per process.
+
+SEARCH_PAGE_SIZE = 20
+
+SEARCH_MAX_PAGES = 5
+
+SEARCH_CURSOR_TTL = 15 * 60
+
+SEARCH_MAX_CURSORS = 1000
+
+
+# Search metrics
+# Stage timings, LLM usage and failure counters are served at /metrics for Prometheus to scrape.
+# With SEARCH_TIMING_HEADER, search responses also carry their own per-stage breakdown in a Server-Timing
+# header (in the summary event when streaming).
+
+SEARCH_TIMING_HEADER = DEBUG
+
+
+# Local guard
+# First tier of the query guard: clear product searches are approved and clear injections rejected locally,
+# and only the rest are validated by the LLM. A query is approved when its lexicon score reaches
+# LOCAL_GUARD_APPROVE_SCORE, it has at most LOCAL_GUARD_MAX_TOKENS words, at most LOCAL_GUARD_MAX_UNKNOWN
+# words outside the lexicon and no instruction words ("click", "checkout", "then").
+
+LOCAL_GUARD_ENABLED = True
+
+LOCAL_GUARD_APPROVE_SCORE = 3
+
+LOCAL_GUARD_MAX_TOKENS = 16
+
+LOCAL_GUARD_MAX_UNKNOWN = 1
+
+
+# Rule-based query parser
+# Structures queries from gazetteers and price/size patterns before asking the LLM. Parses whose confidence
+# (0 to 1, lowered by unknown words, stray numbers, negations and questions) is below
+# QUERY_PARSER_MIN_CONFIDENCE go to the LLM instead.
+
+QUERY_PARSER_ENABLED = True
+
+QUERY_PARSER_MIN_CONFIDENCE = 0.7
+
+
+# Search coalescing
+# Concurrent requests for the same normalized query, site and results page share one site search and its
+# progress events. The search is cancelled only when every request waiting on it has gone.
+
+SEARCH_COALESCING_ENABLED = True
+
+
+# Navigation macros
+# When the agent had to navigate a site (type into the search box, press Enter) before finding products, the
+# actions and the results URL are learned per site. Later agent runs on the site open their start page first and
+# replay the macro when it doesn't show results; a page counts as results when it is still on the site, has
+# NAVIGATION_MACRO_MIN_LINKS links and shows the query's words. A macro failing NAVIGATION_MACRO_MAX_FAILURES replays in a row is dropped. With
+# NAVIGATION_MACROS_PATH set, macros are kept in that JSON file across restarts.
+
+NAVIGATION_MACROS_ENABLED = True
+
+NAVIGATION_MACROS_PATH = None
+
+NAVIGATION_MACRO_MAX_FAILURES = 3
+
+NAVIGATION_MACRO_MIN_LINKS = 20
+
+NAVIGATION_MACRO_REPLAY_TIMEOUT = 15
+
+
+# Image proxy
+# Search responses point product images at /api/img/, which fetches each image once, shrinks it to
+# IMAGE_PROXY_WIDTH pixels wide as WebP (when Pillow is installed) and keeps it in a content-addressed disk
+# cache of at most IMAGE_PROXY_CACHE_MAX_BYTES. Only images on IMAGE_PROXY_ALLOWED_HOSTS (and their subdomains)
+# are proxied. Set IMAGE_PROXY_BASE_URL when the API is reached through another host than the request's.
+
+IMAGE_PROXY_ENABLED = True
+
+IMAGE_PROXY_CACHE_DIR = BASE_DIR / 'image_cache'
+
+IMAGE_PROXY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+IMAGE_PROXY_WIDTH = 400
+
+IMAGE_PROXY_QUALITY = 75
+
+IMAGE_PROXY_ALLOWED_HOSTS = ("myntassets.com", "flixcart.com", "meesho.com", "ajio.com")
+
+IMAGE_PROXY_BASE_URL = None
+
+
+# LLM clients
+# One set of OpenAI clients per process shares keep-alive connection pools across requests (per event loop for
+# the async ones, closed when their loop stops). LLM_HTTP2 needs the h2 package from requirements.txt and falls
+# back to HTTP/1.1 without it. Failed calls are retried LLM_MAX_RETRIES times with exponential backoff.
+
+LLM_MAX_CONNECTIONS = 100
+
+LLM_MAX_KEEPALIVE_CONNECTIONS = 20
+
+LLM_KEEPALIVE_EXPIRY = 120
+
+LLM_CONNECT_TIMEOUT = 5
+
+LLM_TIMEOUT = 60
+
+LLM_MAX_RETRIES = 2
+
+LLM_HTTP2 = True
+
+
+# Offline replay
+# SEARCH_PAGE_SNAPSHOTS = {"path": <cassette directory>, "mode": "record" | "replay"} records the pages every
+# browser context loads into HAR files, or serves them from those files without touching the network.
+# record_search and bench_suite set it themselves. REPLAY_OPENAI_UPSTREAM is where recording forwards OpenAI calls.
+
+SEARCH_PAGE_SNAPSHOTS = None
+
+REPLAY_OPENAI_UPSTREAM = "https://api.openai.com/v1"
+
+
+# Search result cache
+# Per-site results keyed by the normalized structured query. Fresh for the site's TTL (seconds), then served
+# stale for RESULT_CACHE_STALE_TTL while refreshed in the background. Set RESULT_CACHE_SHARED_ALIAS to a
+# CACHES alias to share results between workers.
+
+RESULT_CACHE_DEFAULT_TTL = 15 * 60
+
+RESULT_CACHE_TTLS = {
+    'flipkart': 10 * 60,
+    'myntra': 15 * 60,
+    'ajio': 30 * 60,
+    'meesho': 30 * 60,
+}
+
+RESULT_CACHE_STALE_TTL = 60 * 60
+
+RESULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+RESULT_CACHE_SHARED_ALIAS = None
+
+
+# LLM response caches
+# Safety verdicts and structured queries keyed by the canonical query. Near-duplicate matching compares
+# character trigrams and requires the same numbers, attributes, platforms and negations; None disables it. Both
+# caches use exact matches only by default.
+
+LLM_CACHE_MAX_ENTRIES = 1024
+
+LLM_CACHE_GUARD_NEAR_DUPLICATE_THRESHOLD = None
+
+LLM_CACHE_STRUCTURING_NEAR_DUPLICATE_THRESHOLD = None
+
+
+# Product catalog
+# Scraped products with price history in the database. Searches are served from the catalog while a query's
+# products are younger than CATALOG_MAX_AGE (seconds). Writes are batched and flushed every
+# CATALOG_FLUSH_INTERVAL seconds or once CATALOG_BATCH_SIZE rows are queued. The refresh worker
+# (python manage.py refresh_catalog) re-scrapes the CATALOG_REFRESH_TOP most requested queries of the last
+# CATALOG_POPULAR_WINDOW seconds once they are older than CATALOG_REFRESH_AFTER, every CATALOG_REFRESH_INTERVAL.
+
+CATALOG_ENABLED = True
+
+CATALOG_MAX_AGE = 6 * 60 * 60
+
+CATALOG_FLUSH_INTERVAL = 1
+
+CATALOG_BATCH_SIZE = 500
+
+CATALOG_REFRESH_INTERVAL = 15 * 60
+
+CATALOG_REFRESH_TOP = 20
+
+CATALOG_REFRESH_AFTER = 60 * 60
+
+CATALOG_POPULAR_WINDOW = 7 * 24 * 60 * 60
+
+# Queries the catalog has never seen are answered from an in-memory index over its fresh products when it
+# finds at least PRODUCT_INDEX_MIN_RESULTS matches. The index is rebuilt in the background, checking for
+# catalog changes every PRODUCT_INDEX_REBUILD_INTERVAL seconds.
+
+PRODUCT_INDEX_MIN_RESULTS = 5
+
+PRODUCT_INDEX_REBUILD_INTERVAL = 60
+
+
+# Agent vision
+# 'adaptive' runs agents on the page text and sends screenshots only after a failed step or an empty
+# text-only result; sites whose recent text-only runs fall back at least AGENT_VISION_FALLBACK_THRESHOLD
+# of the time start with vision, re-trying text-only every AGENT_VISION_PROBE_EVERY runs.
+# 'always' and 'never' pin the mode.
+
+AGENT_VISION_MODE = 'adaptive'
+
+AGENT_VISION_FALLBACK_THRESHOLD = 0.5
+
+AGENT_VISION_MIN_SAMPLES = 5
+
+AGENT_VISION_WINDOW = 20
+
+AGENT_VISION_PROBE_EVERY = 10
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
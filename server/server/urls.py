@@ -16,9 +16,23 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from products.views import ProductSearchView
+from products.views import (
+    ImageProxyView,
+    MetricsView,
+    ProductSearchStreamView,
+    ProductSearchView,
+    SearchCacheStatsView,
+    SearchSchedulerStatsView,
+    SearchVisionStatsView,
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/search/', ProductSearchView.as_view(), name='product-search'),
+    path('api/search/stream/', ProductSearchStreamView.as_view(), name='product-search-stream'),
+    path('api/search/cache/', SearchCacheStatsView.as_view(), name='search-cache-stats'),
+    path('api/search/scheduler/', SearchSchedulerStatsView.as_view(), name='search-scheduler-stats'),
+    path('api/search/vision/', SearchVisionStatsView.as_view(), name='search-vision-stats'),
+    path('api/img/', ImageProxyView.as_view(), name='image-proxy'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
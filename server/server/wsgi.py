@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
 application = get_wsgi_application()
+
+# WSGI has no startup hook: launch the shared browsers as the application loads, if BROWSER_POOL_WARMUP is on
+from products.browser_pool import start_browser_warmup
+
+start_browser_warmup()